@@ -1,5 +1,36 @@
-from dotenv import load_dotenv
-from pathlib import Path
-from app.nanoleaf.aurora import Aurora
+import importlib
 
-load_dotenv(dotenv_path=Path("../../") / ".env")
\ No newline at end of file
+# Submodules are imported the first time one of their names is used,
+# so scripts only pay for what they touch (aiohttp for AsyncAurora, numpy for streaming, ...).
+_LAZY_NAMES = {
+    "Aurora": "app.nanoleaf.aurora",
+    "AsyncAurora": "app.nanoleaf.async_aurora",
+    "AuroraGroup": "app.nanoleaf.group",
+}
+
+__all__ = ["Aurora", "AsyncAurora", "AuroraGroup", "load_env"]
+
+
+def load_env(dotenv_path=None, override: bool = False) -> bool:
+    """Loads NANOLEAF_IP, NANOLEAF_AUTH_TOKEN and other settings from a .env file into the environment.
+
+    dotenv_path - Path of the file. Defaults to ../../.env, relative to the working directory.
+    Returns True if any variable was set. Requires python-dotenv."""
+    from pathlib import Path
+    from dotenv import load_dotenv
+    if dotenv_path is None:
+        dotenv_path = Path("../../") / ".env"
+    return load_dotenv(dotenv_path=dotenv_path, override=override)
+
+
+def __getattr__(name):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
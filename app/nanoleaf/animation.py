@@ -0,0 +1,145 @@
+import hashlib
+import json
+
+
+# Builds custom effects that play on the device itself.
+# Keyframes are compiled into the animData string once, then installed with Effect.effect_install(),
+# which only uploads them when the device doesn't already hold an identical effect.
+
+# Fields of an effect that determine how it plays. Everything else the device reports is ignored when comparing.
+_CONTENT_FIELDS = ("animType", "animData", "loop")
+
+
+def effect_hash(effect: dict) -> str:
+    """Returns a hash of the fields of an effect that affect playback, as compiled or as reported by the device"""
+    content = {field: effect.get(field) for field in _CONTENT_FIELDS}
+    if content["animData"] is not None:
+        content["animData"] = " ".join(content["animData"].split())
+    encoded = json.dumps(content, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def is_installed(details, effect) -> bool:
+    """Returns True if the effect details returned by the device match a CustomEffect"""
+    return isinstance(details, dict) and effect_hash(details) == effect.content_hash
+
+
+class CustomEffect:
+
+    def __init__(self, name: str, panel_ids=(), loop: bool = True):
+        """A custom animation with its own list of keyframes per panel.
+
+        name - Name the effect is installed under
+        panel_ids - Panels in the order they're written to animData (more are added as keyframes are set)
+        loop - Whether the animation repeats once every panel has played its keyframes
+        """
+        self.name = name
+        self.loop = loop
+        self._frames = {panel_id: [] for panel_id in panel_ids}
+        self._segments = {}
+        self._anim_data = None
+
+    @classmethod
+    def from_layout(cls, name: str, layout, loop: bool = True):
+        """Creates an effect for every panel of a PanelLayout or LayoutGeometry, in stream slot order"""
+        geometry = layout.geometry() if hasattr(layout, "geometry") else layout
+        return cls(name, geometry.panel_ids, loop)
+
+    def __repr__(self):
+        return f"<CustomEffect({self.name!r}, {len(self._frames)} panels)>"
+
+    @property
+    def panel_ids(self) -> list:
+        return list(self._frames)
+
+    def keyframes(self, panel_id: int) -> list:
+        """Returns the (r, g, b, w, transition_time) keyframes of a panel"""
+        return list(self._frames.get(panel_id, ()))
+
+    def add_keyframe(self, panel_id: int, red: int, green: int, blue: int, white: int = 0,
+                     transition_time: int = 1):
+        """Appends a keyframe to a panel. transition_time is in tenths of a second."""
+        self._frames.setdefault(panel_id, []).append(
+            (int(red), int(green), int(blue), int(white), int(transition_time)))
+        self.__changed(panel_id)
+
+    def set_keyframes(self, panel_id: int, frames):
+        """Replaces the keyframes of a panel with (r, g, b[, w], transition_time) tuples"""
+        keyframes = []
+        for frame in frames:
+            if len(frame) == 4:
+                red, green, blue, transition_time = frame
+                white = 0
+            else:
+                red, green, blue, white, transition_time = frame
+            keyframes.append((int(red), int(green), int(blue), int(white), int(transition_time)))
+        self._frames[panel_id] = keyframes
+        self.__changed(panel_id)
+
+    def set_frames(self, colors, transition_times=1):
+        """Replaces the keyframes of every panel from whole frames.
+
+        colors - (frames, panels, 3) RGB or (frames, panels, 4) RGBW array, panels in panel_ids order
+        transition_times - A single transition time, or one per frame
+        """
+        panel_ids = self.panel_ids
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        if np is None:
+            if not isinstance(transition_times, (list, tuple)):
+                transition_times = [transition_times] * len(colors)
+            for slot, panel_id in enumerate(panel_ids):
+                self.set_keyframes(panel_id, [tuple(frame[slot]) + (transition_time,)
+                                              for frame, transition_time in zip(colors, transition_times)])
+            return
+
+        colors = np.asarray(colors, dtype=np.int64)
+        frame_count, panel_count, channels = colors.shape
+        if panel_count != len(panel_ids):
+            raise ValueError(f"Expected colors for {len(panel_ids)} panels, got {panel_count}")
+        # Row per panel: panelId, numFrames, then r g b w t for every frame
+        rows = np.zeros((panel_count, frame_count, 5), dtype=np.int64)
+        rows[:, :, :channels] = colors.transpose(1, 0, 2)
+        rows[:, :, 4] = np.broadcast_to(np.asarray(transition_times, dtype=np.int64), (frame_count,))
+        prefix = np.column_stack((np.asarray(panel_ids, dtype=np.int64), np.full(panel_count, frame_count)))
+        table = np.hstack((prefix, rows.reshape(panel_count, -1)))
+        for panel_id, frames, row in zip(panel_ids, rows.tolist(), table.tolist()):
+            self._frames[panel_id] = [tuple(frame) for frame in frames]
+            self._segments[panel_id] = " ".join(map(str, row))
+        self._anim_data = None
+
+    @property
+    def anim_data(self) -> str:
+        """Returns the animData string: numPanels, then per panel its ID, numFrames and r g b w t of each frame.
+
+        Only panels whose keyframes changed since the last call are re-encoded."""
+        if self._anim_data is None:
+            segments = []
+            for panel_id, frames in self._frames.items():
+                if not frames:
+                    continue
+                segment = self._segments.get(panel_id)
+                if segment is None:
+                    values = [panel_id, len(frames)]
+                    for frame in frames:
+                        values.extend(frame)
+                    segment = self._segments[panel_id] = " ".join(map(str, values))
+                segments.append(segment)
+            self._anim_data = " ".join([str(len(segments))] + segments)
+        return self._anim_data
+
+    def compile(self) -> dict:
+        """Returns the effect data to send with Effect.effect_set_raw()"""
+        return {"command": "add", "animName": self.name, "animType": "custom",
+                "animData": self.anim_data, "loop": self.loop, "palette": []}
+
+    @property
+    def content_hash(self) -> str:
+        """Returns the hash used to tell whether the device already holds this effect"""
+        return effect_hash(self.compile())
+
+    def __changed(self, panel_id):
+        self._segments.pop(panel_id, None)
+        self._anim_data = None
@@ -0,0 +1,482 @@
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+
+from app.nanoleaf import endpoints
+from app.nanoleaf.animation import CustomEffect
+from app.nanoleaf.catalog import EffectCatalog
+from app.nanoleaf.events import ALL_EVENTS, AsyncEventListener
+from app.nanoleaf.exceptions import ResourceNotFoundException
+from app.nanoleaf.model import AuroraObject
+from app.nanoleaf.scheduler import StreamScheduler
+from app.nanoleaf.geometry import LayoutGeometry, geometry_from_snapshot
+from app.nanoleaf.layout import panel_count_from_snapshot
+from app.nanoleaf.state import StateBatch, rgb_from_snapshot, hsv_data_from_rgb
+from app.nanoleaf.effect import RESERVED_EFFECT_NAMES, select_data, write_data, \
+    choose_random_effect, details_request, details_need_sync, cached_details, install_data
+
+from app.nanoleaf.utils import AsyncRequester
+from app.nanoleaf.utils.resilience import DEFAULT_TIMEOUT, CircuitBreaker, RetryPolicy
+
+
+# Asyncio interface for an Aurora light
+# Mirrors the sync Aurora: every property getter becomes a coroutine method of the same name,
+# and every property setter becomes a coroutine method prefixed with set_.
+
+# Fields that never change while the device is running are served from any cached snapshot
+_STATIC = float("inf")
+
+
+class AsyncState(AuroraObject):
+
+    def __init__(self, requester):
+        super().__init__(requester)
+        self._batch = contextvars.ContextVar(f"state_batch_{id(self)}", default=None)
+
+    async def _get(self, endpoint):
+        return await self._requester.request(method="GET", endpoint=endpoint)
+
+    async def _put(self, data):
+        batch = self._batch.get()
+        if batch is not None:
+            batch.add(data)
+        else:
+            await self._requester.request(method="PUT", endpoint=endpoints.STATE, data=data)
+
+    @asynccontextmanager
+    async def batch(self):
+        """Collects every state change made inside the block and sends them as one request on exit.
+
+        Changes are discarded if the block raises. Reads inside the block still return the device's values."""
+        batch = self._batch.get()
+        if batch is not None:
+            yield batch
+            return
+        batch = StateBatch()
+        token = self._batch.set(batch)
+        try:
+            yield batch
+        finally:
+            self._batch.reset(token)
+        if batch.data:
+            await self._requester.request(method="PUT", endpoint=endpoints.STATE, data=batch.data)
+
+    async def color_mode(self):
+        """Returns the current color mode."""
+        return await self._get(endpoints.STATE_COLOR_MODE)
+
+    async def on(self):
+        """Returns True if the device is on, False if it's off"""
+        return await self._get(endpoints.STATE_ON)
+
+    async def set_on(self, value: bool):
+        """Turns the device on/off. True = on, False = off"""
+        await self._put({"on": value})
+
+    async def off(self):
+        """Returns True if the device is off, False if it's on"""
+        return not await self.on()
+
+    async def set_off(self, value: bool):
+        """Turns the device on/off. True = off, False = on"""
+        await self.set_on(not value)
+
+    async def on_toggle(self):
+        """Switches the on/off state of the device"""
+        await self.set_on(not await self.on())
+
+    async def brightness(self):
+        """Returns the brightness of the device (0-100)"""
+        return await self._get(endpoints.STATE_BRIGHTNESS)
+
+    async def set_brightness(self, level):
+        """Sets the brightness to the given level (0-100)"""
+        await self._put({"brightness": {"value": level}})
+
+    async def brightness_min(self):
+        """Returns the minimum brightness possible. (This always returns 0)"""
+        return await self._get(endpoints.STATE_BRIGHTNESS_MIN)
+
+    async def brightness_max(self):
+        """Returns the maximum brightness possible. (This always returns 100)"""
+        return await self._get(endpoints.STATE_BRIGHTNESS_MAX)
+
+    async def brightness_raise(self, level):
+        """Raise the brightness of the device by a relative amount (negative lowers brightness)"""
+        await self._put({"brightness": {"increment": level}})
+
+    async def brightness_lower(self, level):
+        """Lower the brightness of the device by a relative amount (negative raises brightness)"""
+        await self.brightness_raise(-level)
+
+    async def hue(self):
+        """Returns the hue of the device (0-360)"""
+        return await self._get(endpoints.STATE_HUE)
+
+    async def set_hue(self, level):
+        """Sets the hue to the given level (0-360)"""
+        await self._put({"hue": {"value": level}})
+
+    async def hue_min(self):
+        """Returns the minimum hue possible. (This always returns 0)"""
+        return await self._get(endpoints.STATE_HUE_MIN)
+
+    async def hue_max(self):
+        """Returns the maximum hue possible. (This always returns 360)"""
+        return await self._get(endpoints.STATE_HUE_MAX)
+
+    async def hue_raise(self, level):
+        """Raise the hue of the device by a relative amount (negative lowers hue)"""
+        await self._put({"hue": {"increment": level}})
+
+    async def hue_lower(self, level):
+        """Lower the hue of the device by a relative amount (negative raises hue)"""
+        await self.hue_raise(-level)
+
+    async def saturation(self):
+        """Returns the saturation of the device (0-100)"""
+        return await self._get(endpoints.STATE_SATURATION)
+
+    async def set_saturation(self, level):
+        """Sets the saturation to the given level (0-100)"""
+        await self._put({"sat": {"value": level}})
+
+    async def saturation_min(self):
+        """Returns the minimum saturation possible. (This always returns 0)"""
+        return await self._get(endpoints.STATE_SATURATION_MIN)
+
+    async def saturation_max(self):
+        """Returns the maximum saturation possible. (This always returns 100)"""
+        return await self._get(endpoints.STATE_SATURATION_MAX)
+
+    async def saturation_raise(self, level):
+        """Raise the saturation of the device by a relative amount (negative lowers saturation)"""
+        await self._put({"sat": {"increment": level}})
+
+    async def saturation_lower(self, level):
+        """Lower the saturation of the device by a relative amount (negative raises saturation)"""
+        await self.saturation_raise(-level)
+
+    async def color_temperature(self):
+        """Returns the color temperature of the device (0-100)"""
+        return await self._get(endpoints.STATE_COLOR_TEMPERATURE)
+
+    async def set_color_temperature(self, level):
+        """Sets the color temperature to the given level (0-100)"""
+        await self._put({"ct": {"value": level}})
+
+    async def color_temperature_min(self):
+        """Returns the minimum color temperature possible. (This always returns 1200)"""
+        return await self._get(endpoints.STATE_COLOR_TEMPERATURE_MIN)
+
+    async def color_temperature_max(self):
+        """Returns the maximum color temperature possible. (This always returns 6500)"""
+        return await self._get(endpoints.STATE_COLOR_TEMPERATURE_MAX)
+
+    async def color_temperature_raise(self, level):
+        """Raise the color temperature of the device by a relative amount (negative lowers color temperature)"""
+        await self._put({"ct": {"increment": level}})
+
+    async def color_temperature_lower(self, level):
+        """Lower the color temperature of the device by a relative amount (negative raises color temperature)"""
+        await self.color_temperature_raise(-level)
+
+    async def rgb(self):
+        """The color of the device, as represented by 0-255 RGB values"""
+        return rgb_from_snapshot(await self._requester.snapshot())
+
+    async def set_rgb(self, color):
+        """Set the color of the device, as represented by either a hex string or a list of 0-255 RGB values"""
+        data = hsv_data_from_rgb(color)
+        if data is None:
+            return
+        await self._put(data)
+
+
+class AsyncEffect(AuroraObject):
+
+    def __init__(self, requester, catalog: EffectCatalog = None):
+        super().__init__(requester)
+        self.catalog = EffectCatalog() if catalog is None else catalog
+
+    _reserved_effect_names = RESERVED_EFFECT_NAMES
+
+    async def _write(self, effect_data: dict):
+        return await self._requester.request(method="PUT", endpoint=endpoints.EFFECTS,
+                                             data=write_data(effect_data))
+
+    async def effect(self):
+        """Returns the active effect"""
+        return await self._requester.request(method="GET", endpoint=endpoints.EFFECTS_SELECT)
+
+    async def set_effect(self, effect_name: str):
+        """Sets the active effect to the name specified"""
+        await self._requester.request(method="PUT", endpoint=endpoints.EFFECTS, data=select_data(effect_name))
+
+    async def effects_list(self):
+        """Returns a list of all effects stored on the device.
+
+        Served from the effect catalog, which re-reads the list from the device once it's older than its max_age."""
+        if not self.catalog.fresh:
+            self.catalog.sync_names(await self._requester.request(method="GET", endpoint=endpoints.EFFECTS_LIST))
+        return self.catalog.names
+
+    async def effect_random(self) -> str:
+        """Sets the active effect to a new random effect stored on the device.
+
+        Returns the name of the new effect."""
+        new_effect = choose_random_effect(await self.effects_list(), await self.effect())
+        await self.set_effect(new_effect)
+        return new_effect
+
+    async def effect_set_raw(self, effect_data: dict):
+        """Sends a raw dict containing effect data to the device.
+
+        The dict given must match the json structure specified in the API docs."""
+        await self._write(effect_data)
+        self.catalog.record_write(effect_data)
+
+    async def effect_details(self, name: str, refresh: bool = False) -> dict:
+        """Returns the dict containing details for the effect specified.
+
+        Details are fetched once and then served from the effect catalog. Once the catalog is older than its
+        max_age, the effect list is diffed against the device first, so deleted effects aren't served.
+
+        refresh - Fetch the details from the device even if they're cached"""
+        if details_need_sync(self.catalog, refresh):
+            await self.effects_list()
+        details = cached_details(self.catalog, name, refresh)
+        if details is None:
+            details = await self._write(details_request(name))
+            self.catalog.store(name, details)
+        return details
+
+    async def effect_details_all(self) -> dict:
+        """Returns a dict containing details for all effects on the device.
+
+        Only the details of effects missing from the effect catalog are fetched, concurrently."""
+        await self.effects_list()
+        if self.catalog.prefer_request_all():
+            self.catalog.store_all(await self._write({"command": "requestAll"}))
+        await asyncio.gather(*(self.effect_details(name) for name in self.catalog.missing()))
+        return self.catalog.all_details()
+
+    async def effect_install(self, custom_effect: CustomEffect, activate: bool = False) -> bool:
+        """Uploads a CustomEffect unless the device already holds an identical effect under its name.
+
+        activate - Also make it the active effect
+        Returns True if the effect was uploaded."""
+        try:
+            # Compared with the device's copy, since another client may have changed it since it was cached
+            details = await self.effect_details(custom_effect.name, refresh=True)
+        except ResourceNotFoundException:
+            details = None
+        data = install_data(details, custom_effect)
+        if data is not None:
+            await self.effect_set_raw(data)
+        if activate:
+            await self.set_effect(custom_effect.name)
+        return data is not None
+
+    async def effect_delete(self, name: str):
+        """Removed the specified effect from the device"""
+        await self._write({"command": "delete", "animName": name})
+        self.catalog.delete(name)
+
+    async def effect_rename(self, old_name: str, new_name: str):
+        """Renames the specified effect saved on the device to a new name"""
+        await self._write({"command": "rename", "animName": old_name, "newName": new_name})
+        self.catalog.rename(old_name, new_name)
+
+    async def effect_stream(self, delta: bool = False, keyframe_interval: int = 30, correction=None):
+        """Open an external control stream
+
+        delta - Only send the panels that changed since the last frame, plus a full keyframe every keyframe_interval frames
+        correction - A color.Correction for this device, applied to every streamed color"""
+        from app.nanoleaf.stream import AuroraStream
+
+        udp_info = await self._write({"command": "display", "animType": "extControl"})
+        return AuroraStream(udp_info["streamControlIpAddr"], udp_info["streamControlPort"],
+                            delta=delta, keyframe_interval=keyframe_interval,
+                            metrics=self._requester.metrics, correction=correction)
+
+    async def effect_stream_scheduler(self, fps: float = 30, delta: bool = False) -> StreamScheduler:
+        """Open an external control stream paced at the given frame rate.
+
+        Run it with start() or as a task with run_async(), then submit() frames to it."""
+        return StreamScheduler(await self.effect_stream(delta=delta), fps)
+
+
+class AsyncRhythm(AuroraObject):
+
+    def __init__(self, requester):
+        super().__init__(requester)
+
+    async def _get(self, endpoint):
+        return await self._requester.request(method="GET", endpoint=endpoint)
+
+    async def rhythm_connected(self):
+        """Returns True if the rhythm module is connected, False if it's not"""
+        return await self._get(endpoints.RHYTHM_CONNECTED)
+
+    async def rhythm_active(self):
+        """Returns True if the rhythm microphone is active, False if it's not"""
+        return await self._get(endpoints.RHYTHM_ACTIVE)
+
+    async def rhythm_id(self):
+        """Returns the ID of the rhythm module"""
+        return await self._get(endpoints.RHYTHM_ID)
+
+    async def rhythm_hardware_version(self):
+        """Returns the hardware version of the rhythm module"""
+        return await self._get(endpoints.RHYTHM_HARDWARE_VERSION)
+
+    async def rhythm_firmware_version(self):
+        """Returns the firmware version of the rhythm module"""
+        return await self._get(endpoints.RHYTHM_FIRMWARE_VERSION)
+
+    async def rhythm_aux_available(self):
+        """Returns True if an aux cable is connected to the rhythm module, False if it's not"""
+        return await self._get(endpoints.RHYTHM_AUX_AVAILABLE)
+
+    async def rhythm_mode(self):
+        """Returns the sound source of the rhythm module. 0 for microphone, 1 for aux cable"""
+        return await self._get(endpoints.RHYTHM_MODE)
+
+    async def set_rhythm_mode(self, value):
+        """Set the sound source of the rhythm module. 0 for microphone, 1 for aux cable"""
+        await self._requester.request(method="PUT", endpoint=endpoints.RHYTHM, data={"rhythmMode": value})
+
+    async def rhythm_position(self):
+        """Returns the position and orientation of the rhythm module represented in a dict.
+
+        x - X-coordinate
+        y - Y-coordinate
+        o - Rotational orientation
+        """
+        return await self._get(endpoints.RHYTHM_POSITION)
+
+
+class AsyncPanelLayout(AuroraObject):
+
+    def __init__(self, requester, rhythm):
+        super().__init__(requester)
+        self.rhythm = rhythm
+        self._geometry = None
+
+    async def _get(self, endpoint):
+        return await self._requester.request(method="GET", endpoint=endpoint)
+
+    async def orientation(self):
+        """Returns the orientation of the device (0-360)"""
+        return await self._get(endpoints.LAYOUT_ORIENTATION)
+
+    async def orientation_min(self):
+        """Returns the minimum orientation possible. (This always returns 0)"""
+        return await self._get(endpoints.LAYOUT_ORIENTATION_MIN)
+
+    async def orientation_max(self):
+        """Returns the maximum orientation possible. (This always returns 360)"""
+        return await self._get(endpoints.LAYOUT_ORIENTATION_MAX)
+
+    async def panel_count(self):
+        """Returns the number of panels connected to the device"""
+        return panel_count_from_snapshot(await self._requester.snapshot())
+
+    async def panel_length(self):
+        """Returns the length of a single panel. (This always returns 150)"""
+        return await self._get(endpoints.LAYOUT_PANEL_LENGTH)
+
+    async def panel_positions(self):
+        """Returns a list of all panels with their attributes represented in a dict.
+
+        panelId - Unique identifier for this panel
+        x - X-coordinate
+        y - Y-coordinate
+        o - Rotational orientation
+        """
+        return await self._get(endpoints.LAYOUT_PANEL_POSITIONS)
+
+    async def geometry(self, refresh: bool = False) -> LayoutGeometry:
+        """Returns the precomputed geometry of the layout: positions, neighbors, spatial queries and stream slots.
+
+        It's fetched in a single request and kept until refresh is True or invalidate_geometry() is called."""
+        if self._geometry is None or refresh:
+            self._geometry = geometry_from_snapshot(await self._requester.snapshot())
+        return self._geometry
+
+    def invalidate_geometry(self):
+        """Drops the cached geometry, for instance after panels were added or removed"""
+        self._geometry = None
+
+
+class AsyncAurora(AuroraObject):
+
+    def __init__(self, ip_address: str = None, auth_token: str = None, pool_size: int = 10,
+                 timeout=DEFAULT_TIMEOUT, cache_ttl: float = 0, catalog_path=None, metrics=None,
+                 retries: int = 0, backoff_factor: float = 0, retry_policy: RetryPolicy = None,
+                 circuit_breaker: CircuitBreaker = None):
+        super().__init__(AsyncRequester(ip_address, auth_token, pool_size=pool_size, timeout=timeout,
+                                        cache_ttl=cache_ttl, metrics=metrics, retries=retries,
+                                        backoff_factor=backoff_factor, retry_policy=retry_policy,
+                                        circuit_breaker=circuit_breaker))
+        self.state = AsyncState(self._requester)
+        self.effect = AsyncEffect(self._requester, EffectCatalog(catalog_path))
+        self.rhythm = AsyncRhythm(self._requester)
+        self.panel_layout = AsyncPanelLayout(self._requester, self.rhythm)
+
+    def __repr__(self):
+        return f"<AsyncAurora({self._requester.ip_address})>"
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """Closes the pooled connections to the device"""
+        await self._requester.close()
+
+    async def info(self):
+        """Returns the full Aurora Info request.
+
+        Useful for debugging since it's just a fat dump."""
+        return await self._requester.request(method="GET", endpoint=endpoints.INFO)
+
+    async def snapshot(self, max_age: float = None) -> dict:
+        """Returns the full Aurora Info request, fetched in a single round trip.
+
+        A cached copy is returned if it is younger than max_age (defaults to the cache TTL)."""
+        return await self._requester.snapshot(max_age)
+
+    def invalidate(self, endpoint: str = None):
+        """Drops the cached value of an endpoint, or the whole cache if none is given"""
+        self._requester.cache.invalidate(endpoint)
+
+    def events(self, event_types=ALL_EVENTS, **options) -> AsyncEventListener:
+        """Returns a listener for the device's event stream.
+
+        While it's connected, state, layout and active effect reads are served from pushed events instead of
+        requests. Iterate over it with async for, or run() it as a task."""
+        return AsyncEventListener(self, event_types, **options)
+
+    async def identify(self):
+        """Briefly flash the panels on and off"""
+        await self._requester.request(method="PUT", endpoint=endpoints.IDENTIFY, data={})
+
+    async def firmware(self):
+        """Returns the firmware version of the device"""
+        return (await self.snapshot(max_age=_STATIC))["firmwareVersion"]
+
+    async def model(self):
+        """Returns the model number of the device. (Always returns 'NL22')"""
+        return (await self.snapshot(max_age=_STATIC))["model"]
+
+    async def serial_number(self):
+        """Returns the serial number of the device"""
+        return (await self.snapshot(max_age=_STATIC))["serialNo"]
+
+    async def delete_user(self):
+        """CAUTION: Revokes your auth token from the device."""
+        await self._requester.request(method="DELETE", endpoint=endpoints.INFO)
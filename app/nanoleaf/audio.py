@@ -0,0 +1,370 @@
+import math
+import time
+import wave
+
+from app.nanoleaf import color
+from app.nanoleaf.metrics import Histogram
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Audio-reactive lighting computed on the host, for any audio source instead of the Rhythm module's microphone.
+# PCM chunks go into a ring buffer; every hop, an FFT over the newest window gives band energies and a
+# spectral-flux onset, which are mapped onto the panels by position and streamed as a single packet.
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1)
+
+# Panel orders the bands can be spread along
+LAYOUTS = ("x", "y", "radial")
+
+
+class AudioFrame:
+
+    __slots__ = ("bands", "level", "onset", "position")
+
+    def __init__(self, bands, level: float, onset: bool, position: int):
+        """The analysis of one window of audio.
+
+        bands - Energy of each band, from 0 to 1 relative to its recent peak
+        level - Mean of the bands
+        onset - True if a beat started in this window
+        position - Index of the window's last sample in the whole audio stream
+        """
+        self.bands = bands
+        self.level = level
+        self.onset = onset
+        self.position = position
+
+    def __repr__(self):
+        return f"<AudioFrame(level={self.level:.2f}, onset={self.onset}, position={self.position})>"
+
+
+class AudioAnalyzer:
+
+    def __init__(self, sample_rate: int = 44100, window: int = 1024, hop: int = 512, bands: int = 8,
+                 min_frequency: float = 40, max_frequency: float = 16000, channels: int = 1,
+                 onset_sensitivity: float = 1.5, onset_history: int = 43, min_onset_interval: float = 0.1,
+                 peak_decay: float = 0.995):
+        """Computes band energies and beat onsets from a stream of PCM samples.
+
+        window - FFT size in samples
+        hop - Samples between two analyses
+        bands - Number of logarithmically spaced bands between min_frequency and max_frequency
+        channels - Interleaved channels of the fed samples, which are mixed down to mono
+        onset_sensitivity - An onset is a spectral flux this many standard deviations above its recent mean
+        onset_history - Number of analyses the flux mean and deviation are taken over
+        min_onset_interval - Seconds after an onset during which no other onset is reported
+        peak_decay - How quickly each band's reference peak decays per analysis, adapting to the volume
+        """
+        if np is None:
+            raise ImportError("AudioAnalyzer requires numpy")
+        if hop > window:
+            raise ValueError("hop must not be larger than window")
+        self.sample_rate = sample_rate
+        self.window = window
+        self.hop = hop
+        self.channels = channels
+        self.onset_sensitivity = onset_sensitivity
+        self.min_onset_interval = min_onset_interval
+        self.peak_decay = peak_decay
+        self.position = 0
+        # Every sample is written twice, window samples apart, so the newest window is always one contiguous view
+        self._ring = np.zeros(2 * window, dtype=np.float32)
+        self._write = 0
+        self._pending = 0
+        self._taper = np.hanning(window).astype(np.float32)
+        self._edges = self.__band_edges(bands, min_frequency, max_frequency)
+        self._widths = np.diff(np.append(self._edges, self._stop)).astype(np.float32)
+        self._peaks = np.full(len(self._edges), 1e-6, dtype=np.float32)
+        self._previous = None
+        self._flux = np.zeros(onset_history, dtype=np.float32)
+        self._flux_count = 0
+        self._last_onset = -math.inf
+
+    def __repr__(self):
+        return f"<AudioAnalyzer({self.sample_rate}Hz, window={self.window}, hop={self.hop}, " \
+               f"bands={len(self._edges)})>"
+
+    @property
+    def band_count(self) -> int:
+        return len(self._edges)
+
+    @property
+    def band_frequencies(self) -> list:
+        """Returns the lower frequency of every band"""
+        return [float(edge) * self.sample_rate / self.window for edge in self._edges]
+
+    def feed(self, samples) -> list:
+        """Adds PCM samples and returns an AudioFrame for every hop they completed.
+
+        samples - int16 bytes, or an array of int16 or -1 to 1 float samples, interleaved if there are several
+                  channels
+        """
+        mono = self.__mono(samples)
+        frames = []
+        start = 0
+        while start < len(mono):
+            count = min(len(mono) - start, self.hop - self._pending)
+            self.__write(mono[start:start + count])
+            start += count
+            self._pending += count
+            self.position += count
+            if self._pending == self.hop:
+                self._pending = 0
+                frames.append(self.__analyze())
+        return frames
+
+    def reset(self):
+        """Forgets all audio fed so far"""
+        self._ring[:] = 0
+        self._write = self._pending = self.position = self._flux_count = 0
+        self._peaks[:] = 1e-6
+        self._previous = None
+        self._last_onset = -math.inf
+
+    def __mono(self, samples):
+        if isinstance(samples, (bytes, bytearray, memoryview)):
+            samples = np.frombuffer(samples, dtype=np.int16)
+        samples = np.asarray(samples)
+        if samples.dtype.kind in "iu":
+            samples = samples.astype(np.float32) / 32768
+        else:
+            samples = samples.astype(np.float32, copy=False)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        return samples.ravel()
+
+    def __write(self, chunk):
+        window = self.window
+        position = self._write
+        first = min(len(chunk), window - position)
+        self._ring[position:position + first] = chunk[:first]
+        self._ring[position + window:position + window + first] = chunk[:first]
+        rest = len(chunk) - first
+        if rest:
+            self._ring[:rest] = chunk[first:]
+            self._ring[window:window + rest] = chunk[first:]
+        self._write = (position + len(chunk)) % window
+
+    def __analyze(self) -> AudioFrame:
+        samples = self._ring[self._write:self._write + self.window]
+        spectrum = np.abs(np.fft.rfft(samples * self._taper))
+        power = np.add.reduceat(spectrum[:self._stop] ** 2, self._edges) / self._widths
+        energy = np.sqrt(power)
+
+        np.maximum(self._peaks * self.peak_decay, energy, out=self._peaks)
+        bands = energy / self._peaks
+
+        # Spectral flux: the summed increase of each band's energy since the last analysis
+        flux = 0.0 if self._previous is None else float(np.maximum(energy - self._previous, 0).sum())
+        self._previous = energy
+        onset = self.__is_onset(flux)
+        return AudioFrame(bands, float(bands.mean()), onset, self.position)
+
+    def __is_onset(self, flux):
+        history = self._flux[:min(self._flux_count, len(self._flux))]
+        onset = False
+        if len(history) >= 4:
+            threshold = history.mean() + self.onset_sensitivity * history.std()
+            now = self.position / self.sample_rate
+            if flux > threshold and flux > 1e-6 and now - self._last_onset >= self.min_onset_interval:
+                onset = True
+                self._last_onset = now
+        self._flux[self._flux_count % len(self._flux)] = flux
+        self._flux_count += 1
+        return onset
+
+    def __band_edges(self, bands, min_frequency, max_frequency):
+        nyquist = self.sample_rate / 2
+        max_frequency = min(max_frequency, nyquist)
+        frequencies = np.geomspace(min_frequency, max_frequency, bands + 1)
+        bins = np.rint(frequencies * self.window / self.sample_rate).astype(np.int64)
+        bins = np.clip(bins, 1, self.window // 2)
+        # Low bands can be narrower than a bin, so give every band at least one
+        for i in range(1, len(bins)):
+            bins[i] = max(bins[i], bins[i - 1] + 1)
+        self._stop = int(min(bins[-1], self.window // 2 + 1))
+        return bins[:-1][bins[:-1] < self._stop]
+
+
+class BandMapper:
+
+    def __init__(self, geometry, bands: int, layout: str = "x", hue_range=(240, 0), saturation: float = 100,
+                 floor: float = 0.05, onset_boost: float = 0.3, decay: float = 0.6):
+        """Maps band energies to panel colors by panel position.
+
+        geometry - LayoutGeometry of the panels, from PanelLayout.geometry()
+        bands - Number of bands of the analyzer
+        layout - Spread the bands from left to right ("x"), bottom to top ("y") or center to edge ("radial")
+        hue_range - Hue of the lowest and highest band
+        floor - Brightness of silent panels, from 0 to 1
+        onset_boost - Brightness added to every panel on an onset
+        decay - Share of the previous brightness kept per frame, so panels fall off smoothly after a peak
+        """
+        if np is None:
+            raise ImportError("BandMapper requires numpy")
+        if layout not in LAYOUTS:
+            raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+        self.geometry = geometry
+        self.panel_ids = np.asarray(geometry.panel_ids)
+        self.saturation = saturation
+        self.floor = floor
+        self.onset_boost = onset_boost
+        self.decay = decay
+        self.panel_bands = self.__assign(bands, layout)
+        start, end = hue_range
+        self._hues = (start + (end - start) * self.panel_bands / max(bands - 1, 1)) % 360
+        self._brightness = np.zeros(len(self.panel_ids), dtype=np.float32)
+
+    def __repr__(self):
+        return f"<BandMapper({len(self.panel_ids)} panels)>"
+
+    def colors(self, frame: AudioFrame):
+        """Returns the (N, 3) uint8 RGB colors of the panels for an AudioFrame, in panel_ids order"""
+        level = frame.bands[self.panel_bands]
+        if frame.onset:
+            level = level + self.onset_boost
+        brightness = self._brightness
+        np.maximum(brightness * self.decay, np.clip(level, 0, 1), out=brightness)
+        values = (self.floor + (1 - self.floor) * brightness) * 100
+        return color.hsv_to_rgb(self._hues, self.saturation, values)
+
+    def __assign(self, bands, layout):
+        x = np.frombuffer(self.geometry.x, dtype=np.float64)
+        y = np.frombuffer(self.geometry.y, dtype=np.float64)
+        if layout == "x":
+            key = x
+        elif layout == "y":
+            key = y
+        else:
+            key = np.hypot(x - x.mean(), y - y.mean())
+        if len(key) == 0:
+            return np.zeros(0, dtype=np.int64)
+        span = key.max() - key.min()
+        if span == 0:
+            return np.zeros(len(key), dtype=np.int64)
+        return np.minimum(((key - key.min()) / span * bands).astype(np.int64), bands - 1)
+
+
+class LatencyStats:
+
+    def __init__(self):
+        """Time from capturing a chunk of audio to sending the packet it produced"""
+        self.histogram = Histogram(LATENCY_BUCKETS)
+        self.max = 0.0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.late_chunks = 0
+
+    def __repr__(self):
+        return f"<LatencyStats(p50={self.percentile(50) * 1000:.1f}ms, p99={self.percentile(99) * 1000:.1f}ms, " \
+               f"max={self.max * 1000:.1f}ms)>"
+
+    def percentile(self, percent: float) -> float:
+        return self.histogram.percentile(percent)
+
+    def _record(self, latency: float):
+        self.histogram.observe(latency)
+        self.max = max(self.max, latency)
+        self.frames_sent += 1
+
+
+class AudioReactive:
+
+    def __init__(self, geometry, stream, sample_rate: int = 44100, channels: int = 1, window: int = 1024,
+                 hop: int = 512, bands: int = 8, layout: str = "x", max_latency: float = 0.05,
+                 analyzer_options: dict = None, **mapper_options):
+        """Streams audio-reactive colors to the panels of a layout.
+
+        geometry - LayoutGeometry of the panels, from PanelLayout.geometry()
+        stream - AuroraStream to send frames to, from Effect.effect_stream()
+        max_latency - Chunks older than this many seconds when they're processed are only analyzed, not sent,
+                      so the lights never lag behind the audio
+        analyzer_options - Further AudioAnalyzer arguments, such as onset_sensitivity or peak_decay
+        Other keyword arguments are passed to BandMapper.
+
+        Feed it with process() from an audio callback, or play a file or pipe through run().
+        """
+        self.analyzer = AudioAnalyzer(sample_rate, window, hop, bands, channels=channels, **(analyzer_options or {}))
+        self.mapper = BandMapper(geometry, self.analyzer.band_count, layout, **mapper_options)
+        self.stream = stream
+        self.max_latency = max_latency
+        self.stats = LatencyStats()
+        self.last_frame = None
+
+    def __repr__(self):
+        return f"<AudioReactive({self.analyzer!r}, {self.stats!r})>"
+
+    def process(self, samples, captured_at: float = None):
+        """Analyzes a chunk of PCM samples and sends the newest resulting frame.
+
+        captured_at - perf_counter() time the chunk's last sample was captured (defaults to now)
+
+        Returns the AudioFrame that was sent, or None. When a chunk spans several hops, only the newest frame is
+        sent, but onsets in any of them are kept."""
+        if captured_at is None:
+            captured_at = time.perf_counter()
+        frames = self.analyzer.feed(samples)
+        if not frames:
+            return None
+        frame = frames[-1]
+        if not frame.onset and any(skipped.onset for skipped in frames):
+            frame = AudioFrame(frame.bands, frame.level, True, frame.position)
+        self.stats.frames_skipped += len(frames) - 1
+        if time.perf_counter() - captured_at > self.max_latency:
+            self.stats.late_chunks += 1
+            return None
+        self.stream.panels_set(self.mapper.panel_ids, self.mapper.colors(frame))
+        self.stats._record(time.perf_counter() - captured_at)
+        self.last_frame = frame
+        return frame
+
+    def run(self, chunks, realtime: bool = True):
+        """Processes every chunk of an iterable such as read_wave() or read_pcm().
+
+        realtime - Paces the chunks at the sample rate, for sources that are read faster than they play"""
+        started = time.perf_counter()
+        played = 0
+        channels = self.analyzer.channels
+        for chunk in chunks:
+            if isinstance(chunk, (bytes, bytearray, memoryview)):
+                chunk = np.frombuffer(chunk, dtype=np.int16)
+            played += len(chunk) // channels
+            if realtime:
+                delay = started + played / self.analyzer.sample_rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.process(chunk)
+        return self.stats
+
+
+def read_wave(path, chunk: int = 512):
+    """Yields int16 arrays of chunk frames from a 16-bit PCM WAV file, channels interleaved"""
+    with wave.open(str(path), "rb") as source:
+        if source.getsampwidth() != 2:
+            raise ValueError("Only 16-bit PCM WAV files are supported")
+        while True:
+            data = source.readframes(chunk)
+            if not data:
+                return
+            yield np.frombuffer(data, dtype=np.int16)
+
+
+def read_pcm(pipe, chunk: int = 512, channels: int = 1):
+    """Yields int16 arrays of chunk frames of raw signed 16-bit little-endian PCM read from a binary file or pipe,
+    such as sys.stdin.buffer"""
+    size = chunk * channels * 2
+    remainder = b""
+    while True:
+        data = pipe.read(size - len(remainder))
+        if not data:
+            return
+        data = remainder + data
+        usable = len(data) - len(data) % (2 * channels)
+        remainder = data[usable:]
+        if usable:
+            yield np.frombuffer(data[:usable], dtype=np.int16)
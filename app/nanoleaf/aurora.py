@@ -1,29 +1,53 @@
+from app.nanoleaf import endpoints
 from app.nanoleaf.model import AuroraObject
 from app.nanoleaf.state import State
 from app.nanoleaf.rhythm import Rhythm
 from app.nanoleaf.effect import Effect
+from app.nanoleaf.catalog import EffectCatalog
+from app.nanoleaf.events import ALL_EVENTS, EventListener
 from app.nanoleaf.layout import PanelLayout
 
 from app.nanoleaf.utils import Requester
+from app.nanoleaf.utils.resilience import DEFAULT_TIMEOUT, CircuitBreaker, RetryPolicy
 
 
 # Primary interface for an Aurora light
 # For instructions or bug reports, please visit
 # https://github.com/software-2/nanoleaf
 
+# Fields that never change while the device is running are served from any cached snapshot
+_STATIC = float("inf")
+
 
 class Aurora(AuroraObject):
 
-    def __init__(self, ip_address: str = None, auth_token: str = None):
-        super().__init__(Requester(ip_address, auth_token))
+    def __init__(self, ip_address: str = None, auth_token: str = None, pool_size: int = 10,
+                 timeout=DEFAULT_TIMEOUT, retries: int = 0, backoff_factor: float = 0, cache_ttl: float = 0,
+                 requester: Requester = None, catalog_path=None, metrics=None,
+                 retry_policy: RetryPolicy = None, circuit_breaker: CircuitBreaker = None):
+        if requester is None:
+            requester = Requester(ip_address, auth_token, pool_size=pool_size, timeout=timeout,
+                                  retries=retries, backoff_factor=backoff_factor, cache_ttl=cache_ttl,
+                                  metrics=metrics, retry_policy=retry_policy, circuit_breaker=circuit_breaker)
+        super().__init__(requester)
         self.state = State(self._requester)
-        self.effect = Effect(self._requester)
+        self.effect = Effect(self._requester, EffectCatalog(catalog_path))
         self.rhythm = Rhythm(self._requester)
         self.panel_layout = PanelLayout(self._requester, self.rhythm)
 
     def __repr__(self):
         return f"<Aurora({self._requester.ip_address})>"
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Closes the pooled connections to the device"""
+        self._requester.close()
+
     @property
     def info(self):
         """Returns the full Aurora Info request. 
@@ -31,24 +55,41 @@ class Aurora(AuroraObject):
         Useful for debugging since it's just a fat dump."""
         return self._requester.request(method="GET")
 
+    def snapshot(self, max_age: float = None) -> dict:
+        """Returns the full Aurora Info request, fetched in a single round trip.
+
+        A cached copy is returned if it is younger than max_age (defaults to the cache TTL)."""
+        return self._requester.snapshot(max_age)
+
+    def invalidate(self, endpoint: str = None):
+        """Drops the cached value of an endpoint, or the whole cache if none is given"""
+        self._requester.cache.invalidate(endpoint)
+
+    def events(self, event_types=ALL_EVENTS, **options) -> EventListener:
+        """Returns a listener for the device's event stream.
+
+        While it's connected, state, layout and active effect reads are served from pushed events instead of
+        requests. Call start() on it, or use it as a context manager."""
+        return EventListener(self, event_types, **options)
+
     def identify(self):
         """Briefly flash the panels on and off"""
-        self._requester.request(method="PUT", endpoint="identify", data={})
+        self._requester.request(method="PUT", endpoint=endpoints.IDENTIFY, data={})
 
     @property
     def firmware(self):
         """Returns the firmware version of the device"""
-        return self._requester.request(method="GET")["firmwareVersion"]
+        return self.snapshot(max_age=_STATIC)["firmwareVersion"]
 
     @property
     def model(self):
         """Returns the model number of the device. (Always returns 'NL22')"""
-        return self._requester.request(method="GET")["model"]
+        return self.snapshot(max_age=_STATIC)["model"]
 
     @property
     def serial_number(self):
         """Returns the serial number of the device"""
-        return self._requester.request(method="GET")["serialNo"]
+        return self.snapshot(max_age=_STATIC)["serialNo"]
 
     def delete_user(self):
         """CAUTION: Revokes your auth token from the device."""
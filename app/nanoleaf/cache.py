@@ -0,0 +1,170 @@
+import copy
+import threading
+import time
+
+from app.nanoleaf import endpoints
+
+
+# Read-through cache of the Aurora info document.
+# Every GET endpoint of the API is a path into the document returned by GET /api/v1/<auth_token>/,
+# so one round trip can serve all of them.
+
+MISSING = object()
+
+# State changes that move the device out of its current color mode or effect
+_COLOR_KEYS = ("hue", "sat", "ct")
+
+
+def resolve(document, endpoint: str):
+    """Returns the value at an endpoint path inside the info document.
+
+    Raises KeyError if the document doesn't contain the endpoint."""
+    value = document
+    for key in endpoint.split("/"):
+        if key:
+            try:
+                value = value[key]
+            except TypeError:
+                raise KeyError(endpoint)
+    return value
+
+
+def _within(endpoint: str, prefix: str) -> bool:
+    return endpoint == prefix or endpoint.startswith(prefix + "/")
+
+
+def _overlaps(endpoint: str, other: str) -> bool:
+    if endpoint == "" or other == "" or endpoint == other:
+        return True
+    return endpoint.startswith(other + "/") or other.startswith(endpoint + "/")
+
+
+class StateCache:
+
+    def __init__(self, ttl: float = 0):
+        """Caches the info document of a single device.
+
+        ttl - Seconds a fetched document is served for. 0 disables read-through caching.
+        """
+        self.ttl = ttl
+        self._document = None
+        self._fetched_at = 0.0
+        self._stale = set()
+        self._pinned = set()
+        self._lock = threading.Lock()
+
+    @property
+    def age(self) -> float:
+        """Returns the number of seconds since the document was fetched"""
+        if self._document is None:
+            return float("inf")
+        return time.monotonic() - self._fetched_at
+
+    def covers(self, endpoint: str) -> bool:
+        """Returns True if GET requests to an endpoint should be read through the cache"""
+        return bool(self.ttl) or self.pinned(endpoint)
+
+    def pinned(self, endpoint: str) -> bool:
+        """Returns True if an endpoint is kept up to date by pushed events"""
+        return any(_within(endpoint, prefix) for prefix in tuple(self._pinned))
+
+    def pin(self, prefixes):
+        """Serves the endpoints under the given prefixes regardless of age, while events keep them up to date"""
+        with self._lock:
+            self._pinned.update(prefixes)
+
+    def unpin(self, prefixes=None):
+        """Stops serving endpoints regardless of age, for instance when the event stream disconnects"""
+        with self._lock:
+            if prefixes is None:
+                self._pinned.clear()
+            else:
+                self._pinned.difference_update(prefixes)
+
+    def lookup(self, endpoint: str, max_age: float = None):
+        """Returns a copy of the cached value of an endpoint, or MISSING.
+
+        max_age - Overrides the cache TTL for this lookup. Pinned endpoints never expire."""
+        if max_age is None:
+            max_age = self.ttl
+        with self._lock:
+            if self._document is None:
+                return MISSING
+            if time.monotonic() - self._fetched_at > max_age and not self.pinned(endpoint):
+                return MISSING
+            if any(_overlaps(endpoint, stale) for stale in self._stale):
+                return MISSING
+            try:
+                return copy.deepcopy(resolve(self._document, endpoint))
+            except KeyError:
+                return MISSING
+
+    def store(self, document: dict):
+        """Replaces the cached document with a freshly fetched one"""
+        if not isinstance(document, dict):
+            return
+        with self._lock:
+            self._document = copy.deepcopy(document)
+            self._fetched_at = time.monotonic()
+            self._stale.clear()
+
+    def write(self, endpoint: str, value):
+        """Writes a known value through to the cached document"""
+        with self._lock:
+            if self._document is None:
+                return
+            *parents, key = endpoint.split("/")
+            try:
+                node = resolve(self._document, "/".join(parents))
+            except KeyError:
+                self._stale.add(endpoint)
+                return
+            if not isinstance(node, dict):
+                self._stale.add(endpoint)
+                return
+            node[key] = copy.deepcopy(value)
+
+    def invalidate(self, endpoint: str = None):
+        """Marks an endpoint (and everything below it) as stale. Invalidates everything if none is given."""
+        with self._lock:
+            if endpoint is None or endpoint == endpoints.INFO:
+                self._document = None
+                self._stale.clear()
+            else:
+                self._stale.add(endpoint)
+
+    def update(self, method: str, endpoint: str, data, output):
+        """Applies the result of a successful request to the cache"""
+        if method == "GET":
+            if endpoint == endpoints.INFO:
+                self.store(output)
+            else:
+                self.write(endpoint, output)
+        elif method == "PUT":
+            self.__apply(endpoint, data or {})
+        else:
+            self.invalidate()
+
+    def __apply(self, endpoint, data):
+        if endpoint == endpoints.STATE:
+            for key, body in data.items():
+                if key == "on" and not isinstance(body, dict):
+                    self.write(endpoints.STATE_ON, body)
+                elif isinstance(body, dict) and set(body) == {"value"}:
+                    self.write(f"{endpoint}/{key}/value", body["value"])
+                else:
+                    self.invalidate(f"{endpoint}/{key}")
+                if key in _COLOR_KEYS:
+                    self.invalidate(endpoints.STATE_COLOR_MODE)
+                    self.invalidate(endpoints.EFFECTS_SELECT)
+        elif endpoint == endpoints.EFFECTS:
+            if "select" in data:
+                self.write(endpoints.EFFECTS_SELECT, data["select"])
+                self.invalidate(endpoints.STATE_COLOR_MODE)
+            command = data.get("write", {}).get("command")
+            if command is not None and command not in ("request", "requestAll"):
+                self.invalidate(endpoints.EFFECTS)
+                self.invalidate(endpoints.STATE_COLOR_MODE)
+        elif endpoint == endpoints.RHYTHM:
+            for key, value in data.items():
+                self.write(f"{endpoint}/{key}", value)
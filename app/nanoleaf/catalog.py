@@ -0,0 +1,176 @@
+import copy
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+# Local copy of the effects stored on a device.
+# The effect list is diffed against the device's, details are only fetched for effects that aren't known yet,
+# and the catalog follows every add, rename and delete sent through Effect.
+
+# Above this share of unknown effects, one requestAll is cheaper than a request per effect
+_REQUEST_ALL_RATIO = 0.5
+
+
+class EffectCatalog:
+
+    def __init__(self, path=None, max_age: float = 60):
+        """Caches effect names and details.
+
+        path - JSON file the catalog is kept in between runs, or None to keep it in memory only
+        max_age - Seconds the effect list is trusted before it's diffed against the device again
+        """
+        self.path = None if path is None else Path(path).expanduser()
+        self.max_age = max_age
+        self._names = []
+        self._details = {}
+        # Details read from disk, held back until the effect list was diffed against the device
+        self._unverified = set()
+        self._synced_at = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def __repr__(self):
+        return f"<EffectCatalog({len(self._names)} effects)>"
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    @property
+    def names(self) -> list:
+        """Returns the names of the effects on the device"""
+        with self._lock:
+            return list(self._names)
+
+    @property
+    def fresh(self) -> bool:
+        """Returns True if the effect list was synced within max_age"""
+        return self._synced_at is not None and time.monotonic() - self._synced_at <= self.max_age
+
+    def details(self, name: str):
+        """Returns a copy of the details of an effect, or None if they haven't been fetched"""
+        with self._lock:
+            if name in self._unverified:
+                return None
+            return copy.deepcopy(self._details.get(name))
+
+    def all_details(self) -> dict:
+        """Returns the details of every effect, shaped like the device's requestAll response"""
+        with self._lock:
+            return {"animations": [copy.deepcopy(self._details[name]) for name in self._names
+                                   if name in self._details and name not in self._unverified]}
+
+    def missing(self) -> list:
+        """Returns the names of the effects whose details haven't been fetched"""
+        with self._lock:
+            return [name for name in self._names if name not in self._details or name in self._unverified]
+
+    def prefer_request_all(self) -> bool:
+        """Returns True if fetching every effect at once is cheaper than fetching the missing ones"""
+        return len(self.missing()) > len(self._names) * _REQUEST_ALL_RATIO
+
+    def sync_names(self, names: list) -> list:
+        """Diffs the device's effect list against the catalog.
+
+        Details of removed effects are dropped. Returns the names whose details need to be fetched."""
+        if not isinstance(names, list):
+            return []
+        with self._lock:
+            changed = names != self._names
+            self._names = list(names)
+            for name in set(self._details) - set(names):
+                del self._details[name]
+            self._unverified.clear()
+            self._synced_at = time.monotonic()
+        if changed:
+            self.save()
+        return self.missing()
+
+    def store(self, name: str, details: dict):
+        """Stores the details of an effect fetched from the device"""
+        if not isinstance(details, dict):
+            return
+        with self._lock:
+            self._details[name] = copy.deepcopy(details)
+            self._unverified.discard(name)
+            if name not in self._names:
+                self._names.append(name)
+        self.save()
+
+    def store_all(self, response: dict):
+        """Stores every effect of a requestAll response"""
+        if not isinstance(response, dict):
+            return
+        with self._lock:
+            for details in response.get("animations", []):
+                name = details.get("animName")
+                if name is not None:
+                    self._details[name] = copy.deepcopy(details)
+                    self._unverified.discard(name)
+        self.save()
+
+    def rename(self, old_name: str, new_name: str):
+        with self._lock:
+            if old_name in self._names:
+                self._names[self._names.index(old_name)] = new_name
+            details = self._details.pop(old_name, None)
+            if old_name in self._unverified:
+                self._unverified.discard(old_name)
+                self._unverified.add(new_name)
+            if details is not None:
+                details["animName"] = new_name
+                self._details[new_name] = details
+        self.save()
+
+    def delete(self, name: str):
+        with self._lock:
+            if name in self._names:
+                self._names.remove(name)
+            self._details.pop(name, None)
+            self._unverified.discard(name)
+        self.save()
+
+    def record_write(self, effect_data: dict):
+        """Applies an effect command sent to the device with effect_set_raw()"""
+        command = effect_data.get("command")
+        name = effect_data.get("animName")
+        if command == "add" and name is not None:
+            self.store(name, {key: value for key, value in effect_data.items() if key != "command"})
+        elif command == "delete" and name is not None:
+            self.delete(name)
+        elif command == "rename" and name is not None:
+            self.rename(name, effect_data.get("newName"))
+
+    def invalidate(self):
+        """Forces the next read to diff the effect list against the device"""
+        self._synced_at = None
+
+    def load(self):
+        """Reads the catalog from disk.
+
+        The details aren't served until sync_names() has diffed the effect list against the device."""
+        if self.path is None or not self.path.exists():
+            return
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        with self._lock:
+            self._names = data.get("names", [])
+            self._details = data.get("details", {})
+            self._unverified = set(self._details)
+
+    def save(self):
+        """Writes the catalog to disk"""
+        if self.path is None:
+            return
+        with self._lock:
+            data = {"names": self._names, "details": self._details}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(".tmp")
+            with open(temp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
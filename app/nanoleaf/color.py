@@ -0,0 +1,151 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Batched color conversions for streaming many panels at once.
+# Hue is in degrees (0-360), saturation and brightness in percent (0-100) like the device's state,
+# and RGB colors are (N, 3) arrays of 0-255 values. 8-bit paths go through lookup tables built on first use.
+# The results can be passed straight to State.rgb and AuroraStream.
+
+# Range of kelvin_to_rgb(), beyond which the approximation doesn't hold
+MIN_KELVIN = 1000
+MAX_KELVIN = 40000
+
+_srgb_table = None
+_kelvin_table = None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Batched color conversions require numpy")
+
+
+def hsv_to_rgb(hue, saturation, brightness):
+    """Converts arrays of hue, saturation and brightness to an (N, 3) uint8 RGB array.
+
+    Gives the same values as state.rgb_from_hsv for every color."""
+    _require_numpy()
+    h = np.asarray(hue, dtype=np.float64) / 360
+    s = np.asarray(saturation, dtype=np.float64) / 100
+    v = np.asarray(brightness, dtype=np.float64) / 100
+    h, s, v = np.broadcast_arrays(h, s, v)
+    # Same steps as colorsys.hsv_to_rgb, so the results match to the last bit
+    sector = np.floor(h * 6.0)
+    f = (h * 6.0) - sector
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    sector = sector.astype(np.int64) % 6
+    channels = np.stack((v, q, p, p, t, v,
+                         t, v, v, q, p, p,
+                         p, p, t, v, v, q))
+    channels = channels.reshape((3, 6) + h.shape)
+    rgb = np.take_along_axis(channels, sector[np.newaxis, np.newaxis], axis=1)[:, 0]
+    return np.moveaxis(np.floor(rgb * 255), 0, -1).astype(np.uint8)
+
+
+def rgb_to_hsv(colors):
+    """Converts an (N, 3) RGB array to an (N, 3) float array of hue, saturation and brightness"""
+    _require_numpy()
+    rgb = np.asarray(colors, dtype=np.float64)[..., :3] / 255
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+    span = maxc - minc
+    gray = span == 0
+    safe_span = np.where(gray, 1, span)
+    rc = (maxc - r) / safe_span
+    gc = (maxc - g) / safe_span
+    bc = (maxc - b) / safe_span
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(gray, 0.0, (h / 6.0) % 1.0)
+    s = np.where(maxc == 0, 0.0, span / np.where(maxc == 0, 1, maxc))
+    return np.stack((h * 360, s * 100, maxc * 100), axis=-1)
+
+
+def srgb_to_linear(colors):
+    """Converts 0-255 sRGB values to 0-1 linear light"""
+    global _srgb_table
+    _require_numpy()
+    colors = np.asarray(colors)
+    if colors.dtype == np.uint8:
+        if _srgb_table is None:
+            _srgb_table = _srgb_to_linear(np.arange(256))
+        return _srgb_table[colors]
+    return _srgb_to_linear(colors)
+
+
+def _srgb_to_linear(colors):
+    c = np.asarray(colors, dtype=np.float64) / 255
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+
+def linear_to_srgb(values):
+    """Converts 0-1 linear light to 0-255 sRGB uint8 values"""
+    _require_numpy()
+    c = np.clip(np.asarray(values, dtype=np.float64), 0, 1)
+    c = np.where(c <= 0.0031308, c * 12.92, 1.055 * c ** (1 / 2.4) - 0.055)
+    return np.rint(c * 255).astype(np.uint8)
+
+
+def kelvin_to_rgb(kelvin):
+    """Converts color temperatures in Kelvin to RGB, a (3,) uint8 array for a single temperature or (N, 3) for many.
+
+    Temperatures are rounded to whole degrees and clipped to MIN_KELVIN-MAX_KELVIN."""
+    global _kelvin_table
+    _require_numpy()
+    if _kelvin_table is None:
+        _kelvin_table = _kelvin_to_rgb(np.arange(MIN_KELVIN, MAX_KELVIN + 1, dtype=np.float64))
+    kelvin = np.clip(np.rint(np.asarray(kelvin, dtype=np.float64)), MIN_KELVIN, MAX_KELVIN).astype(np.intp)
+    return _kelvin_table[kelvin - MIN_KELVIN]
+
+
+def _kelvin_to_rgb(kelvin):
+    # Tanner Helland's fit of blackbody colors
+    t = kelvin / 100
+    warm = t <= 66
+    red = np.where(warm, 255, 329.698727446 * np.maximum(t - 60, 1e-9) ** -0.1332047592)
+    green = np.where(warm, 99.4708025861 * np.log(t) - 161.1195681661,
+                     288.1221695283 * np.maximum(t - 60, 1e-9) ** -0.0755148492)
+    blue = np.where(t >= 66, 255,
+                    np.where(t <= 19, 0, 138.5177312231 * np.log(np.maximum(t - 10, 1e-9)) - 305.0447927307))
+    return np.rint(np.clip(np.stack((red, green, blue), axis=-1), 0, 255)).astype(np.uint8)
+
+
+class Correction:
+
+    def __init__(self, gamma: float = 1.0, white_balance=(255, 255, 255), brightness: float = 1.0):
+        """Per-device color correction applied through one 256-entry lookup table per channel.
+
+        gamma - Each channel is raised to this power (2.2 for panels that look washed out in the mid tones)
+        white_balance - RGB the device should show for full white, such as kelvin_to_rgb(5000)
+        brightness - Scales every channel, from 0 to 1
+
+        Set it as AuroraStream.correction to correct every color that is streamed."""
+        _require_numpy()
+        self.gamma = gamma
+        self.white_balance = tuple(int(channel) for channel in white_balance[:3])
+        self.brightness = brightness
+        levels = (np.arange(256, dtype=np.float64) / 255) ** gamma
+        scale = np.asarray(self.white_balance, dtype=np.float64) * brightness
+        self.table = np.rint(np.clip(np.outer(scale, levels), 0, 255)).astype(np.uint8)
+        self._flat = self.table.ravel()
+        self._offsets = np.array([0, 256, 512], dtype=np.intp)
+        self._rows = self.table.tolist()
+
+    def __repr__(self):
+        return f"<Correction(gamma={self.gamma}, white_balance={self.white_balance}, brightness={self.brightness})>"
+
+    def __call__(self, colors):
+        """Corrects an (N, 3) RGB or (N, 4) RGBW uint8 array, leaving the white channel as it is"""
+        colors = np.asarray(colors, dtype=np.uint8)
+        corrected = colors.copy()
+        corrected[..., :3] = self._flat[colors[..., :3] + self._offsets]
+        return corrected
+
+    def correct(self, red: int, green: int, blue: int) -> tuple:
+        """Corrects a single color"""
+        rows = self._rows
+        return rows[0][red], rows[1][green], rows[2][blue]
@@ -0,0 +1,134 @@
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Presents one canvas of panels spread across several Auroras.
+# Each frame is split per device and every device's packet is sent back-to-back,
+# so all controllers receive the frame as close to the same instant as possible.
+
+
+class SkewStats:
+
+    def __init__(self):
+        self.frames = 0
+        self.last = 0.0
+        self.mean = 0.0
+        self.max = 0.0
+        self.offsets = {}
+
+    def __repr__(self):
+        return f"<SkewStats(last={self.last * 1000:.3f}ms, mean={self.mean * 1000:.3f}ms, max={self.max * 1000:.3f}ms)>"
+
+    def as_dict(self) -> dict:
+        """Returns the statistics as a dict"""
+        return {"frames": self.frames, "last": self.last, "mean": self.mean, "max": self.max,
+                "offsets": dict(self.offsets)}
+
+    def _record(self, send_times: list):
+        """Records the (device, time) each device's packet was sent in one frame"""
+        start = send_times[0][1]
+        skew = send_times[-1][1] - start
+        self.frames += 1
+        self.last = skew
+        self.max = max(self.max, skew)
+        self.mean += (skew - self.mean) / self.frames
+        for device, sent in send_times:
+            offset = self.offsets.get(device, 0.0)
+            self.offsets[device] = offset + (sent - start - offset) / self.frames
+
+
+class StreamCoordinator:
+
+    def __init__(self, streams: dict = None, canvas=()):
+        """Sends frames of a global panel canvas to several streams from one clock tick.
+
+        streams - Maps a device name to its AuroraStream
+        canvas - (device name, panel ID) of every canvas position, in order
+        """
+        self.streams = dict(streams or {})
+        self.skew = SkewStats()
+        self._canvas = []
+        self._routes = []
+        self.set_canvas(canvas)
+
+    def __len__(self):
+        return len(self._canvas)
+
+    @property
+    def canvas(self) -> list:
+        """Returns the (device name, panel ID) of every canvas position"""
+        return list(self._canvas)
+
+    def add_stream(self, device, stream):
+        """Adds a device's stream. Call set_canvas() afterwards to map its panels."""
+        self.streams[device] = stream
+
+    def set_canvas(self, canvas):
+        """Maps canvas positions to (device name, panel ID) pairs"""
+        self._canvas = [(device, panel_id) for device, panel_id in canvas]
+        indices = {}
+        for index, (device, panel_id) in enumerate(self._canvas):
+            if device not in self.streams:
+                raise KeyError(f"No stream for device {device!r}")
+            indices.setdefault(device, []).append(index)
+        self._routes = []
+        for device, stream in self.streams.items():
+            device_indices = indices.get(device, [])
+            panel_ids = [self._canvas[index][1] for index in device_indices]
+            # Reserve frame buffer slots in canvas order so whole frames take the contiguous fast path
+            for panel_id in panel_ids:
+                stream.frame.slot(panel_id)
+            if np is not None:
+                device_indices = np.asarray(device_indices, dtype=np.intp)
+                panel_ids = np.asarray(panel_ids)
+            self._routes.append((device, stream, device_indices, panel_ids))
+
+    def present(self, colors, transition_times=None):
+        """Sends a whole canvas frame. colors is an (N, 3) RGB or (N, 4) RGBW array in canvas order."""
+        self.panels_set(None, colors, transition_times)
+
+    def panels_set(self, canvas_indices, colors, transition_times=None):
+        """Sends the colors of the given canvas positions (or the whole canvas if None) to every device"""
+        if canvas_indices is None:
+            self.__prepare_canvas(colors, transition_times)
+        else:
+            self.__prepare_positions(canvas_indices, colors, transition_times)
+
+        send_times = []
+        for device, stream, _, _ in self._routes:
+            if stream.frame.pending_count:
+                stream.panel_strobe()
+                send_times.append((device, time.perf_counter()))
+        if send_times:
+            self.skew._record(send_times)
+
+    def __prepare_canvas(self, colors, transition_times):
+        if np is None:
+            self.__prepare_positions(range(len(self._canvas)), colors, transition_times)
+            return
+        colors = np.asarray(colors, dtype=np.uint8)
+        if transition_times is not None and np.ndim(transition_times):
+            transition_times = np.asarray(transition_times, dtype=np.uint8)
+        for _, stream, device_indices, panel_ids in self._routes:
+            if len(device_indices) == 0:
+                continue
+            times = transition_times
+            if times is not None and np.ndim(times):
+                times = times[device_indices]
+            stream.panels_prepare(panel_ids, colors[device_indices], times)
+
+    def __prepare_positions(self, canvas_indices, colors, transition_times):
+        single_transition = transition_times is None or isinstance(transition_times, int)
+        for i, index in enumerate(canvas_indices):
+            device, panel_id = self._canvas[index]
+            color = colors[i]
+            white = color[3] if len(color) > 3 else 0
+            if single_transition:
+                transition_time = 1 if transition_times is None else transition_times
+            else:
+                transition_time = transition_times[i]
+            self.streams[device].panel_prepare(panel_id, color[0], color[1], color[2], white, transition_time)
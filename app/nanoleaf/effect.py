@@ -1,65 +1,93 @@
+from app.nanoleaf import endpoints
+from app.nanoleaf.animation import CustomEffect, is_installed
+from app.nanoleaf.catalog import EffectCatalog
+from app.nanoleaf.exceptions import ResourceNotFoundException
 from app.nanoleaf.model import AuroraObject
-import socket
+from app.nanoleaf.scheduler import StreamScheduler
 import random
 
 
-class AuroraStream:
-    def __init__(self, addr: str, port: int):
-        self._prepare = []
-        self.addr = (addr, port)
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.settimeout(1)
+RESERVED_EFFECT_NAMES = ["*Static*", "*Dynamic*", "*Solid*"]
 
-    def __send(self, msg: bytes):
-        self.sock.sendto(msg, self.addr)
 
-    def panel_set(self, panel_id: int, red: int, green: int, blue: int,
-                  white: int = 0, transition_time: int = 1):
-        b = bytes([1, panel_id, 1, red, green, blue, white, transition_time])
-        self.__send(b)
+def __getattr__(name):
+    # AuroraStream is still importable from here, but stream.py is only loaded once it's asked for
+    if name == "AuroraStream":
+        from app.nanoleaf.stream import AuroraStream
+        return AuroraStream
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    def panel_prepare(self, panel_id: int, red: int, green: int, blue: int,
-                      white: int = 0, transition_time: int = 1):
-        self._prepare = self._prepare + [panel_id, 1, red, green, blue, white, transition_time]
 
-    def panel_strobe(self):
-        data = [len(self._prepare)] + self._prepare
-        self._prepare = []
-        self.__send(bytes(data))
+def select_data(effect_name: str) -> dict:
+    """Returns the request body that selects the named effect"""
+    return {"select": effect_name}
+
+
+def write_data(effect_data: dict) -> dict:
+    """Returns the request body that sends an effect command to the device"""
+    return {"write": effect_data}
+
+
+def details_request(name: str) -> dict:
+    """Returns the effect command that fetches the details of the named effect"""
+    return {"command": "request", "animName": name}
+
+
+def details_need_sync(catalog: EffectCatalog, refresh: bool = False) -> bool:
+    """Returns True if the effect list has to be diffed against the device before details are served"""
+    return not refresh and not catalog.fresh
+
+
+def cached_details(catalog: EffectCatalog, name: str, refresh: bool = False):
+    """Returns the catalog's details of an effect, or None if they have to be fetched from the device"""
+    return None if refresh else catalog.details(name)
+
+
+def install_data(details, custom_effect: CustomEffect):
+    """Returns the effect command that uploads a CustomEffect, or None if the details show it's already installed"""
+    return None if is_installed(details, custom_effect) else custom_effect.compile()
+
+
+def choose_random_effect(effect_list: list, active_effect: str) -> str:
+    """Picks an effect from the list that isn't the active one"""
+    if active_effect not in RESERVED_EFFECT_NAMES:
+        effect_list = [name for name in effect_list if name != active_effect]
+    return random.choice(effect_list)
 
 
 class Effect(AuroraObject):
 
-    def __init__(self, requester):
+    def __init__(self, requester, catalog: EffectCatalog = None):
         super().__init__(requester)
+        self.catalog = EffectCatalog() if catalog is None else catalog
 
-    _reserved_effect_names = ["*Static*", "*Dynamic*", "*Solid*"]
+    _reserved_effect_names = RESERVED_EFFECT_NAMES
 
     @property
     def effect(self):
         """Returns the active effect"""
-        return self._requester.request(method="GET", endpoint="effects/select")
+        return self._requester.request(method="GET", endpoint=endpoints.EFFECTS_SELECT)
 
     @effect.setter
     def effect(self, effect_name: str):
         """Sets the active effect to the name specified"""
-        data = {"select": effect_name}
-        self._requester.request(method="PUT", endpoint="effects", data=data)
+        data = select_data(effect_name)
+        self._requester.request(method="PUT", endpoint=endpoints.EFFECTS, data=data)
 
     @property
     def effects_list(self):
-        """Returns a list of all effects stored on the device"""
-        return self._requester.request(method="GET", endpoint="effects/effectsList")
+        """Returns a list of all effects stored on the device.
+
+        Served from the effect catalog, which re-reads the list from the device once it's older than its max_age."""
+        if not self.catalog.fresh:
+            self.catalog.sync_names(self._requester.request(method="GET", endpoint=endpoints.EFFECTS_LIST))
+        return self.catalog.names
 
     def effect_random(self) -> str:
         """Sets the active effect to a new random effect stored on the device.
 
         Returns the name of the new effect."""
-        effect_list = self.effects_list
-        active_effect = self.effect
-        if active_effect not in self._reserved_effect_names:
-            effect_list.remove(self.effect)
-        new_effect = random.choice(effect_list)
+        new_effect = choose_random_effect(self.effects_list, self.effect)
         self.effect = new_effect
         return new_effect
 
@@ -67,37 +95,83 @@ class Effect(AuroraObject):
         """Sends a raw dict containing effect data to the device.
 
         The dict given must match the json structure specified in the API docs."""
-        data = {"write": effect_data}
-        self._requester.request(method="PUT", endpoint="effects", data=data)
-
-    def effect_details(self, name: str) -> dict:
-        """Returns the dict containing details for the effect specified"""
-        data = {"write": {"command": "request",
-                          "animName": name}}
-        return self._requester.request(method="PUT", endpoint="effects", data=data)
+        data = write_data(effect_data)
+        self._requester.request(method="PUT", endpoint=endpoints.EFFECTS, data=data)
+        self.catalog.record_write(effect_data)
+
+    def effect_details(self, name: str, refresh: bool = False) -> dict:
+        """Returns the dict containing details for the effect specified.
+
+        Details are fetched once and then served from the effect catalog. Once the catalog is older than its
+        max_age, the effect list is diffed against the device first, so deleted effects aren't served.
+
+        refresh - Fetch the details from the device even if they're cached"""
+        if details_need_sync(self.catalog, refresh):
+            self.effects_list
+        details = cached_details(self.catalog, name, refresh)
+        if details is None:
+            data = write_data(details_request(name))
+            details = self._requester.request(method="PUT", endpoint=endpoints.EFFECTS, data=data)
+            self.catalog.store(name, details)
+        return details
 
     def effect_details_all(self) -> dict:
-        """Returns a dict containing details for all effects on the device"""
-        data = {"write": {"command": "requestAll"}}
-        return self._requester.request(method="PUT", endpoint="effects", data=data)
+        """Returns a dict containing details for all effects on the device.
+
+        Only the details of effects missing from the effect catalog are fetched."""
+        self.effects_list
+        if self.catalog.prefer_request_all():
+            data = write_data({"command": "requestAll"})
+            self.catalog.store_all(self._requester.request(method="PUT", endpoint=endpoints.EFFECTS, data=data))
+        for name in self.catalog.missing():
+            self.effect_details(name)
+        return self.catalog.all_details()
+
+    def effect_install(self, custom_effect: CustomEffect, activate: bool = False) -> bool:
+        """Uploads a CustomEffect unless the device already holds an identical effect under its name.
+
+        activate - Also make it the active effect
+        Returns True if the effect was uploaded."""
+        try:
+            # Compared with the device's copy, since another client may have changed it since it was cached
+            details = self.effect_details(custom_effect.name, refresh=True)
+        except ResourceNotFoundException:
+            details = None
+        data = install_data(details, custom_effect)
+        if data is not None:
+            self.effect_set_raw(data)
+        if activate:
+            self.effect = custom_effect.name
+        return data is not None
 
     def effect_delete(self, name: str):
         """Removed the specified effect from the device"""
-        data = {"write": {"command": "delete",
-                          "animName": name}}
-        self._requester.request(method="PUT", endpoint="effects", data=data)
+        data = write_data({"command": "delete", "animName": name})
+        self._requester.request(method="PUT", endpoint=endpoints.EFFECTS, data=data)
+        self.catalog.delete(name)
 
     def effect_rename(self, old_name: str, new_name: str):
         """Renames the specified effect saved on the device to a new name"""
-        data = {"write": {"command": "rename",
-                          "animName": old_name,
-                          "newName": new_name}}
-        self._requester.request(method="PUT", endpoint="effects", data=data)
-
-    def effect_stream(self):
-        """Open an external control stream"""
-        data = {"write": {"command": "display",
-                          "animType": "extControl"}}
-
-        udp_info = self._requester.request(method="PUT", endpoint="effects", data=data)
-        return AuroraStream(udp_info["streamControlIpAddr"], udp_info["streamControlPort"])
+        data = write_data({"command": "rename", "animName": old_name, "newName": new_name})
+        self._requester.request(method="PUT", endpoint=endpoints.EFFECTS, data=data)
+        self.catalog.rename(old_name, new_name)
+
+    def effect_stream(self, delta: bool = False, keyframe_interval: int = 30, correction=None):
+        """Open an external control stream
+
+        delta - Only send the panels that changed since the last frame, plus a full keyframe every keyframe_interval frames
+        correction - A color.Correction for this device, applied to every streamed color"""
+        from app.nanoleaf.stream import AuroraStream
+
+        data = write_data({"command": "display", "animType": "extControl"})
+
+        udp_info = self._requester.request(method="PUT", endpoint=endpoints.EFFECTS, data=data)
+        return AuroraStream(udp_info["streamControlIpAddr"], udp_info["streamControlPort"],
+                            delta=delta, keyframe_interval=keyframe_interval,
+                            metrics=self._requester.metrics, correction=correction)
+
+    def effect_stream_scheduler(self, fps: float = 30, delta: bool = False) -> StreamScheduler:
+        """Open an external control stream paced at the given frame rate.
+
+        Call start() on the returned scheduler, then submit() frames to it."""
+        return StreamScheduler(self.effect_stream(delta=delta), fps)
@@ -0,0 +1,45 @@
+# Endpoints of the Aurora OpenAPI, relative to http://<ip>:16021/api/v1/<auth_token>/
+# Shared by the sync and async clients so both talk to the device the same way.
+
+INFO = ""
+IDENTIFY = "identify"
+EVENTS = "events"
+
+STATE = "state"
+STATE_COLOR_MODE = "state/colorMode"
+STATE_ON = "state/on/value"
+STATE_BRIGHTNESS = "state/brightness/value"
+STATE_BRIGHTNESS_MIN = "state/brightness/min"
+STATE_BRIGHTNESS_MAX = "state/brightness/max"
+STATE_HUE = "state/hue/value"
+STATE_HUE_MIN = "state/hue/min"
+STATE_HUE_MAX = "state/hue/max"
+STATE_SATURATION = "state/sat/value"
+STATE_SATURATION_MIN = "state/sat/min"
+STATE_SATURATION_MAX = "state/sat/max"
+STATE_COLOR_TEMPERATURE = "state/ct/value"
+STATE_COLOR_TEMPERATURE_MIN = "state/ct/min"
+STATE_COLOR_TEMPERATURE_MAX = "state/ct/max"
+
+EFFECTS = "effects"
+EFFECTS_SELECT = "effects/select"
+EFFECTS_LIST = "effects/effectsList"
+
+RHYTHM = "rhythm"
+RHYTHM_CONNECTED = "rhythm/rhythmConnected"
+RHYTHM_ACTIVE = "rhythm/rhythmActive"
+RHYTHM_ID = "rhythm/rhythmId"
+RHYTHM_HARDWARE_VERSION = "rhythm/hardwareVersion"
+RHYTHM_FIRMWARE_VERSION = "rhythm/firmwareVersion"
+RHYTHM_AUX_AVAILABLE = "rhythm/auxAvailable"
+RHYTHM_MODE = "rhythm/rhythmMode"
+RHYTHM_POSITION = "rhythm/rhythmPos"
+
+LAYOUT = "panelLayout"
+LAYOUT_PANELS = "panelLayout/layout"
+LAYOUT_ORIENTATION = "panelLayout/globalOrientation/value"
+LAYOUT_ORIENTATION_MIN = "panelLayout/globalOrientation/min"
+LAYOUT_ORIENTATION_MAX = "panelLayout/globalOrientation/max"
+LAYOUT_PANEL_COUNT = "panelLayout/layout/numPanels"
+LAYOUT_PANEL_LENGTH = "panelLayout/layout/sideLength"
+LAYOUT_PANEL_POSITIONS = "panelLayout/layout/positionData"
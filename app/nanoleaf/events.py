@@ -0,0 +1,327 @@
+import json
+import logging
+import queue
+import threading
+
+import requests
+
+from app.nanoleaf import endpoints
+from app.nanoleaf.exceptions import AuroraException, InvalidCredentialsException
+
+logger = logging.getLogger(__name__)
+
+
+# Push-based updates from the device's server-sent event stream at /events.
+# While a listener is connected, every pushed value is written into the state cache
+# and the endpoints it covers are served from the cache, so reads no longer reach the device.
+
+STATE_EVENT = 1
+LAYOUT_EVENT = 2
+EFFECTS_EVENT = 3
+TOUCH_EVENT = 4
+ALL_EVENTS = (STATE_EVENT, LAYOUT_EVENT, EFFECTS_EVENT, TOUCH_EVENT)
+
+# Gestures of touch events
+SINGLE_TAP = 0
+DOUBLE_TAP = 1
+SWIPE_UP = 2
+SWIPE_DOWN = 3
+SWIPE_LEFT = 4
+SWIPE_RIGHT = 5
+
+# Cached endpoint updated by each (event type, attribute)
+_EVENT_ENDPOINTS = {
+    (STATE_EVENT, 1): endpoints.STATE_ON,
+    (STATE_EVENT, 2): endpoints.STATE_BRIGHTNESS,
+    (STATE_EVENT, 3): endpoints.STATE_HUE,
+    (STATE_EVENT, 4): endpoints.STATE_SATURATION,
+    (STATE_EVENT, 5): endpoints.STATE_COLOR_TEMPERATURE,
+    (STATE_EVENT, 6): endpoints.STATE_COLOR_MODE,
+    (LAYOUT_EVENT, 1): endpoints.LAYOUT_PANELS,
+    (LAYOUT_EVENT, 2): endpoints.LAYOUT_ORIENTATION,
+    (EFFECTS_EVENT, 1): endpoints.EFFECTS_SELECT,
+}
+
+# Endpoints kept up to date by each event type
+_PINNED_ENDPOINTS = {
+    STATE_EVENT: (endpoints.STATE,),
+    LAYOUT_EVENT: (endpoints.LAYOUT,),
+    EFFECTS_EVENT: (endpoints.EFFECTS_SELECT,),
+    TOUCH_EVENT: (),
+}
+
+
+class AuroraEvent:
+
+    __slots__ = ("type", "attribute", "value", "panel_id", "gesture")
+
+    def __init__(self, event_type: int, attribute: int = None, value=None, panel_id: int = None,
+                 gesture: int = None):
+        """A single change pushed by the device.
+
+        State, layout and effects events have an attribute and its new value. Touch events have a panel_id and
+        gesture instead."""
+        self.type = event_type
+        self.attribute = attribute
+        self.value = value
+        self.panel_id = panel_id
+        self.gesture = gesture
+
+    def __repr__(self):
+        if self.type == TOUCH_EVENT:
+            return f"<AuroraEvent(touch, panel_id={self.panel_id}, gesture={self.gesture})>"
+        return f"<AuroraEvent({self.type}, attribute={self.attribute}, value={self.value!r})>"
+
+    def __eq__(self, other):
+        return isinstance(other, AuroraEvent) and all(getattr(self, name) == getattr(other, name)
+                                                      for name in self.__slots__)
+
+    @property
+    def endpoint(self) -> str:
+        """Returns the endpoint whose value this event carries, or None"""
+        return _EVENT_ENDPOINTS.get((self.type, self.attribute))
+
+
+def events_endpoint(event_types) -> str:
+    """Returns the endpoint that subscribes to the given event types"""
+    return endpoints.EVENTS + "?id=" + ",".join(str(event_type) for event_type in event_types)
+
+
+def parse_events(event_type: int, data: str) -> list:
+    """Returns the AuroraEvents in the data of one server-sent event"""
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        return []
+    events = []
+    for entry in payload.get("events", []):
+        if event_type == TOUCH_EVENT:
+            events.append(AuroraEvent(event_type, panel_id=entry.get("panelId"), gesture=entry.get("gesture")))
+        else:
+            events.append(AuroraEvent(event_type, attribute=entry.get("attr"), value=entry.get("value")))
+    return events
+
+
+class _SSEParser:
+    """Splits a server-sent event stream into events, one line at a time"""
+
+    def __init__(self):
+        self.event_id = None
+        self.data = []
+
+    def feed(self, line) -> list:
+        """Returns the AuroraEvents completed by a line"""
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        line = line.rstrip("\r\n")
+        if line == "":
+            events = []
+            if self.event_id is not None and self.data:
+                events = parse_events(self.event_id, "\n".join(self.data))
+            self.event_id = None
+            self.data = []
+            return events
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "id":
+            try:
+                self.event_id = int(value)
+            except ValueError:
+                self.event_id = None
+        elif field == "data":
+            self.data.append(value)
+        return []
+
+
+class _BaseEventListener:
+
+    def __init__(self, aurora, event_types=ALL_EVENTS, reconnect_delay: float = 1, max_reconnect_delay: float = 30):
+        self._aurora = aurora
+        self._requester = aurora._requester
+        self.event_types = tuple(event_types)
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.connected = False
+        self._callbacks = []
+        self._pinned = [endpoint for event_type in self.event_types
+                        for endpoint in _PINNED_ENDPOINTS.get(event_type, ())]
+
+    def add_callback(self, callback, event_types=None):
+        """Calls callback(event) for every event, or only for events of the given types"""
+        self._callbacks.append((callback, None if event_types is None else tuple(event_types)))
+
+    def remove_callback(self, callback):
+        self._callbacks = [(registered, types) for registered, types in self._callbacks if registered != callback]
+
+    def _connected(self):
+        self.connected = True
+        self._requester.cache.pin(self._pinned)
+
+    def _disconnected(self):
+        self.connected = False
+        self._requester.cache.unpin(self._pinned)
+
+    def _apply(self, event: AuroraEvent):
+        """Writes an event into the state cache and runs the callbacks"""
+        endpoint = event.endpoint
+        if endpoint is not None:
+            self._requester.cache.write(endpoint, event.value)
+        if event.type == LAYOUT_EVENT:
+            self._aurora.panel_layout.invalidate_geometry()
+        elif event.type == EFFECTS_EVENT and event.value not in self._aurora.effect.catalog:
+            # Effects added by another client aren't in the catalog yet
+            self._aurora.effect.catalog.invalidate()
+        for callback, types in self._callbacks:
+            if types is None or event.type in types:
+                try:
+                    callback(event)
+                except Exception:
+                    # Keeps the listener running for the other callbacks
+                    logger.exception("Event callback %r failed on %r", callback, event)
+
+    def _next_delay(self, delay):
+        return min(delay * 2, self.max_reconnect_delay)
+
+
+class EventListener(_BaseEventListener):
+
+    def __init__(self, aurora, event_types=ALL_EVENTS, reconnect_delay: float = 1, max_reconnect_delay: float = 30):
+        """Listens to the event stream of an Aurora, reconnecting whenever it drops.
+
+        event_types - Event types to subscribe to (STATE_EVENT, LAYOUT_EVENT, EFFECTS_EVENT, TOUCH_EVENT)
+        reconnect_delay, max_reconnect_delay - Reconnects back off exponentially between these delays
+
+        Use start() to listen on a background thread and receive events through callbacks,
+        or iterate over listen() to receive them on the current thread."""
+        super().__init__(aurora, event_types, reconnect_delay, max_reconnect_delay)
+        self.error = None
+        self._stop = threading.Event()
+        self._response = None
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """Listens on a background thread until stop() is called"""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="AuroraEvents", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Disconnects and stops the background thread"""
+        self._stop.set()
+        response = self._response
+        if response is not None:
+            response.close()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def run(self):
+        """Listens on the current thread until stop() is called, only running the callbacks"""
+        try:
+            for _ in self.listen():
+                pass
+        except InvalidCredentialsException as e:
+            self.error = e
+
+    def events(self, timeout: float = None):
+        """Yields events received by the background thread. Stops after timeout seconds without an event."""
+        received = queue.Queue()
+        self.add_callback(received.put)
+        try:
+            while True:
+                try:
+                    yield received.get(timeout=timeout)
+                except queue.Empty:
+                    return
+        finally:
+            self.remove_callback(received.put)
+
+    def listen(self):
+        """Yields every event until stop() is called, reconnecting whenever the stream drops"""
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            try:
+                self._response = self._requester.stream(events_endpoint(self.event_types))
+                # Events only carry changes, so start from a fresh document
+                self._requester.snapshot(max_age=0)
+                self._connected()
+                delay = self.reconnect_delay
+                parser = _SSEParser()
+                for line in self._response.iter_lines(chunk_size=None, delimiter=b"\n"):
+                    for event in parser.feed(line):
+                        self._apply(event)
+                        yield event
+                    if self._stop.is_set():
+                        return
+            except InvalidCredentialsException:
+                raise
+            except (requests.exceptions.RequestException, OSError, AuroraException):
+                if self._stop.is_set():
+                    return
+            except (AttributeError, ValueError):
+                # Closing the response from stop() can also interrupt the read with these
+                if not self._stop.is_set():
+                    raise
+                return
+            finally:
+                self._disconnected()
+                if self._response is not None:
+                    self._response.close()
+                    self._response = None
+            if self._stop.wait(delay):
+                return
+            delay = self._next_delay(delay)
+
+
+class AsyncEventListener(_BaseEventListener):
+
+    def __init__(self, aurora, event_types=ALL_EVENTS, reconnect_delay: float = 1, max_reconnect_delay: float = 30):
+        """Listens to the event stream of an AsyncAurora, reconnecting whenever it drops.
+
+        Iterate over it with async for, or run() it as a task to only receive events through callbacks.
+        Takes the same arguments as EventListener."""
+        super().__init__(aurora, event_types, reconnect_delay, max_reconnect_delay)
+
+    def __aiter__(self):
+        return self.listen()
+
+    async def run(self):
+        """Listens until the task is cancelled, only running the callbacks"""
+        async for _ in self.listen():
+            pass
+
+    async def listen(self):
+        """Yields every event, reconnecting whenever the stream drops"""
+        # Imported here so the synchronous listener doesn't pay for them
+        import asyncio
+        import aiohttp
+
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with self._requester.stream(events_endpoint(self.event_types)) as r:
+                    await self._requester.snapshot(max_age=0)
+                    self._connected()
+                    delay = self.reconnect_delay
+                    parser = _SSEParser()
+                    async for line in r.content:
+                        for event in parser.feed(line):
+                            self._apply(event)
+                            yield event
+            except InvalidCredentialsException:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError, AuroraException):
+                pass
+            finally:
+                self._disconnected()
+            await asyncio.sleep(delay)
+            delay = self._next_delay(delay)
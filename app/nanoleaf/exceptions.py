@@ -55,3 +55,59 @@ class InvalidCredentialsException(AuroraException):
     """
     Exception raised in case of bad credentials
     """
+
+
+class ConnectionFailedException(AuroraException):
+    """
+    Exception raised when the device could not be reached or did not answer in time
+    """
+
+    def __init__(self, error, sent: bool = True):
+        super().__init__(None, str(error))
+        self.error = error
+        self.sent = sent
+
+    def __str__(self):
+        return str(self.error)
+
+
+class CircuitOpenException(ConnectionFailedException):
+    """
+    Exception raised without contacting the device, because its recent requests kept failing
+    """
+
+    def __init__(self, ip_address, retry_after: float):
+        super().__init__(f"Circuit open for {ip_address}, retrying in {retry_after:.1f}s", sent=False)
+        self.retry_after = retry_after
+
+
+_STATUS_EXCEPTIONS = {
+    401: InvalidCredentialsException,
+    403: BadRequestException,
+    404: ResourceNotFoundException,
+    422: UnprocessableEntityException,
+    500: InternalServerError,
+}
+
+
+def exception_for_status(status, data):
+    """
+    Returns the exception matching an error status returned by the Aurora API
+    """
+    cls = _STATUS_EXCEPTIONS.get(status, AuroraException)
+    return cls(status, data)
+
+
+class GroupException(Exception):
+    """
+    Exception raised when a command sent to a group of Auroras failed on some of them
+    """
+
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = errors
+        self.args = [errors]
+
+    def __str__(self):
+        return "; ".join("{member}: {error!r}".format(member=member, error=error)
+                         for member, error in self.errors.items())
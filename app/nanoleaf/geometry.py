@@ -0,0 +1,229 @@
+import math
+from array import array
+
+from app.nanoleaf import endpoints
+from app.nanoleaf.cache import resolve
+
+
+# Precomputed geometry of a panel layout.
+# Built once from PanelLayout, then effects look up positions, neighbors and stream slots in O(1).
+
+# shapeType of the Rhythm module in positionData, which isn't a light panel
+RHYTHM_SHAPE_TYPE = 1
+# Shape types of square panels, whose neighbors are a full side length apart
+SQUARE_SHAPE_TYPES = (2, 3, 4)
+# Centers of neighbors are this much further apart than ideal before they stop counting as adjacent
+_ADJACENCY_TOLERANCE = 1.1
+
+
+def geometry_from_snapshot(document: dict, adjacency_distance: float = None):
+    """Builds the LayoutGeometry of the layout held in an info document"""
+    return LayoutGeometry(resolve(document, endpoints.LAYOUT_PANEL_POSITIONS),
+                          orientation=resolve(document, endpoints.LAYOUT_ORIENTATION),
+                          side_length=resolve(document, endpoints.LAYOUT_PANEL_LENGTH),
+                          adjacency_distance=adjacency_distance)
+
+
+class LayoutGeometry:
+
+    __slots__ = ("_panel_ids", "_slots", "_x", "_y", "_o", "_orientation", "_side_length", "_neighbors",
+                 "_bounds", "_cell_size", "_grid", "_order_x", "_order_y")
+
+    def __init__(self, positions: list, orientation: float = 0, side_length: float = 150,
+                 adjacency_distance: float = None):
+        """An immutable, indexed copy of a panel layout.
+
+        positions - PanelLayout.panel_positions
+        orientation - Global orientation in degrees. Coordinates are rotated counter-clockwise by it around the
+                      layout's center.
+        side_length - Length of a panel side, used to find adjacent panels
+        adjacency_distance - Maximum distance between the centers of adjacent panels
+                             (defaults to the distance between the centers of two touching panels)
+        """
+        positions = [p for p in positions if p.get("shapeType") != RHYTHM_SHAPE_TYPE]
+        self._panel_ids = tuple(p["panelId"] for p in positions)
+        self._slots = {panel_id: slot for slot, panel_id in enumerate(self._panel_ids)}
+        self._o = tuple(p.get("o", 0) for p in positions)
+        self._orientation = orientation
+        self._side_length = side_length
+        self._x, self._y = self.__rotate(positions, orientation)
+
+        if adjacency_distance is None:
+            if positions and all(p.get("shapeType") in SQUARE_SHAPE_TYPES for p in positions):
+                adjacency_distance = side_length * _ADJACENCY_TOLERANCE
+            else:
+                # Centroids of two equilateral triangles sharing a side are side / sqrt(3) apart
+                adjacency_distance = side_length / math.sqrt(3) * _ADJACENCY_TOLERANCE
+
+        if positions:
+            self._bounds = (min(self._x), min(self._y), max(self._x), max(self._y))
+        else:
+            self._bounds = (0.0, 0.0, 0.0, 0.0)
+        self._cell_size = max(side_length, adjacency_distance, 1)
+        self._grid = self.__build_grid()
+        self._neighbors = self.__build_neighbors(adjacency_distance)
+        self._order_x = tuple(sorted(range(len(self._panel_ids)), key=lambda slot: (self._x[slot], self._y[slot])))
+        self._order_y = tuple(sorted(range(len(self._panel_ids)), key=lambda slot: (self._y[slot], self._x[slot])))
+
+    def __repr__(self):
+        return f"<LayoutGeometry({len(self._panel_ids)} panels)>"
+
+    def __len__(self):
+        return len(self._panel_ids)
+
+    def __contains__(self, panel_id):
+        return panel_id in self._slots
+
+    @property
+    def panel_ids(self) -> tuple:
+        """Returns the panel IDs in slot order. Stream frames in this order to use a single contiguous packet."""
+        return self._panel_ids
+
+    @property
+    def orientation(self) -> float:
+        return self._orientation
+
+    @property
+    def side_length(self) -> float:
+        return self._side_length
+
+    @property
+    def bounds(self) -> tuple:
+        """Returns the bounding box of the panel centers as (min_x, min_y, max_x, max_y)"""
+        return self._bounds
+
+    @property
+    def x(self) -> memoryview:
+        """Returns the rotated X-coordinate of every panel, in slot order"""
+        return memoryview(self._x).toreadonly()
+
+    @property
+    def y(self) -> memoryview:
+        """Returns the rotated Y-coordinate of every panel, in slot order"""
+        return memoryview(self._y).toreadonly()
+
+    def coordinates(self):
+        """Returns an (N, 2) NumPy array of the rotated panel centers, in slot order"""
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("coordinates() requires numpy") from None
+        return np.column_stack((np.frombuffer(self._x, dtype=np.float64),
+                                np.frombuffer(self._y, dtype=np.float64)))
+
+    def slot(self, panel_id: int) -> int:
+        """Returns the stream slot (index in panel_ids) of a panel"""
+        return self._slots[panel_id]
+
+    def position(self, panel_id: int) -> tuple:
+        """Returns the rotated (x, y) center of a panel"""
+        slot = self._slots[panel_id]
+        return self._x[slot], self._y[slot]
+
+    def panel_orientation(self, panel_id: int) -> float:
+        """Returns the orientation of a panel, including the global orientation"""
+        return (self._o[self._slots[panel_id]] + self._orientation) % 360
+
+    def neighbors(self, panel_id: int) -> tuple:
+        """Returns the IDs of the panels adjacent to a panel"""
+        return self._neighbors[self._slots[panel_id]]
+
+    def sorted_by_x(self) -> list:
+        """Returns the panel IDs from left to right"""
+        return [self._panel_ids[slot] for slot in self._order_x]
+
+    def sorted_by_y(self) -> list:
+        """Returns the panel IDs from bottom to top"""
+        return [self._panel_ids[slot] for slot in self._order_y]
+
+    def nearest(self, x: float, y: float) -> int:
+        """Returns the ID of the panel whose center is closest to a point"""
+        if not self._panel_ids:
+            return None
+        cx, cy = self.__cell(x, y)
+        (x0, y0), (x1, y1) = self.__cell(*self._bounds[:2]), self.__cell(*self._bounds[2:])
+        last_ring = max(abs(cx - x0), abs(cx - x1), abs(cy - y0), abs(cy - y1))
+        best = None
+        best_distance = float("inf")
+        for ring in range(last_ring + 1):
+            # Panels in this ring are at least (ring - 1) cells away, so stop once that's further than the best
+            if best is not None and (ring - 1) * self._cell_size > math.sqrt(best_distance):
+                break
+            for slot in self.__ring(cx, cy, ring):
+                distance = (self._x[slot] - x) ** 2 + (self._y[slot] - y) ** 2
+                if distance < best_distance:
+                    best, best_distance = slot, distance
+        return self._panel_ids[best]
+
+    def within(self, min_x: float, min_y: float, max_x: float, max_y: float) -> list:
+        """Returns the IDs of the panels whose centers are inside a rectangle"""
+        (x0, y0), (x1, y1) = self.__cell(min_x, min_y), self.__cell(max_x, max_y)
+        (grid_x0, grid_y0), (grid_x1, grid_y1) = self.__cell(*self._bounds[:2]), self.__cell(*self._bounds[2:])
+        x0, y0, x1, y1 = max(x0, grid_x0), max(y0, grid_y0), min(x1, grid_x1), min(y1, grid_y1)
+        found = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                for slot in self._grid.get((cx, cy), ()):
+                    if min_x <= self._x[slot] <= max_x and min_y <= self._y[slot] <= max_y:
+                        found.append(slot)
+        return [self._panel_ids[slot] for slot in sorted(found)]
+
+    def within_radius(self, x: float, y: float, radius: float) -> list:
+        """Returns the IDs of the panels whose centers are within a distance of a point"""
+        limit = radius * radius
+        found = []
+        for panel_id in self.within(x - radius, y - radius, x + radius, y + radius):
+            panel_x, panel_y = self.position(panel_id)
+            if (panel_x - x) ** 2 + (panel_y - y) ** 2 <= limit:
+                found.append(panel_id)
+        return found
+
+    @staticmethod
+    def __rotate(positions, orientation):
+        xs = array("d", (float(p["x"]) for p in positions))
+        ys = array("d", (float(p["y"]) for p in positions))
+        if not positions or orientation % 360 == 0:
+            return xs, ys
+        angle = math.radians(orientation)
+        cos, sin = math.cos(angle), math.sin(angle)
+        center_x, center_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        for i in range(len(xs)):
+            dx, dy = xs[i] - center_x, ys[i] - center_y
+            xs[i] = center_x + dx * cos - dy * sin
+            ys[i] = center_y + dx * sin + dy * cos
+        return xs, ys
+
+    def __cell(self, x, y):
+        return math.floor(x / self._cell_size), math.floor(y / self._cell_size)
+
+    def __build_grid(self):
+        grid = {}
+        for slot in range(len(self._panel_ids)):
+            grid.setdefault(self.__cell(self._x[slot], self._y[slot]), []).append(slot)
+        return {cell: tuple(slots) for cell, slots in grid.items()}
+
+    def __ring(self, cx, cy, ring):
+        if ring == 0:
+            yield from self._grid.get((cx, cy), ())
+            return
+        for dx in range(-ring, ring + 1):
+            for dy in (-ring, ring):
+                yield from self._grid.get((cx + dx, cy + dy), ())
+        for dy in range(-ring + 1, ring):
+            for dx in (-ring, ring):
+                yield from self._grid.get((cx + dx, cy + dy), ())
+
+    def __build_neighbors(self, adjacency_distance):
+        limit = adjacency_distance * adjacency_distance
+        neighbors = []
+        for slot in range(len(self._panel_ids)):
+            x, y = self._x[slot], self._y[slot]
+            cx, cy = self.__cell(x, y)
+            adjacent = []
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for other in self._grid.get((cx + dx, cy + dy), ()):
+                        if other != slot and (self._x[other] - x) ** 2 + (self._y[other] - y) ** 2 <= limit:
+                            adjacent.append(other)
+            neighbors.append(tuple(self._panel_ids[other] for other in sorted(adjacent)))
+        return tuple(neighbors)
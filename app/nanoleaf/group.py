@@ -0,0 +1,145 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.nanoleaf.aurora import Aurora
+from app.nanoleaf.exceptions import GroupException
+from app.nanoleaf.utils import Requester
+
+
+# Sends the same command to many Auroras at once.
+# A group exposes the same state and effect surface as a single Aurora,
+# but every call runs on all members concurrently and returns a GroupResult.
+
+
+class GroupResult:
+
+    def __init__(self, results: dict, errors: dict):
+        """Per-member results of a group command. Members that raised are in errors instead of results."""
+        self.results = results
+        self.errors = errors
+
+    def __repr__(self):
+        return f"<GroupResult(ok={len(self.results)}, failed={len(self.errors)})>"
+
+    def __getitem__(self, member):
+        if member in self.errors:
+            raise self.errors[member]
+        return self.results[member]
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results) + len(self.errors)
+
+    @property
+    def ok(self) -> bool:
+        """Returns True if the command succeeded on every member"""
+        return not self.errors
+
+    def items(self):
+        return self.results.items()
+
+    def raise_for_errors(self):
+        """Raises a GroupException if the command failed on any member"""
+        if self.errors:
+            raise GroupException(self.errors)
+        return self
+
+
+class _GroupProxy:
+
+    def __init__(self, group, component: str):
+        object.__setattr__(self, "_group", group)
+        object.__setattr__(self, "_component", component)
+
+    def __getattr__(self, name):
+        group = self._group
+        component = self._component
+        if not group.auroras:
+            return GroupResult({}, {})
+        attribute = getattr(type(getattr(group.auroras[0], component)), name, None)
+        if isinstance(attribute, property) or not callable(attribute):
+            return group.map(lambda aurora: getattr(getattr(aurora, component), name))
+
+        def dispatch(*args, **kwargs):
+            return group.map(lambda aurora: getattr(getattr(aurora, component), name)(*args, **kwargs))
+        dispatch.__name__ = name
+        dispatch.__doc__ = attribute.__doc__
+        return dispatch
+
+    def __setattr__(self, name, value):
+        component = self._component
+        self._group.last_result = self._group.map(
+            lambda aurora: setattr(getattr(aurora, component), name, value))
+
+
+class AuroraGroup:
+
+    def __init__(self, members=(), max_workers: int = 16):
+        """A group of Auroras controlled together.
+
+        members - Aurora or Requester instances
+        max_workers - Maximum number of devices contacted at the same time
+
+        Setting a property (group.state.brightness = 50) runs on every member and stores
+        the GroupResult in last_result. Errors are collected per member rather than raised."""
+        self.auroras = [self.__as_aurora(member) for member in members]
+        self.last_result = None
+        self.state = _GroupProxy(self, "state")
+        self.effect = _GroupProxy(self, "effect")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="AuroraGroup")
+
+    def __repr__(self):
+        return f"<AuroraGroup({self.auroras})>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.auroras)
+
+    def __iter__(self):
+        return iter(self.auroras)
+
+    def add(self, member):
+        """Adds an Aurora or Requester to the group"""
+        self.auroras.append(self.__as_aurora(member))
+
+    def remove(self, aurora: Aurora):
+        """Removes an Aurora from the group"""
+        self.auroras.remove(aurora)
+
+    def map(self, function) -> GroupResult:
+        """Calls function(aurora) for every member concurrently and waits for all of them"""
+        futures = {aurora: self._executor.submit(function, aurora) for aurora in self.auroras}
+        results = {}
+        errors = {}
+        for aurora, future in futures.items():
+            try:
+                results[aurora] = future.result()
+            except Exception as e:
+                errors[aurora] = e
+        return GroupResult(results, errors)
+
+    def identify(self) -> GroupResult:
+        """Briefly flash the panels of every member"""
+        return self.map(lambda aurora: aurora.identify())
+
+    def snapshot(self, max_age: float = None) -> GroupResult:
+        """Returns the info document of every member"""
+        return self.map(lambda aurora: aurora.snapshot(max_age))
+
+    def close(self):
+        """Stops the worker threads and closes every member's connections"""
+        self._executor.shutdown(wait=True)
+        for aurora in self.auroras:
+            aurora.close()
+
+    @staticmethod
+    def __as_aurora(member):
+        if isinstance(member, Requester):
+            return Aurora(requester=member)
+        return member
@@ -1,38 +1,48 @@
+from app.nanoleaf import endpoints
+from app.nanoleaf.cache import resolve
+from app.nanoleaf.geometry import LayoutGeometry, geometry_from_snapshot
 from app.nanoleaf.model import AuroraObject
 
+
+def panel_count_from_snapshot(document: dict):
+    """Returns the number of panels in an info document, not counting the rhythm module"""
+    count = int(resolve(document, endpoints.LAYOUT_PANEL_COUNT))
+    if resolve(document, endpoints.RHYTHM_CONNECTED):
+        count -= 1
+    return count
+
+
 class PanelLayout(AuroraObject):
 
     def __init__(self, requester, rhythm):
         super().__init__(requester)
         self.rhythm = rhythm
+        self._geometry = None
 
     @property
     def orientation(self):
         """Returns the orientation of the device (0-360)"""
-        return self._requester.request(method="GET", endpoint="panelLayout/globalOrientation/value")
+        return self._requester.request(method="GET", endpoint=endpoints.LAYOUT_ORIENTATION)
 
     @property
     def orientation_min(self):
         """Returns the minimum orientation possible. (This always returns 0)"""
-        return self._requester.request(method="GET", endpoint="panelLayout/globalOrientation/min")
+        return self._requester.request(method="GET", endpoint=endpoints.LAYOUT_ORIENTATION_MIN)
 
     @property
     def orientation_max(self):
         """Returns the maximum orientation possible. (This always returns 360)"""
-        return self._requester.request(method="GET", endpoint="panelLayout/globalOrientation/max")
+        return self._requester.request(method="GET", endpoint=endpoints.LAYOUT_ORIENTATION_MAX)
 
     @property
     def panel_count(self):
         """Returns the number of panels connected to the device"""
-        count = int(self._requester.request(method="GET", endpoint="panelLayout/layout/numPanels"))
-        if self.rhythm.rhythm_connected:
-            count -= 1
-        return count
+        return panel_count_from_snapshot(self._requester.snapshot())
 
     @property
     def panel_length(self):
         """Returns the length of a single panel. (This always returns 150)"""
-        return self._requester.request(method="GET", endpoint="panelLayout/layout/sideLength")
+        return self._requester.request(method="GET", endpoint=endpoints.LAYOUT_PANEL_LENGTH)
 
     @property
     def panel_positions(self):
@@ -43,4 +53,16 @@ class PanelLayout(AuroraObject):
         y - Y-coordinate
         o - Rotational orientation
         """
-        return self._requester.request(method="GET", endpoint="panelLayout/layout/positionData")
\ No newline at end of file
+        return self._requester.request(method="GET", endpoint=endpoints.LAYOUT_PANEL_POSITIONS)
+
+    def geometry(self, refresh: bool = False) -> LayoutGeometry:
+        """Returns the precomputed geometry of the layout: positions, neighbors, spatial queries and stream slots.
+
+        It's fetched in a single request and kept until refresh is True or invalidate_geometry() is called."""
+        if self._geometry is None or refresh:
+            self._geometry = geometry_from_snapshot(self._requester.snapshot())
+        return self._geometry
+
+    def invalidate_geometry(self):
+        """Drops the cached geometry, for instance after panels were added or removed"""
+        self._geometry = None
@@ -0,0 +1,234 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Request and stream instrumentation.
+# Pass one Metrics to any number of Auroras (metrics=...) to collect latency histograms, error counts,
+# bytes sent and stream packet rates per device, then export them in the Prometheus text format.
+
+# Upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Weight of the newest packet interval in the smoothed stream fps
+_FPS_SMOOTHING = 0.1
+
+
+class Histogram:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Counts observations into cumulative buckets"""
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def __repr__(self):
+        return f"<Histogram(count={self.count}, sum={self.sum:.6f})>"
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, percent: float) -> float:
+        """Returns the upper bound of the bucket holding the given percentile, or inf if it's above every bucket"""
+        if self.count == 0:
+            return 0.0
+        rank = self.count * percent / 100
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def cumulative(self) -> list:
+        """Returns (upper bound, number of observations at or below it) for every bucket, ending with +Inf"""
+        result = []
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            result.append((bound, seen))
+        return result
+
+
+class _StreamCounters:
+
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.fps = 0.0
+        self._interval = None
+        self._last = None
+
+    def record(self, size: int, now: float):
+        self.packets += 1
+        self.bytes += size
+        if self._last is not None:
+            interval = now - self._last
+            if self._interval is None:
+                self._interval = interval
+            else:
+                self._interval += _FPS_SMOOTHING * (interval - self._interval)
+            if self._interval > 0:
+                self.fps = 1 / self._interval
+        self._last = now
+
+
+class Metrics:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Collects request and stream metrics of any number of devices.
+
+        buckets - Upper bounds of the latency histogram buckets, in seconds
+        """
+        self.buckets = tuple(buckets)
+        self.latency = {}
+        self.requests = {}
+        self.errors = {}
+        self.bytes_sent = {}
+        self.streams = {}
+        self._before = []
+        self._after = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<Metrics({sum(self.requests.values())} requests, {len(self.streams)} streams)>"
+
+    def add_hook(self, before=None, after=None):
+        """Registers functions called around every request.
+
+        before(device, method, endpoint, data) is called before the request is sent.
+        after(device, method, endpoint, status, elapsed, error) is called once it completed or failed,
+        with status None and the exception as error if it failed."""
+        if before is not None:
+            self._before.append(before)
+        if after is not None:
+            self._after.append(after)
+
+    def before_request(self, device: str, method: str, endpoint: str, data):
+        for hook in self._before:
+            hook(device, method, endpoint, data)
+
+    def after_request(self, device: str, method: str, endpoint: str, status, elapsed: float, sent: int = 0,
+                      error: Exception = None):
+        """Records a completed or failed request"""
+        with self._lock:
+            histogram = self.latency.get((device, method, endpoint))
+            if histogram is None:
+                histogram = self.latency[(device, method, endpoint)] = Histogram(self.buckets)
+            histogram.observe(elapsed)
+            key = (device, method, endpoint, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.bytes_sent[(device, "http")] = self.bytes_sent.get((device, "http"), 0) + sent
+            if error is not None:
+                key = (device, endpoint, type(error).__name__)
+                self.errors[key] = self.errors.get(key, 0) + 1
+        for hook in self._after:
+            hook(device, method, endpoint, status, elapsed, error)
+
+    def record_packet(self, device: str, size: int):
+        """Records an external control packet sent to a device"""
+        now = time.perf_counter()
+        with self._lock:
+            counters = self.streams.get(device)
+            if counters is None:
+                counters = self.streams[device] = _StreamCounters()
+            counters.record(size, now)
+            self.bytes_sent[(device, "stream")] = self.bytes_sent.get((device, "stream"), 0) + size
+
+    def stream_fps(self, device: str) -> float:
+        """Returns the smoothed rate packets are streamed to a device at"""
+        counters = self.streams.get(device)
+        return 0.0 if counters is None else counters.fps
+
+    def error_count(self, device: str = None) -> int:
+        """Returns the number of failed requests, to one device or to all of them"""
+        return sum(count for (error_device, _, _), count in self.errors.items()
+                   if device is None or error_device == device)
+
+    def reset(self):
+        with self._lock:
+            self.latency.clear()
+            self.requests.clear()
+            self.errors.clear()
+            self.bytes_sent.clear()
+            self.streams.clear()
+
+    def prometheus(self) -> str:
+        """Returns every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines += ["# HELP nanoleaf_request_duration_seconds Time to complete a request to a device",
+                      "# TYPE nanoleaf_request_duration_seconds histogram"]
+            for (device, method, endpoint), histogram in sorted(self.latency.items()):
+                labels = _labels(device=device, method=method, endpoint=endpoint)
+                for bound, count in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"nanoleaf_request_duration_seconds_bucket{_labels(labels, le=le)} {count}")
+                lines.append(f"nanoleaf_request_duration_seconds_sum{_labels(labels)} {histogram.sum}")
+                lines.append(f"nanoleaf_request_duration_seconds_count{_labels(labels)} {histogram.count}")
+
+            lines += ["# HELP nanoleaf_requests_total Requests sent to a device, by response status",
+                      "# TYPE nanoleaf_requests_total counter"]
+            for (device, method, endpoint, status), count in sorted(self.requests.items(), key=str):
+                labels = _labels(device=device, method=method, endpoint=endpoint,
+                                 status="error" if status is None else str(status))
+                lines.append(f"nanoleaf_requests_total{labels} {count}")
+
+            lines += ["# HELP nanoleaf_request_errors_total Failed requests, by exception class",
+                      "# TYPE nanoleaf_request_errors_total counter"]
+            for (device, endpoint, error), count in sorted(self.errors.items()):
+                lines.append(f"nanoleaf_request_errors_total{_labels(device=device, endpoint=endpoint, error=error)} "
+                             f"{count}")
+
+            lines += ["# HELP nanoleaf_bytes_sent_total Bytes sent to a device",
+                      "# TYPE nanoleaf_bytes_sent_total counter"]
+            for (device, transport), count in sorted(self.bytes_sent.items()):
+                lines.append(f"nanoleaf_bytes_sent_total{_labels(device=device, transport=transport)} {count}")
+
+            lines += ["# HELP nanoleaf_stream_packets_total External control packets sent to a device",
+                      "# TYPE nanoleaf_stream_packets_total counter"]
+            for device, counters in sorted(self.streams.items()):
+                lines.append(f"nanoleaf_stream_packets_total{_labels(device=device)} {counters.packets}")
+
+            lines += ["# HELP nanoleaf_stream_fps Smoothed rate of external control packets",
+                      "# TYPE nanoleaf_stream_fps gauge"]
+            for device, counters in sorted(self.streams.items()):
+                lines.append(f"nanoleaf_stream_fps{_labels(device=device)} {counters.fps}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9100, address: str = "") -> ThreadingHTTPServer:
+        """Serves prometheus() over HTTP from a background thread. Call shutdown() on the result to stop."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                payload = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        server = ThreadingHTTPServer((address, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="NanoleafMetrics", daemon=True).start()
+        return server
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(base: str = None, **labels) -> str:
+    """Formats labels as {name="value",...}, appended to an already formatted label set if given"""
+    parts = [] if not base else [base[1:-1]]
+    parts += [f'{name}="{_escape(value)}"' for name, value in labels.items()]
+    return "{" + ",".join(parts) + "}"
@@ -0,0 +1,209 @@
+import mmap
+import struct
+import time
+from array import array
+
+from app.nanoleaf.stream import FrameBuffer
+
+
+# Recordings of external control streams, for effects rendered offline and played back on slow hardware.
+# File layout: a fixed header, then per frame a timestamp and length followed by the packet exactly as it is
+# sent over UDP. Replays map the file into memory and send slices of it, so playing a frame copies nothing.
+
+MAGIC = b"NLRC"
+VERSION = 1
+
+# magic, version, flags, frame count, wall clock time the recording started
+HEADER = struct.Struct("<4sHHQd")
+_FLAGS_OFFSET = 6
+_FRAME_COUNT_OFFSET = 8
+# Set when frames only hold the panels that changed, so none of them may be skipped
+FLAG_DELTA = 1
+# seconds since the start of the recording, packet length
+FRAME_HEADER = struct.Struct("<dH")
+
+
+class Recorder:
+
+    def __init__(self, path, started_at: float = None, delta: bool = False):
+        """Writes stream packets to a recording file.
+
+        Attach it to an AuroraStream to capture everything the stream sends, or add generated frames with
+        add_frame(). Timestamps are taken from the clock unless given. Close it to finish the file.
+
+        delta - The packets only hold the panels that changed. Set by attach() for streams with delta on.
+        """
+        self.path = path
+        self.frame_count = 0
+        self.delta = delta
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, FLAG_DELTA if delta else 0, 0,
+                                     time.time() if started_at is None else started_at))
+        self._started = None
+        self._frame = FrameBuffer()
+
+    def __repr__(self):
+        return f"<Recorder({self.path}, {self.frame_count} frames)>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def attach(self, stream):
+        """Records every packet an AuroraStream sends from now on.
+
+        A stream with delta on is marked in the file, and sends a keyframe so the recording starts with every
+        panel's color."""
+        stream.recorder = self
+        if stream.delta:
+            if not self.delta:
+                self.delta = True
+                self._file.seek(_FLAGS_OFFSET)
+                self._file.write(struct.pack("<H", FLAG_DELTA))
+                self._file.seek(0, 2)
+            stream.keyframe()
+        return self
+
+    def detach(self, stream):
+        if stream.recorder is self:
+            stream.recorder = None
+
+    def add_packet(self, packet, timestamp: float = None):
+        """Appends an external control packet.
+
+        timestamp - Seconds since the start of the recording. Defaults to the time since the first packet."""
+        if timestamp is None:
+            now = time.perf_counter()
+            if self._started is None:
+                self._started = now
+            timestamp = now - self._started
+        self._file.write(FRAME_HEADER.pack(timestamp, len(packet)))
+        self._file.write(packet)
+        self.frame_count += 1
+
+    def add_frame(self, timestamp: float, panel_ids, colors, transition_times=None):
+        """Appends a frame of many panels, from an (N, 3) RGB or (N, 4) RGBW color array"""
+        self._frame.set_many(panel_ids, colors, transition_times)
+        self.add_packet(self._frame.pending(), timestamp)
+        self._frame.mark_sent()
+
+    def close(self):
+        if self._file.closed:
+            return
+        # The frame count is only informational, readers scan the frames
+        self._file.seek(_FRAME_COUNT_OFFSET)
+        self._file.write(struct.pack("<Q", self.frame_count))
+        self._file.close()
+
+
+class Recording:
+
+    def __init__(self, path):
+        """A recording file, mapped into memory.
+
+        Frames are returned as memoryviews of the mapping, so release them before closing the recording.
+        A recording cut off by a crash is read up to its last complete frame."""
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if len(self._mmap) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is too short to be a recording")
+        magic, version, flags, _, self.started_at = HEADER.unpack_from(self._mmap)
+        self.delta = bool(flags & FLAG_DELTA)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} recording")
+        self.timestamps, self._offsets, self._lengths = self.__index()
+
+    def __repr__(self):
+        return f"<Recording({self.path}, {len(self)} frames, {self.duration:.2f}s)>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index: int) -> tuple:
+        """Returns the (timestamp, packet) of a frame"""
+        offset = self._offsets[index]
+        return self.timestamps[index], self._view[offset:offset + self._lengths[index]]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def duration(self) -> float:
+        return self.timestamps[-1] if len(self.timestamps) else 0.0
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+    def play(self, stream, rate: float = 1.0, loop: bool = False, stop=None) -> int:
+        """Sends every frame to an AuroraStream at its recorded time, blocking until the end.
+
+        rate - Playback speed, 2 plays twice as fast
+        loop - Starts over at the end until stop is set
+        stop - A threading.Event that ends playback early
+
+        Frames that are already late when their turn comes are skipped, except in delta recordings where every
+        frame is needed. Returns the number of frames sent."""
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        send = stream.send_packet
+        timestamps = self.timestamps
+        offsets = self._offsets
+        lengths = self._lengths
+        view = self._view
+        count = len(offsets)
+        sent = 0
+        # A frame more than this late is dropped, so playback catches up instead of falling further behind
+        tolerance = float("inf") if self.delta else 0.05
+        while count:
+            started = time.perf_counter()
+            for index in range(count):
+                due = started + timestamps[index] / rate
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    if stop is not None:
+                        if stop.wait(delay):
+                            return sent
+                    else:
+                        time.sleep(delay)
+                elif delay < -tolerance and index + 1 < count:
+                    continue
+                offset = offsets[index]
+                send(view[offset:offset + lengths[index]])
+                sent += 1
+            if not loop or (stop is not None and stop.is_set()):
+                break
+        return sent
+
+    def __index(self):
+        timestamps = array("d")
+        offsets = array("Q")
+        lengths = array("H")
+        data = self._mmap
+        size = len(data)
+        offset = HEADER.size
+        unpack = FRAME_HEADER.unpack_from
+        header_size = FRAME_HEADER.size
+        while offset + header_size <= size:
+            timestamp, length = unpack(data, offset)
+            start = offset + header_size
+            if start + length > size:
+                break
+            timestamps.append(timestamp)
+            offsets.append(start)
+            lengths.append(length)
+            offset = start + length
+        return timestamps, offsets, lengths
@@ -1,3 +1,4 @@
+from app.nanoleaf import endpoints
 from app.nanoleaf.model import AuroraObject
 
 class Rhythm(AuroraObject):
@@ -8,43 +9,43 @@ class Rhythm(AuroraObject):
     @property
     def rhythm_connected(self):
         """Returns True if the rhythm module is connected, False if it's not"""
-        return self._requester.request(method="GET", endpoint="rhythm/rhythmConnected")
+        return self._requester.request(method="GET", endpoint=endpoints.RHYTHM_CONNECTED)
 
     @property
     def rhythm_active(self):
         """Returns True if the rhythm microphone is active, False if it's not"""
-        return self._requester.request(method="GET", endpoint="rhythm/rhythmActive")
+        return self._requester.request(method="GET", endpoint=endpoints.RHYTHM_ACTIVE)
 
     @property
     def rhythm_id(self):
         """Returns the ID of the rhythm module"""
-        return self._requester.request(method="GET", endpoint="rhythm/rhythmId")
+        return self._requester.request(method="GET", endpoint=endpoints.RHYTHM_ID)
 
     @property
     def rhythm_hardware_version(self):
         """Returns the hardware version of the rhythm module"""
-        return self._requester.request(method="GET", endpoint="rhythm/hardwareVersion")
+        return self._requester.request(method="GET", endpoint=endpoints.RHYTHM_HARDWARE_VERSION)
 
     @property
     def rhythm_firmware_version(self):
         """Returns the firmware version of the rhythm module"""
-        return self._requester.request(method="GET", endpoint="rhythm/firmwareVersion")
+        return self._requester.request(method="GET", endpoint=endpoints.RHYTHM_FIRMWARE_VERSION)
 
     @property
     def rhythm_aux_available(self):
         """Returns True if an aux cable is connected to the rhythm module, False if it's not"""
-        return self._requester.request(method="GET", endpoint="rhythm/auxAvailable")
+        return self._requester.request(method="GET", endpoint=endpoints.RHYTHM_AUX_AVAILABLE)
 
     @property
     def rhythm_mode(self):
         """Returns the sound source of the rhythm module. 0 for microphone, 1 for aux cable"""
-        return self._requester.request(method="GET", endpoint="rhythm/rhythmMode")
+        return self._requester.request(method="GET", endpoint=endpoints.RHYTHM_MODE)
 
     @rhythm_mode.setter
     def rhythm_mode(self, value):
         """Set the sound source of the rhythm module. 0 for microphone, 1 for aux cable"""
         data = {"rhythmMode": value}
-        self._requester.request(method="PUT", endpoint="rhythm", data=data)
+        self._requester.request(method="PUT", endpoint=endpoints.RHYTHM, data=data)
 
     @property
     def rhythm_position(self):
@@ -54,4 +55,4 @@ class Rhythm(AuroraObject):
         y - Y-coordinate
         o - Rotational orientation
         """
-        return self._requester.request(method="GET", endpoint="rhythm/rhythmPos")
+        return self._requester.request(method="GET", endpoint=endpoints.RHYTHM_POSITION)
@@ -0,0 +1,125 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Samples rendered images down to one color per panel.
+# The pixels under every panel are found once per layout and image size,
+# after which each frame is a single gather and reduction.
+
+
+class CanvasSampler:
+
+    def __init__(self, geometry, width: int, height: int, samples_per_panel: int = 64, shape: str = "triangle",
+                 margin: float = 0):
+        """Maps HxW images onto the panels of a LayoutGeometry.
+
+        The layout is scaled to fit the image, keeping its aspect ratio, with the image's top at the layout's
+        highest Y-coordinate.
+
+        samples_per_panel - Number of pixels averaged per panel, spread evenly over its area (None averages all)
+        shape - "triangle" to sample each panel's triangle, or "disc" for a circle inside it
+        margin - Extra space around the layout, in layout units
+        """
+        if np is None:
+            raise ImportError("CanvasSampler requires numpy")
+        if shape not in ("triangle", "disc"):
+            raise ValueError("shape must be 'triangle' or 'disc'")
+        self.geometry = geometry
+        self.width = width
+        self.height = height
+        self.panel_ids = np.asarray(geometry.panel_ids)
+        # Circumradius of an equilateral triangle
+        self._radius = geometry.side_length / math.sqrt(3)
+        self.__fit(margin)
+        self._indices, self._offsets, self._counts = self.__build(samples_per_panel, shape)
+
+    def __repr__(self):
+        return f"<CanvasSampler({len(self.panel_ids)} panels, {self.width}x{self.height})>"
+
+    def sample(self, image):
+        """Returns an (N, 3) uint8 array of the average color under each panel, in geometry slot order.
+
+        image - (H, W, 3) RGB or (H, W, 4) RGBA uint8 array
+        """
+        image = np.asarray(image)
+        if image.shape[:2] != (self.height, self.width) or image.ndim != 3:
+            raise ValueError(f"Expected an image of shape ({self.height}, {self.width}, 3)")
+        pixels = image.reshape(-1, image.shape[2])[:, :3]
+        if len(self._offsets) == 0:
+            return np.zeros((0, 3), dtype=np.uint8)
+        sums = np.add.reduceat(pixels[self._indices], self._offsets, axis=0, dtype=np.uint32)
+        return (sums // self._counts).astype(np.uint8)
+
+    def send(self, stream, image, transition_times=None):
+        """Samples an image and sends it to an AuroraStream (or StreamScheduler.submit) in one packet"""
+        colors = self.sample(image)
+        if hasattr(stream, "panels_set"):
+            stream.panels_set(self.panel_ids, colors, transition_times)
+        else:
+            stream.submit(self.panel_ids, colors, transition_times)
+
+    def to_pixel(self, x: float, y: float) -> tuple:
+        """Returns the (column, row) of the pixel under a layout coordinate"""
+        return ((x - self._origin_x) * self._scale + self._offset_x,
+                (self._origin_y - y) * self._scale + self._offset_y)
+
+    def __fit(self, margin):
+        min_x, min_y, max_x, max_y = self.geometry.bounds
+        pad = self._radius + margin
+        min_x, min_y, max_x, max_y = min_x - pad, min_y - pad, max_x + pad, max_y + pad
+        layout_width, layout_height = max(max_x - min_x, 1e-9), max(max_y - min_y, 1e-9)
+        self._scale = min(self.width / layout_width, self.height / layout_height)
+        self._origin_x = min_x
+        self._origin_y = max_y
+        self._offset_x = (self.width - layout_width * self._scale) / 2
+        self._offset_y = (self.height - layout_height * self._scale) / 2
+
+    def __build(self, samples_per_panel, shape):
+        geometry = self.geometry
+        radius_pixels = self._radius * self._scale
+        indices = []
+        counts = []
+        for panel_id in geometry.panel_ids:
+            center_x, center_y = self.to_pixel(*geometry.position(panel_id))
+            columns, rows = np.meshgrid(
+                np.arange(max(0, math.floor(center_x - radius_pixels)),
+                          min(self.width, math.ceil(center_x + radius_pixels) + 1)),
+                np.arange(max(0, math.floor(center_y - radius_pixels)),
+                          min(self.height, math.ceil(center_y + radius_pixels) + 1)))
+            # Pixel centers relative to the panel center, with Y pointing up like the layout
+            dx = columns.ravel() + 0.5 - center_x
+            dy = center_y - (rows.ravel() + 0.5)
+            if shape == "disc":
+                # Incircle of the triangle
+                inside = dx * dx + dy * dy <= (radius_pixels / 2) ** 2
+            else:
+                inside = self.__inside_triangle(dx, dy, radius_pixels, geometry.panel_orientation(panel_id))
+            panel_indices = (rows.ravel() * self.width + columns.ravel())[inside]
+            if len(panel_indices) == 0:
+                column = min(max(int(center_x), 0), self.width - 1)
+                row = min(max(int(center_y), 0), self.height - 1)
+                panel_indices = np.array([row * self.width + column])
+            if samples_per_panel is not None and len(panel_indices) > samples_per_panel:
+                picks = np.linspace(0, len(panel_indices) - 1, samples_per_panel).round().astype(np.intp)
+                panel_indices = panel_indices[picks]
+            indices.append(panel_indices)
+            counts.append(len(panel_indices))
+        if not indices:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.ones((0, 1), dtype=np.uint32)
+        counts = np.asarray(counts, dtype=np.uint32)
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.intp)
+        return np.concatenate(indices).astype(np.intp), offsets, counts[:, None]
+
+    @staticmethod
+    def __inside_triangle(dx, dy, radius, orientation):
+        # An equilateral triangle is the intersection of three half-planes whose edges are radius / 2 from the
+        # center. With an orientation of 0 the triangle points up, so its edges face down, up-left and up-right.
+        inside = np.ones(len(dx), dtype=bool)
+        for edge in (270, 30, 150):
+            angle = math.radians(edge + orientation)
+            inside &= dx * math.cos(angle) + dy * math.sin(angle) <= radius / 2
+        return inside
@@ -0,0 +1,344 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.nanoleaf import endpoints
+from app.nanoleaf.cache import resolve
+from app.nanoleaf.state import hsv_data_from_rgb
+
+
+# Timed scene changes for any number of Auroras, from one long-running process.
+# Due changes wait in a heap ordered by time. When they come up, every change due within a short window is merged
+# per device, compared with the device's cached state, and only the differences are sent:
+# at most one effect PUT and one state PUT per device.
+
+
+class Scene:
+
+    __slots__ = ("on", "brightness", "hue", "saturation", "color_temperature", "effect", "duration")
+
+    def __init__(self, on: bool = None, brightness: int = None, hue: int = None, saturation: int = None,
+                 color_temperature: int = None, rgb=None, effect: str = None, duration: float = None):
+        """The desired state of a device. Fields left as None are not changed.
+
+        rgb - A hex string or 0-255 RGB values, converted to hue, saturation and brightness
+        effect - Name of the effect to select. Colors set in the same scene override it.
+        duration - Seconds the device takes to fade to the new brightness
+        """
+        if rgb is not None:
+            data = hsv_data_from_rgb(rgb)
+            if data is None:
+                raise ValueError(f"Invalid color {rgb!r}")
+            hue, saturation = data["hue"]["value"], data["sat"]["value"]
+            if brightness is None:
+                brightness = data["brightness"]["value"]
+        self.on = on
+        self.brightness = brightness
+        self.hue = hue
+        self.saturation = saturation
+        self.color_temperature = color_temperature
+        self.effect = effect
+        self.duration = duration
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__
+                           if getattr(self, name) is not None)
+        return f"<Scene({fields})>"
+
+    def __eq__(self, other):
+        return isinstance(other, Scene) and all(getattr(self, name) == getattr(other, name)
+                                                for name in self.__slots__)
+
+    @property
+    def changes_state(self) -> bool:
+        """Returns True if the scene sets any state besides the effect"""
+        return any(getattr(self, name) is not None for name in self.__slots__[:5])
+
+    def merge(self, later):
+        """Returns a scene with the fields of a later scene applied on top of this one"""
+        merged = Scene()
+        for name in self.__slots__:
+            setattr(merged, name, getattr(self, name))
+        # Effects, hue/saturation and color temperature are exclusive, the last one set wins
+        if later.effect is not None:
+            merged.hue = merged.saturation = merged.color_temperature = None
+        if later.hue is not None or later.saturation is not None:
+            merged.effect = merged.color_temperature = None
+        if later.color_temperature is not None:
+            merged.effect = merged.hue = merged.saturation = None
+        for name in self.__slots__:
+            value = getattr(later, name)
+            if value is not None:
+                setattr(merged, name, value)
+        return merged
+
+    def changes(self, document: dict) -> tuple:
+        """Compares the scene with a device's info document.
+
+        Returns the effect to select (or None) and the state request body that brings the device to the scene
+        (empty if nothing differs)."""
+        mode = _current(document, endpoints.STATE_COLOR_MODE)
+        effect = None
+        if self.effect is not None and (mode != "effect"
+                                        or _current(document, endpoints.EFFECTS_SELECT) != self.effect):
+            effect = self.effect
+        data = {}
+        if self.on is not None and _current(document, endpoints.STATE_ON) != self.on:
+            data["on"] = self.on
+        if self.brightness is not None and _current(document, endpoints.STATE_BRIGHTNESS) != self.brightness:
+            data["brightness"] = {"value": self.brightness}
+            if self.duration:
+                data["brightness"]["duration"] = self.duration
+        colored = mode == "hs" and effect is None
+        if self.hue is not None and not (colored and _current(document, endpoints.STATE_HUE) == self.hue):
+            data["hue"] = {"value": self.hue}
+        if self.saturation is not None and \
+                not (colored and _current(document, endpoints.STATE_SATURATION) == self.saturation):
+            data["sat"] = {"value": self.saturation}
+        if self.color_temperature is not None and \
+                not (mode == "ct" and effect is None
+                     and _current(document, endpoints.STATE_COLOR_TEMPERATURE) == self.color_temperature):
+            data["ct"] = {"value": self.color_temperature}
+        return effect, data
+
+
+def _current(document, endpoint):
+    try:
+        return resolve(document, endpoint)
+    except (KeyError, TypeError):
+        return None
+
+
+class ScheduledScene:
+
+    __slots__ = ("at", "device", "scene", "interval", "cancelled", "_scheduler")
+
+    def __init__(self, scheduler, at: float, device: str, scene: Scene, interval: float = None):
+        """A scene change waiting in a SceneScheduler"""
+        self._scheduler = scheduler
+        self.at = at
+        self.device = device
+        self.scene = scene
+        self.interval = interval
+        self.cancelled = False
+
+    def __repr__(self):
+        every = "" if self.interval is None else f", every {self.interval}s"
+        return f"<ScheduledScene({self.device}, at={self.at:.3f}{every}, {self.scene!r})>"
+
+    def cancel(self):
+        """Removes the change from its scheduler. Repeating changes stop repeating."""
+        self._scheduler.cancel(self)
+
+
+class SceneStats:
+
+    def __init__(self):
+        self.rounds = 0
+        self.changes_applied = 0
+        self.requests_sent = 0
+        self.requests_skipped = 0
+        self.errors = 0
+
+    def __repr__(self):
+        return (f"<SceneStats(rounds={self.rounds}, applied={self.changes_applied}, sent={self.requests_sent}, "
+                f"skipped={self.requests_skipped}, errors={self.errors})>")
+
+    def as_dict(self) -> dict:
+        return {"rounds": self.rounds,
+                "changes_applied": self.changes_applied,
+                "requests_sent": self.requests_sent,
+                "requests_skipped": self.requests_skipped,
+                "errors": self.errors}
+
+
+class SceneScheduler:
+
+    def __init__(self, devices: dict = None, coalesce: float = 0.05, max_age: float = 30, max_workers: int = 16):
+        """Applies timed scene changes to any number of Auroras from a background thread.
+
+        devices - Maps a name to an Aurora. The Auroras are kept for the scheduler's lifetime, so their connections
+                  and cached state are reused by every change.
+        coalesce - Changes due within this many seconds of each other are applied together, slightly early
+        max_age - Seconds a device's cached info document is trusted when comparing it with a scene.
+                  With an EventListener running, the cache is kept current and never refetched.
+        max_workers - Maximum number of devices contacted at the same time
+
+        Times are time.time() values. Errors of one device don't affect the others; the latest one of every device
+        is kept in errors.
+        """
+        self.devices = dict(devices or {})
+        self.coalesce = coalesce
+        self.max_age = max_age
+        self.stats = SceneStats()
+        self.errors = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._stop = False
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="SceneScheduler")
+
+    def __repr__(self):
+        return f"<SceneScheduler({len(self.devices)} devices, {len(self)} pending)>"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return sum(1 for _, _, entry in self._heap if not entry.cancelled)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_device(self, name: str, aurora):
+        self.devices[name] = aurora
+
+    def schedule(self, at, device: str, scene: Scene, interval: float = None) -> ScheduledScene:
+        """Applies a scene to a device at a time, a time.time() value or datetime.
+
+        interval - Repeats the change every this many seconds
+        """
+        if device not in self.devices:
+            raise KeyError(f"Unknown device {device!r}")
+        if hasattr(at, "timestamp"):
+            at = at.timestamp()
+        entry = ScheduledScene(self, at, device, scene, interval)
+        self.__push(entry)
+        return entry
+
+    def schedule_in(self, delay: float, device: str, scene: Scene, interval: float = None) -> ScheduledScene:
+        """Applies a scene to a device after delay seconds"""
+        return self.schedule(time.time() + delay, device, scene, interval)
+
+    def every(self, interval: float, device: str, scene: Scene, start=None) -> ScheduledScene:
+        """Applies a scene to a device every interval seconds, first at start (defaults to one interval from now)"""
+        return self.schedule(time.time() + interval if start is None else start, device, scene, interval)
+
+    def ramp(self, at, device: str, brightness: int, duration: float) -> ScheduledScene:
+        """Fades a device to a brightness over duration seconds, starting at a time"""
+        return self.schedule(at, device, Scene(brightness=brightness, duration=duration))
+
+    def cancel(self, entry: ScheduledScene):
+        with self._condition:
+            entry.cancelled = True
+            self._condition.notify()
+
+    def next_due(self) -> float:
+        """Returns the time of the earliest pending change, or None"""
+        with self._condition:
+            self.__drop_cancelled()
+            return self._heap[0][0] if self._heap else None
+
+    def start(self):
+        """Applies changes from a background thread until stop() is called"""
+        if self.running:
+            return self
+        self._stop = False
+        self._thread = threading.Thread(target=self.run, name="SceneScheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._stop = True
+            self._condition.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def close(self):
+        """Stops the scheduler and closes the connections of every device"""
+        self.stop()
+        self._executor.shutdown(wait=True)
+        for aurora in self.devices.values():
+            aurora.close()
+
+    def run(self):
+        """Applies changes on the current thread until stop() is called"""
+        while True:
+            with self._condition:
+                while not self._stop:
+                    due = self.__due_in()
+                    if due is not None and due <= self.coalesce:
+                        break
+                    self._condition.wait(due)
+                if self._stop:
+                    return
+            self.run_pending()
+
+    def run_pending(self, now: float = None) -> dict:
+        """Applies every change due by now (plus the coalesce window) and returns the applied scene per device"""
+        if now is None:
+            now = time.time()
+        scenes = {}
+        with self._condition:
+            while self._heap and self._heap[0][0] <= now + self.coalesce:
+                at, _, entry = heapq.heappop(self._heap)
+                if entry.cancelled:
+                    continue
+                previous = scenes.get(entry.device)
+                scenes[entry.device] = entry.scene if previous is None else previous.merge(entry.scene)
+                self.stats.changes_applied += 1
+                if entry.interval:
+                    # Skip the repeats that were missed, for instance while the host slept
+                    missed = max(0, int((now - at) // entry.interval))
+                    entry.at = at + (missed + 1) * entry.interval
+                    self.__push(entry, notify=False)
+        if not scenes:
+            return scenes
+        self.stats.rounds += 1
+        futures = {device: self._executor.submit(self.__apply, device, scene) for device, scene in scenes.items()}
+        for device, future in futures.items():
+            sent, skipped, error = future.result()
+            self.stats.requests_sent += sent
+            self.stats.requests_skipped += skipped
+            if error is None:
+                self.errors.pop(device, None)
+            else:
+                self.stats.errors += 1
+                self.errors[device] = error
+        return scenes
+
+    def __apply(self, device, scene):
+        """Sends the requests that bring a device to a scene. Returns (requests sent, requests skipped, error)."""
+        aurora = self.devices[device]
+        sent = 0
+        try:
+            effect, data = scene.changes(aurora.snapshot(max_age=self.max_age))
+            skipped = (scene.effect is not None and effect is None) + (scene.changes_state and not data)
+            if effect is not None:
+                aurora.effect.effect = effect
+                sent += 1
+            if data:
+                with aurora.state.batch() as batch:
+                    batch.add(data)
+                sent += 1
+        except Exception as e:
+            # Anything from a refused request to an unreadable response. The device may have changed in ways the
+            # cache doesn't know about.
+            aurora.invalidate()
+            return sent, 0, e
+        return sent, skipped, None
+
+    def __push(self, entry, notify=True):
+        with self._condition:
+            heapq.heappush(self._heap, (entry.at, next(self._counter), entry))
+            if notify:
+                self._condition.notify()
+
+    def __drop_cancelled(self):
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+
+    def __due_in(self):
+        self.__drop_cancelled()
+        if not self._heap:
+            return None
+        return self._heap[0][0] - time.time()
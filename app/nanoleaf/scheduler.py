@@ -0,0 +1,199 @@
+import threading
+import time
+
+
+# Paces an external control stream at a fixed frame rate.
+# Producers submit frames whenever they like; each tick sends only the newest one.
+# Alternatively a source is asked for the frame of every tick, for animations rendered on the host.
+
+# Weight of the newest interval in the smoothed frame rate
+_FPS_SMOOTHING = 0.1
+
+
+class StreamStats:
+
+    def __init__(self):
+        self.frames_submitted = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.send_errors = 0
+        self.fps = 0.0
+        self.jitter_mean = 0.0
+        self.jitter_max = 0.0
+        self._interval = None
+        self._last_sent = None
+
+    def __repr__(self):
+        return (f"<StreamStats(fps={self.fps:.1f}, sent={self.frames_sent}, dropped={self.frames_dropped}, "
+                f"jitter_mean={self.jitter_mean * 1000:.2f}ms)>")
+
+    def as_dict(self) -> dict:
+        """Returns the statistics as a dict"""
+        return {"frames_submitted": self.frames_submitted,
+                "frames_sent": self.frames_sent,
+                "frames_dropped": self.frames_dropped,
+                "send_errors": self.send_errors,
+                "fps": self.fps,
+                "jitter_mean": self.jitter_mean,
+                "jitter_max": self.jitter_max}
+
+    def _record_send(self, now: float, jitter: float):
+        self.frames_sent += 1
+        self.jitter_max = max(self.jitter_max, jitter)
+        self.jitter_mean += (jitter - self.jitter_mean) / self.frames_sent
+        if self._last_sent is not None:
+            interval = now - self._last_sent
+            if self._interval is None:
+                self._interval = interval
+            else:
+                self._interval += _FPS_SMOOTHING * (interval - self._interval)
+            if self._interval > 0:
+                self.fps = 1 / self._interval
+        self._last_sent = now
+
+
+class StreamScheduler:
+
+    def __init__(self, stream, fps: float = 30, source=None):
+        """Sends the latest submitted frame to a stream at a fixed rate.
+
+        stream - An AuroraStream, or anything with a panels_set(panel_ids, colors, transition_times) method
+        fps - Target frames per second
+        source - Function called with the scheduled time of every tick (a perf_counter() value), returning the
+                 (panel_ids, colors, transition_times) frame to send or None. Submitted frames are ignored
+                 while a source is set, such as a Transition. If the source has a stopped(error) method, it's called
+                 when the scheduler stops, with the exception that stopped it or None.
+
+        An exception other than OSError from the source or the stream stops the scheduler. It's kept in error and
+        raised again by stop().
+        """
+        self.stream = stream
+        self.fps = fps
+        self.source = source
+        self.stats = StreamStats()
+        self.error = None
+        self._frame = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.__join()
+        # Don't hide an exception that is already on its way out
+        if self.error is not None and exc_val is None:
+            raise self.error
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, panel_ids, colors, transition_times=None):
+        """Queues a complete frame, replacing any frame that hasn't been sent yet.
+
+        The arrays are sent as they are when the frame goes out, so don't modify them after submitting."""
+        with self._lock:
+            if self._frame is not None:
+                self.stats.frames_dropped += 1
+            self._frame = (panel_ids, colors, transition_times)
+            self.stats.frames_submitted += 1
+
+    def start(self):
+        """Starts sending frames from a background thread"""
+        if self.running:
+            return
+        self._stop.clear()
+        self.error = None
+        self._thread = threading.Thread(target=self.__run_background, name="StreamScheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background thread. Raises the exception that stopped the scheduler early, if any."""
+        self.__join()
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        """Sends frames until stop() is called, blocking the calling thread"""
+        error = None
+        try:
+            deadline = time.perf_counter()
+            while not self._stop.is_set():
+                deadline = self.__next_deadline(deadline)
+                delay = deadline - time.perf_counter()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+                self._tick(deadline)
+        except Exception as e:
+            self.error = error = e
+            raise
+        finally:
+            self.__stopped(error)
+
+    async def run_async(self):
+        """Sends frames from the running event loop until cancelled or stop() is called"""
+        import asyncio
+
+        self._stop.clear()
+        error = None
+        try:
+            deadline = time.perf_counter()
+            while not self._stop.is_set():
+                deadline = self.__next_deadline(deadline)
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self._tick(deadline)
+        except Exception as e:
+            self.error = error = e
+            raise
+        finally:
+            self.__stopped(error)
+
+    def _tick(self, deadline: float):
+        source = self.source
+        if source is not None:
+            frame = source(deadline)
+        else:
+            with self._lock:
+                frame = self._frame
+                self._frame = None
+        if frame is None:
+            return
+        try:
+            self.stream.panels_set(*frame)
+        except OSError:
+            self.stats.send_errors += 1
+            return
+        now = time.perf_counter()
+        self.stats._record_send(now, now - deadline)
+
+    def __run_background(self):
+        try:
+            self.run()
+        except Exception:
+            # Kept in error for stop() to raise on the caller's thread
+            pass
+
+    def __join(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def __stopped(self, error):
+        stopped = getattr(self.source, "stopped", None)
+        if stopped is not None:
+            stopped(error)
+
+    def __next_deadline(self, deadline):
+        period = 1 / self.fps
+        deadline += period
+        now = time.perf_counter()
+        if deadline < now - period:
+            # Fell more than a frame behind, skip the missed ticks instead of bursting to catch up
+            deadline += (now - deadline) // period * period
+        return deadline
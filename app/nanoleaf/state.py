@@ -1,30 +1,165 @@
 import colorsys
-import re
+import string
+import threading
+from contextlib import contextmanager
 
+from app.nanoleaf import endpoints
+from app.nanoleaf.cache import resolve
 from app.nanoleaf.model import AuroraObject
 from app.nanoleaf.exceptions import BadRequestException
 
 
+_HEX_DIGITS = frozenset(string.hexdigits)
+
+
+# TODO: Shame on all these magic numbers. SHAME.
+
+def rgb_from_hsv(hue, saturation, brightness):
+    """Converts the device's hue (0-360), saturation and brightness (0-100) to a list of 0-255 RGB values"""
+    if hue is None or saturation is None or brightness is None:
+        return None
+    rgb = colorsys.hsv_to_rgb(hue / 360, saturation / 100, brightness / 100)
+    return [int(rgb[0] * 255), int(rgb[1] * 255), int(rgb[2] * 255)]
+
+
+def rgb_from_snapshot(document: dict):
+    """Returns the color held in an info document as a list of 0-255 RGB values"""
+    if document is None:
+        return None
+    return rgb_from_hsv(resolve(document, endpoints.STATE_HUE),
+                        resolve(document, endpoints.STATE_SATURATION),
+                        resolve(document, endpoints.STATE_BRIGHTNESS))
+
+
+def rgb_from_hex(hexcolor: str):
+    """Parses an RRGGBB hex string, with or without a leading #, into a tuple of 0-255 RGB values.
+
+    Returns None if the string isn't a valid hex color."""
+    if hexcolor.startswith("#"):
+        hexcolor = hexcolor[1:]
+    if len(hexcolor) != 6 or not _HEX_DIGITS.issuperset(hexcolor):
+        return None
+    value = int(hexcolor, 16)
+    return value >> 16, (value >> 8) & 0xFF, value & 0xFF
+
+
+def hsv_data_from_rgb(color):
+    """Converts a hex string or 0-255 RGB values to the state data understood by the device.
+
+    The RGB values may be any sequence of three, such as the NumPy arrays returned by the color module.
+    Returns None if the color is invalid."""
+    if isinstance(color, str):
+        rgb = rgb_from_hex(color)
+        if rgb is None:
+            print("Error: Color must be in valid hex format.")
+            return
+        red, green, blue = rgb
+    else:
+        try:
+            red, green, blue = (int(channel) for channel in color)
+        except (TypeError, ValueError):
+            print("Error: Color must have one hex value or three 0-255 values.")
+            return
+    if not 0 <= red <= 255:
+        print("Error: Red value out of range! (0-255)")
+        return
+    if not 0 <= green <= 255:
+        print("Error: Green value out of range! (0-255)")
+        return
+    if not 0 <= blue <= 255:
+        print("Error: Blue value out of range! (0-255)")
+        return
+
+    hsv = colorsys.rgb_to_hsv(red / 255, green / 255, blue / 255)
+    hue = int(hsv[0] * 360)
+    saturation = int(hsv[1] * 100)
+    brightness = int(hsv[2] * 100)
+    return {"hue": {"value": hue}, "sat": {"value": saturation}, "brightness": {"value": brightness}}
+
+
+# Valid range of each state value, used to fold increments into pending values
+_STATE_RANGES = {"brightness": (0, 100), "hue": (0, 360), "sat": (0, 100), "ct": (1200, 6500)}
+
+
+class StateBatch:
+
+    def __init__(self):
+        """Merges state changes into the body of a single PUT request"""
+        self.data = {}
+
+    def add(self, data: dict):
+        """Merges a state request body into the batch. Later writes win."""
+        for key, body in data.items():
+            self.__merge(key, body)
+
+    def __merge(self, key, body):
+        if not isinstance(body, dict):
+            self.data[key] = body
+            return
+        # Hue/saturation and color temperature are exclusive color modes, the last one set wins
+        if key == "ct":
+            self.data.pop("hue", None)
+            self.data.pop("sat", None)
+        elif key in ("hue", "sat"):
+            self.data.pop("ct", None)
+
+        pending = self.data.get(key)
+        if pending is None or "value" in body:
+            self.data[key] = dict(body)
+        elif "increment" in body:
+            if "value" in pending:
+                low, high = _STATE_RANGES.get(key, (float("-inf"), float("inf")))
+                pending["value"] = min(max(pending["value"] + body["increment"], low), high)
+            else:
+                pending["increment"] = pending.get("increment", 0) + body["increment"]
+
+
 class State(AuroraObject):
 
     def __init__(self, requester):
         super().__init__(requester)
+        self._local = threading.local()
+
+    def _put(self, data):
+        batch = getattr(self._local, "batch", None)
+        if batch is not None:
+            batch.add(data)
+        else:
+            self._requester.request(method="PUT", endpoint=endpoints.STATE, data=data)
+
+    @contextmanager
+    def batch(self):
+        """Collects every state change made inside the block and sends them as one request on exit.
+
+        Changes are discarded if the block raises. Reads inside the block still return the device's values."""
+        batch = getattr(self._local, "batch", None)
+        if batch is not None:
+            yield batch
+            return
+        batch = StateBatch()
+        self._local.batch = batch
+        try:
+            yield batch
+        finally:
+            self._local.batch = None
+        if batch.data:
+            self._requester.request(method="PUT", endpoint=endpoints.STATE, data=batch.data)
 
     @property
     def color_mode(self):
         """Returns the current color mode."""
-        return self._requester.request(method="GET", endpoint="state/colorMode")
+        return self._requester.request(method="GET", endpoint=endpoints.STATE_COLOR_MODE)
 
     @property
     def on(self):
         """Returns True if the device is on, False if it's off"""
-        return self._requester.request(method="GET", endpoint="state/on/value")
+        return self._requester.request(method="GET", endpoint=endpoints.STATE_ON)
 
     @on.setter
     def on(self, value: bool):
         """Turns the device on/off. True = on, False = off"""
         data = {"on": value}
-        self._requester.request(method="PUT", endpoint="state", data=data)
+        self._put(data)
 
     @property
     def off(self):
@@ -43,28 +178,28 @@ class State(AuroraObject):
     @property
     def brightness(self):
         """Returns the brightness of the device (0-100)"""
-        return self._requester.request(method="GET", endpoint="state/brightness/value")
+        return self._requester.request(method="GET", endpoint=endpoints.STATE_BRIGHTNESS)
 
     @brightness.setter
     def brightness(self, level):
         """Sets the brightness to the given level (0-100)"""
         data = {"brightness": {"value": level}}
-        self._requester.request(method="PUT", endpoint="state", data=data)
+        self._put(data)
 
     @property
     def brightness_min(self):
         """Returns the minimum brightness possible. (This always returns 0)"""
-        return self._requester.request(method="GET", endpoint="state/brightness/min")
+        return self._requester.request(method="GET", endpoint=endpoints.STATE_BRIGHTNESS_MIN)
 
     @property
     def brightness_max(self):
         """Returns the maximum brightness possible. (This always returns 100)"""
-        return self._requester.request(method="GET", endpoint="state/brightness/max")
+        return self._requester.request(method="GET", endpoint=endpoints.STATE_BRIGHTNESS_MAX)
 
     def brightness_raise(self, level):
         """Raise the brightness of the device by a relative amount (negative lowers brightness)"""
         data = {"brightness": {"increment": level}}
-        self._requester.request(method="PUT", endpoint="state", data=data)
+        self._put(data)
 
     def brightness_lower(self, level):
         """Lower the brightness of the device by a relative amount (negative raises brightness)"""
@@ -73,28 +208,28 @@ class State(AuroraObject):
     @property
     def hue(self):
         """Returns the hue of the device (0-360)"""
-        return self._requester.request(method="GET", endpoint="state/hue/value")
+        return self._requester.request(method="GET", endpoint=endpoints.STATE_HUE)
 
     @hue.setter
     def hue(self, level):
         """Sets the hue to the given level (0-360)"""
         data = {"hue": {"value": level}}
-        self._requester.request(method="PUT", endpoint="state", data=data)
+        self._put(data)
 
     @property
     def hue_min(self):
         """Returns the minimum hue possible. (This always returns 0)"""
-        return self._requester.request(method="GET", endpoint="state/hue/min")
+        return self._requester.request(method="GET", endpoint=endpoints.STATE_HUE_MIN)
 
     @property
     def hue_max(self):
         """Returns the maximum hue possible. (This always returns 360)"""
-        return self._requester.request(method="GET", endpoint="state/hue/max")
+        return self._requester.request(method="GET", endpoint=endpoints.STATE_HUE_MAX)
 
     def hue_raise(self, level):
         """Raise the hue of the device by a relative amount (negative lowers hue)"""
         data = {"hue": {"increment": level}}
-        self._requester.request(method="PUT", endpoint="state", data=data)
+        self._put(data)
 
     def hue_lower(self, level):
         """Lower the hue of the device by a relative amount (negative raises hue)"""
@@ -103,28 +238,28 @@ class State(AuroraObject):
     @property
     def saturation(self):
         """Returns the saturation of the device (0-100)"""
-        return self._requester.request(method="GET", endpoint="state/sat/value")
+        return self._requester.request(method="GET", endpoint=endpoints.STATE_SATURATION)
 
     @saturation.setter
     def saturation(self, level):
         """Sets the saturation to the given level (0-100)"""
         data = {"sat": {"value": level}}
-        self._requester.request(method="PUT", endpoint="state", data=data)
+        self._put(data)
 
     @property
     def saturation_min(self):
         """Returns the minimum saturation possible. (This always returns 0)"""
-        self._requester.request(method="GET", endpoint="state/sat/min")
+        self._requester.request(method="GET", endpoint=endpoints.STATE_SATURATION_MIN)
 
     @property
     def saturation_max(self):
         """Returns the maximum saturation possible. (This always returns 100)"""
-        self._requester.request(method="GET", endpoint="state/sat/max")
+        self._requester.request(method="GET", endpoint=endpoints.STATE_SATURATION_MAX)
 
     def saturation_raise(self, level):
         """Raise the saturation of the device by a relative amount (negative lowers saturation)"""
         data = {"sat": {"increment": level}}
-        self._requester.request(method="PUT", endpoint="state", data=data)
+        self._put(data)
 
     def saturation_lower(self, level):
         """Lower the saturation of the device by a relative amount (negative raises saturation)"""
@@ -133,78 +268,42 @@ class State(AuroraObject):
     @property
     def color_temperature(self):
         """Returns the color temperature of the device (0-100)"""
-        return self._requester.request(method="GET", endpoint="state/ct/value")
+        return self._requester.request(method="GET", endpoint=endpoints.STATE_COLOR_TEMPERATURE)
 
     @color_temperature.setter
     def color_temperature(self, level):
         """Sets the color temperature to the given level (0-100)"""
         data = {"ct": {"value": level}}
-        self._requester.request(method="PUT", endpoint="state", data=data)
+        self._put(data)
 
     @property
     def color_temperature_min(self):
         """Returns the minimum color temperature possible. (This always returns 1200)"""
-        return self._requester.request(method="GET", endpoint="state/ct/min")
+        return self._requester.request(method="GET", endpoint=endpoints.STATE_COLOR_TEMPERATURE_MIN)
 
     @property
     def color_temperature_max(self):
         """Returns the maximum color temperature possible. (This always returns 6500)"""
-        return self._requester.request(method="GET", endpoint="state/ct/max")
+        return self._requester.request(method="GET", endpoint=endpoints.STATE_COLOR_TEMPERATURE_MAX)
 
     def color_temperature_raise(self, level):
         """Raise the color temperature of the device by a relative amount (negative lowers color temperature)"""
         data = {"ct": {"increment": level}}
-        self._requester.request(method="PUT", endpoint="state", data=data)
+        self._put(data)
 
     def color_temperature_lower(self, level):
         """Lower the color temperature of the device by a relative amount (negative raises color temperature)"""
         self.color_temperature_raise(-level)
 
-    # TODO: Shame on all these magic numbers. SHAME.
-
     @property
     def rgb(self):
         """The color of the device, as represented by 0-255 RGB values"""
-        hue = self.hue
-        saturation = self.saturation
-        brightness = self.brightness
-        if hue is None or saturation is None or brightness is None:
-            return None
-        rgb = colorsys.hsv_to_rgb(hue / 360, saturation / 100, brightness / 100)
-        return [int(rgb[0] * 255), int(rgb[1] * 255), int(rgb[2] * 255)]
+        return rgb_from_snapshot(self._requester.snapshot())
 
     @rgb.setter
     def rgb(self, color):
         """Set the color of the device, as represented by either a hex string or a list of 0-255 RGB values"""
-        try:
-            red, green, blue = color
-        except ValueError:
-            try:
-                hexcolor = color
-                reg_match = re.match("^([A-Fa-f0-9]{6})$", hexcolor)
-                if reg_match:
-                    red = int(hexcolor[:2], 16)
-                    green = int(hexcolor[2:-2], 16)
-                    blue = int(hexcolor[-2:], 16)
-                else:
-                    print("Error: Color must be in valid hex format.")
-                    return
-            except ValueError:
-                print("Error: Color must have one hex value or three 0-255 values.")
-                return
-        if not 0 <= red <= 255:
-            print("Error: Red value out of range! (0-255)")
-            return
-        if not 0 <= green <= 255:
-            print("Error: Green value out of range! (0-255)")
+        data = hsv_data_from_rgb(color)
+        if data is None:
             return
-        if not 0 <= blue <= 255:
-            print("Error: Blue value out of range! (0-255)")
-            return
-
-        hsv = colorsys.rgb_to_hsv(red / 255, green / 255, blue / 255)
-        hue = int(hsv[0] * 360)
-        saturation = int(hsv[1] * 100)
-        brightness = int(hsv[2] * 100)
-        data = {"hue": {"value": hue}, "sat": {"value": saturation}, "brightness": {"value": brightness}}
-        self._requester.request(method="PUT", endpoint="state", data=data)
+        self._put(data)
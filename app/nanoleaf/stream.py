@@ -0,0 +1,353 @@
+import socket
+
+# numpy is imported on first use, so scripts that only stream single panels start without it
+_UNLOADED = object()
+np = _UNLOADED
+
+
+# External control (UDP) streaming
+# Packet layout: nPanels, then per panel: panelId, nFrames (always 1), R, G, B, W, transitionTime
+
+RECORD_SIZE = 7
+
+
+def _numpy():
+    """Returns the numpy module, or None if it isn't installed"""
+    global np
+    if np is _UNLOADED:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+    return np
+
+
+class FrameBuffer:
+
+    def __init__(self, panel_ids=()):
+        """A reusable external control packet with one fixed slot per panel.
+
+        Colors are written in place, so once every panel has a slot no buffers are allocated per frame."""
+        self._slots = {}
+        self._data = bytearray(1)
+        self._packet = bytearray(1)
+        self._sent = bytearray()
+        self._pending = bytearray()
+        self._dirty = bytearray()
+        # Slots of preregistered panels stay out of delta and keyframe packets until a color is set
+        self._set = bytearray()
+        self._set_count = 0
+        self._pending_count = 0
+        self._view = None
+        self._packet_view = None
+        self._arrays = None
+        self._index = None
+        for panel_id in panel_ids:
+            self.slot(panel_id)
+
+    def __len__(self):
+        return len(self._slots)
+
+    @property
+    def panel_ids(self) -> list:
+        """Returns the panel IDs in slot order"""
+        return list(self._slots)
+
+    @property
+    def pending_count(self) -> int:
+        """Returns the number of panels set since the last send"""
+        return self._pending_count
+
+    def slot(self, panel_id: int) -> int:
+        """Returns the slot index of a panel, adding a slot if the panel is new"""
+        slot = self._slots.get(panel_id)
+        if slot is None:
+            slot = self.__add(panel_id)
+        return slot
+
+    def is_dirty(self, panel_id: int) -> bool:
+        """Returns True if the panel differs from what was last sent"""
+        return bool(self._dirty[self._slots[panel_id]])
+
+    def set(self, panel_id: int, red: int, green: int, blue: int, white: int = 0, transition_time: int = 1):
+        """Writes a panel's color into its slot"""
+        slot = self._slots.get(panel_id)
+        if slot is None:
+            slot = self.__add(panel_id)
+        data = self._data
+        offset = 1 + slot * RECORD_SIZE
+        data[offset + 2] = red
+        data[offset + 3] = green
+        data[offset + 4] = blue
+        data[offset + 5] = white
+        data[offset + 6] = transition_time
+
+        sent = self._sent
+        base = slot * RECORD_SIZE
+        # nFrames is always 1 in a sent record, so 0 means the panel was never sent
+        self._dirty[slot] = (sent[base + 1] == 0 or sent[base + 2] != red or sent[base + 3] != green
+                             or sent[base + 4] != blue or sent[base + 5] != white
+                             or sent[base + 6] != transition_time)
+        if not self._pending[slot]:
+            self._pending[slot] = 1
+            self._pending_count += 1
+        if not self._set[slot]:
+            self._set[slot] = 1
+            self._set_count += 1
+
+    def set_many(self, panel_ids, colors, transition_times=None):
+        """Writes the colors of many panels at once.
+
+        panel_ids - N panel IDs
+        colors - (N, 3) RGB or (N, 4) RGBW values, ideally a uint8 NumPy array
+        transition_times - N transition times or a single one for every panel (defaults to 1)
+        """
+        np = _numpy()
+        if np is None:
+            self.__set_many_python(panel_ids, colors, transition_times)
+            return
+        colors = np.asarray(colors, dtype=np.uint8)
+        if colors.ndim != 2 or colors.shape[1] not in (3, 4) or len(colors) != len(panel_ids):
+            raise ValueError("colors must have the shape (N, 3) or (N, 4)")
+        slots = self.__slots_of(panel_ids)
+        records, sent, pending, dirty, is_set = self.__get_arrays()
+        channels = colors.shape[1]
+        records[slots, 2:2 + channels] = colors
+        if channels == 3:
+            records[slots, 5] = 0
+        records[slots, 6] = 1 if transition_times is None else np.asarray(transition_times, dtype=np.uint8)
+        # nFrames is 0 in the sent record of a panel that was never sent, so it always compares as dirty
+        dirty[slots] = (records[slots, 1:] != sent[slots, 1:]).any(axis=1)
+        pending[slots] = 1
+        is_set[slots] = 1
+        self._pending_count = int(np.count_nonzero(pending))
+        self._set_count = int(np.count_nonzero(is_set))
+
+    def frame(self) -> memoryview:
+        """Returns the packet containing every panel"""
+        if self._view is None:
+            self._view = memoryview(self._data)
+        self._data[0] = len(self._slots)
+        return self._view
+
+    def pending(self) -> memoryview:
+        """Returns the packet containing the panels set since the last send"""
+        if self._pending_count == len(self._slots):
+            return self.frame()
+        return self.__collect(self._pending)
+
+    def keyframe(self) -> memoryview:
+        """Returns the packet containing every panel that was ever set, or None if none was"""
+        if self._set_count == len(self._slots):
+            return self.frame()
+        if not self._set_count:
+            return None
+        return self.__collect(self._set)
+
+    def changed(self) -> memoryview:
+        """Returns the packet containing the panels set since the last send whose color or transition changed.
+
+        Returns None if no panel changed."""
+        if not any(self._dirty):
+            return None
+        return self.__collect(self._dirty)
+
+    def mark_sent(self, all_panels: bool = False):
+        """Records the pending panels (or every panel that was ever set) as sent"""
+        flags = self._set if all_panels else self._pending
+        count = self._set_count if all_panels else self._pending_count
+        if count == len(self._slots):
+            self._sent[:] = self.frame()[1:]
+        else:
+            view = self.frame()
+            for slot, flag in enumerate(flags):
+                if flag:
+                    base = slot * RECORD_SIZE
+                    self._sent[base:base + RECORD_SIZE] = view[1 + base:1 + base + RECORD_SIZE]
+        zeros = bytes(len(self._slots))
+        self._pending[:] = zeros
+        self._dirty[:] = zeros
+        self._pending_count = 0
+
+    def __collect(self, flags):
+        if self._packet_view is None:
+            self._packet_view = memoryview(self._packet)
+        view = self.frame()
+        packet = self._packet_view
+        position = 1
+        for slot, flag in enumerate(flags):
+            if flag:
+                offset = 1 + slot * RECORD_SIZE
+                packet[position:position + RECORD_SIZE] = view[offset:offset + RECORD_SIZE]
+                position += RECORD_SIZE
+        packet[0] = (position - 1) // RECORD_SIZE
+        return packet[:position]
+
+    def __set_many_python(self, panel_ids, colors, transition_times):
+        single_transition = transition_times is None or isinstance(transition_times, int)
+        for i, panel_id in enumerate(panel_ids):
+            color = colors[i]
+            white = color[3] if len(color) > 3 else 0
+            if single_transition:
+                transition_time = 1 if transition_times is None else transition_times
+            else:
+                transition_time = transition_times[i]
+            self.set(panel_id, color[0], color[1], color[2], white, transition_time)
+
+    def __slots_of(self, panel_ids):
+        ids = np.asarray(panel_ids)
+        if self._index is None:
+            self.__build_index()
+        slot_ids, sorted_ids, order = self._index
+        if ids.shape == slot_ids.shape and np.array_equal(ids, slot_ids):
+            return slice(None)
+        positions = np.searchsorted(sorted_ids, ids)
+        found = sorted_ids[np.minimum(positions, len(sorted_ids) - 1)] == ids if len(sorted_ids) else \
+            np.zeros(len(ids), dtype=bool)
+        if not found.all():
+            for panel_id in ids[~found]:
+                self.slot(int(panel_id))
+            return self.__slots_of(ids)
+        return order[positions]
+
+    def __build_index(self):
+        slot_ids = np.fromiter(self._slots, dtype=np.int64, count=len(self._slots))
+        order = np.argsort(slot_ids, kind="stable")
+        self._index = (slot_ids, slot_ids[order], order)
+
+    def __get_arrays(self):
+        if self._arrays is None:
+            count = len(self._slots)
+            records = np.frombuffer(self._data, dtype=np.uint8, count=count * RECORD_SIZE, offset=1)
+            self._arrays = (records.reshape(count, RECORD_SIZE),
+                            np.frombuffer(self._sent, dtype=np.uint8).reshape(count, RECORD_SIZE),
+                            np.frombuffer(self._pending, dtype=np.uint8),
+                            np.frombuffer(self._dirty, dtype=np.uint8),
+                            np.frombuffer(self._set, dtype=np.uint8))
+        return self._arrays
+
+    def __add(self, panel_id):
+        # Resizing a bytearray isn't allowed while a view of it is exported
+        self.__release_views()
+        self._index = None
+        slot = len(self._slots)
+        self._slots[panel_id] = slot
+        self._data.extend((panel_id, 1, 0, 0, 0, 0, 0))
+        self._packet.extend(bytes(RECORD_SIZE))
+        self._sent.extend(bytes(RECORD_SIZE))
+        self._pending.append(0)
+        self._dirty.append(0)
+        self._set.append(0)
+        return slot
+
+    def __release_views(self):
+        self._arrays = None
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._packet_view is not None:
+            self._packet_view.release()
+            self._packet_view = None
+
+
+class AuroraStream:
+    def __init__(self, addr: str, port: int, panel_ids=(), delta: bool = False, keyframe_interval: int = 30,
+                 metrics=None, correction=None):
+        """An external control stream.
+
+        delta - Only send the panels whose color or transition changed since they were last sent
+        keyframe_interval - With delta on, send every panel once per this many frames to recover from packet loss
+        metrics - Metrics that count the packets and bytes sent
+        correction - A color.Correction applied to every color set through the stream
+
+        Set recorder to a recording.Recorder to capture every packet sent.
+        """
+        self.addr = (addr, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.settimeout(1)
+        self.frame = FrameBuffer(panel_ids)
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self._frames_since_keyframe = 0
+        self._single = bytearray((1, 0, 1, 0, 0, 0, 0, 0))
+        self.metrics = metrics
+        self.correction = correction
+        self.recorder = None
+
+    def __send(self, msg):
+        self.sock.sendto(msg, self.addr)
+        if self.metrics is not None:
+            self.metrics.record_packet(self.addr[0], len(msg))
+        if self.recorder is not None:
+            self.recorder.add_packet(msg)
+
+    def send_packet(self, packet):
+        """Sends a complete external control packet, such as a frame of a recording, bypassing the frame buffer"""
+        self.__send(packet)
+
+    def panel_set(self, panel_id: int, red: int, green: int, blue: int,
+                  white: int = 0, transition_time: int = 1):
+        if self.correction is not None:
+            red, green, blue = self.correction.correct(red, green, blue)
+        b = self._single
+        b[1] = panel_id
+        b[3] = red
+        b[4] = green
+        b[5] = blue
+        b[6] = white
+        b[7] = transition_time
+        self.__send(b)
+
+    def panel_prepare(self, panel_id: int, red: int, green: int, blue: int,
+                      white: int = 0, transition_time: int = 1):
+        if self.correction is not None:
+            red, green, blue = self.correction.correct(red, green, blue)
+        self.frame.set(panel_id, red, green, blue, white, transition_time)
+
+    def panels_prepare(self, panel_ids, colors, transition_times=None):
+        """Prepares many panels at once from an (N, 3) RGB or (N, 4) RGBW color array.
+
+        A single color, such as color.kelvin_to_rgb(2700), is used for every panel."""
+        np = _numpy()
+        if np is not None:
+            colors = np.asarray(colors)
+            if colors.ndim == 1:
+                colors = np.broadcast_to(colors, (len(panel_ids), len(colors)))
+            if self.correction is not None:
+                colors = self.correction(colors)
+        elif self.correction is not None:
+            correct = self.correction.correct
+            colors = [correct(*color[:3]) + tuple(color[3:]) for color in colors]
+        self.frame.set_many(panel_ids, colors, transition_times)
+
+    def panels_set(self, panel_ids, colors, transition_times=None):
+        """Sets many panels at once from an (N, 3) RGB or (N, 4) RGBW color array in a single packet"""
+        self.panels_prepare(panel_ids, colors, transition_times)
+        self.panel_strobe()
+
+    def panel_strobe(self):
+        if self.frame.pending_count == 0:
+            return
+        if not self.delta:
+            self.__send(self.frame.pending())
+            self.frame.mark_sent()
+            return
+
+        self._frames_since_keyframe += 1
+        if self._frames_since_keyframe >= self.keyframe_interval:
+            self.keyframe()
+            return
+        packet = self.frame.changed()
+        if packet is not None:
+            self.__send(packet)
+        self.frame.mark_sent()
+
+    def keyframe(self):
+        """Sends every panel's current color, whether it changed or not"""
+        self._frames_since_keyframe = 0
+        packet = self.frame.keyframe()
+        if packet is None:
+            return
+        self.__send(packet)
+        self.frame.mark_sent(all_panels=True)
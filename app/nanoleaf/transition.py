@@ -0,0 +1,180 @@
+import threading
+
+from app.nanoleaf import color
+from app.nanoleaf.scheduler import StreamScheduler
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Fades computed on the host and streamed frame by frame.
+# Start and end colors are converted to the interpolation space once,
+# so every frame is a single multiply-add over all panels plus the conversion back to RGB.
+
+
+def linear(x: float) -> float:
+    return x
+
+
+def ease_in(x: float) -> float:
+    return x * x * x
+
+
+def ease_out(x: float) -> float:
+    x = 1 - x
+    return 1 - x * x * x
+
+
+def ease_in_out(x: float) -> float:
+    if x < 0.5:
+        return 4 * x * x * x
+    x = -2 * x + 2
+    return 1 - x * x * x / 2
+
+
+def smoothstep(x: float) -> float:
+    return x * x * (3 - 2 * x)
+
+
+EASINGS = {
+    "linear": linear,
+    "ease_in": ease_in,
+    "ease_out": ease_out,
+    "ease_in_out": ease_in_out,
+    "smoothstep": smoothstep,
+}
+
+# Color spaces colors can be interpolated in
+SPACES = ("hsv", "rgb", "linear")
+
+
+class Transition:
+
+    def __init__(self, panel_ids, start, end, duration: float, easing="ease_in_out", space: str = "hsv"):
+        """Fades panels from one set of colors to another.
+
+        panel_ids - N panel IDs
+        start, end - (N, 3) RGB arrays, or a single RGB color for every panel
+        duration - Length of the fade in seconds
+        easing - Name of a function in EASINGS, or a function mapping progress (0-1) to a blend factor
+        space - "hsv" fades along the hue circle, "linear" blends light intensities, "rgb" blends the raw values
+
+        Stream it with play() or as the source of a StreamScheduler, or call colors_at() to render single frames.
+        """
+        if np is None:
+            raise ImportError("Transition requires numpy")
+        if space not in SPACES:
+            raise ValueError(f"space must be one of {', '.join(SPACES)}")
+        self.panel_ids = list(panel_ids)
+        self.duration = duration
+        self.easing = EASINGS[easing] if isinstance(easing, str) else easing
+        self.space = space
+        self.started_at = None
+        self.error = None
+        self._finished = threading.Event()
+        count = len(self.panel_ids)
+        start = np.broadcast_to(np.asarray(start, dtype=np.uint8)[..., :3], (count, 3))
+        end = np.broadcast_to(np.asarray(end, dtype=np.uint8)[..., :3], (count, 3))
+        self.start_colors = np.array(start)
+        self.end_colors = np.array(end)
+        self._origin, self._delta = self.__prepare(start, end)
+        self._blend = np.empty((count, 3), dtype=np.float64)
+        self._ids = np.asarray(self.panel_ids)
+
+    def __repr__(self):
+        return f"<Transition({len(self.panel_ids)} panels, {self.duration}s, {self.space})>"
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Waits until the last frame was rendered, or the StreamScheduler playing the fade stopped.
+
+        Raises the exception that stopped the scheduler. Returns False on timeout."""
+        finished = self._finished.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return finished
+
+    def stopped(self, error):
+        """Called by the StreamScheduler playing the fade when it stops, with the exception that stopped it"""
+        self.error = error
+        self._finished.set()
+
+    def reverse(self):
+        """Returns a transition from this one's end colors back to its start colors"""
+        return Transition(self.panel_ids, self.end_colors, self.start_colors, self.duration, self.easing, self.space)
+
+    def colors_at(self, progress: float):
+        """Returns the (N, 3) uint8 RGB colors at a point of the fade, from 0 (start) to 1 (end)"""
+        if progress <= 0:
+            return self.start_colors.copy()
+        if progress >= 1:
+            # Converting back and forth may be off by one, so end on exactly the requested colors
+            return self.end_colors.copy()
+        factor = self.easing(progress)
+        blend = np.multiply(self._delta, factor, out=self._blend)
+        blend += self._origin
+        if self.space == "hsv":
+            # Hue may have wrapped past 360
+            return color.hsv_to_rgb(blend[:, 0] % 360, blend[:, 1], blend[:, 2])
+        if self.space == "linear":
+            return color.linear_to_srgb(blend)
+        return np.rint(blend).astype(np.uint8)
+
+    def frame(self, now: float):
+        """Returns the (panel_ids, colors, transition_times) frame at a perf_counter() time, or None once done.
+
+        The fade starts with the first frame requested."""
+        if self._finished.is_set():
+            return None
+        if self.started_at is None:
+            self.started_at = now
+        progress = 1.0 if self.duration <= 0 else (now - self.started_at) / self.duration
+        if progress >= 1:
+            self._finished.set()
+        return self._ids, self.colors_at(progress), None
+
+    __call__ = frame
+
+    def restart(self):
+        """Lets the fade play again from the start"""
+        self.started_at = None
+        self.error = None
+        self._finished.clear()
+
+    def play(self, stream, fps: float = 30):
+        """Streams the whole fade to an AuroraStream, blocking until it's done.
+
+        Exceptions raised by the stream are raised here."""
+        with StreamScheduler(stream, fps=fps, source=self):
+            self.wait()
+        return self
+
+    def __prepare(self, start, end):
+        if self.space == "hsv":
+            origin = color.rgb_to_hsv(start)
+            target = color.rgb_to_hsv(end)
+            # Gray has no hue and black no saturation either, so fade to or from them with the other color's
+            # instead of sweeping through unrelated colors
+            for a, b in ((origin, target), (target, origin)):
+                a[:, 0] = np.where(a[:, 1] == 0, b[:, 0], a[:, 0])
+                a[:, 1] = np.where(a[:, 2] == 0, b[:, 1], a[:, 1])
+            delta = target - origin
+            # Take the shorter way around the hue circle
+            delta[:, 0] = (delta[:, 0] + 180) % 360 - 180
+            return origin, delta
+        if self.space == "linear":
+            origin = color.srgb_to_linear(start)
+            return origin, color.srgb_to_linear(end) - origin
+        origin = start.astype(np.float64)
+        return origin, end.astype(np.float64) - origin
+
+
+def crossfade(stream, panel_ids, start, end, duration: float, fps: float = 30, easing="ease_in_out",
+              space: str = "hsv") -> Transition:
+    """Fades panels between two sets of colors over an AuroraStream, blocking until the fade is done"""
+    return Transition(panel_ids, start, end, duration, easing, space).play(stream, fps)
@@ -1 +1,22 @@
-from .requester import Requester
+import importlib
+
+# AsyncRequester pulls in aiohttp, so the requesters are only imported once used
+_LAZY_NAMES = {
+    "Requester": "app.nanoleaf.utils.requester",
+    "AsyncRequester": "app.nanoleaf.utils.async_requester",
+}
+
+__all__ = ["Requester", "AsyncRequester"]
+
+
+def __getattr__(name):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
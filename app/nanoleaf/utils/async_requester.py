@@ -0,0 +1,136 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from app.nanoleaf import endpoints, exceptions
+from app.nanoleaf.cache import MISSING
+from app.nanoleaf.utils.requester import _RETRYABLE_EXCEPTIONS, BaseRequester
+from app.nanoleaf.utils.resilience import DEFAULT_TIMEOUT, CircuitBreaker, RetryPolicy
+
+
+class AsyncRequester(BaseRequester):
+
+    def __init__(self, ip_address: str = None, auth_token: str = None, pool_size: int = 10,
+                 timeout=DEFAULT_TIMEOUT, cache_ttl: float = 0, metrics=None, retries: int = 0,
+                 backoff_factor: float = 0, retry_policy: RetryPolicy = None, circuit_breaker: CircuitBreaker = None):
+        """Sends requests to a single Aurora over a shared aiohttp session.
+
+        pool_size - Number of sockets kept open to the device
+        timeout - Seconds to wait for the device, either a float or a (connect, read) tuple. None waits forever.
+        cache_ttl - Seconds GET requests are served from a cached info document. 0 disables the cache.
+        metrics - Metrics that record the latency and outcome of every request
+        retries, backoff_factor, retry_policy, circuit_breaker - Same as for Requester
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncRequester requires aiohttp. Install it with: pip install aiohttp")
+        if retry_policy is None:
+            retry_policy = RetryPolicy(retries, backoff_factor)
+        super().__init__(ip_address, auth_token, cache_ttl, metrics, retry_policy, circuit_breaker)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """Closes every pooled connection to the device"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def request(self, method: str, endpoint: str = "", data: dict = None):
+        if method == "GET" and self.cache.covers(endpoint):
+            output = self.cache.lookup(endpoint)
+            if output is MISSING:
+                await self.__send(method="GET", endpoint=endpoints.INFO)
+                output = self.cache.lookup(endpoint)
+            if output is not MISSING:
+                return output
+        return await self.__send(method=method, endpoint=endpoint, data=data)
+
+    async def snapshot(self, max_age: float = None) -> dict:
+        """Returns the full info document in a single round trip.
+
+        The cached document is reused if it is younger than max_age (defaults to the cache TTL)."""
+        document = self.cache.lookup(endpoints.INFO, max_age)
+        if document is MISSING:
+            document = await self.__send(method="GET", endpoint=endpoints.INFO)
+        return document
+
+    @asynccontextmanager
+    async def stream(self, endpoint: str):
+        """Opens a long-lived GET request and yields the streaming response.
+
+        Only the connect timeout applies, since the device may stay quiet for any amount of time."""
+        connect_timeout = self.timeout[0] if isinstance(self.timeout, tuple) else self.timeout
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=None)
+        async with self.__get_session().get(self.base_url + endpoint, timeout=timeout) as r:
+            self._check(status=r.status, output=None)
+            yield r
+
+    async def __send(self, method: str, endpoint: str = "", data: dict = None):
+        attempt = 0
+        while True:
+            self._admit()
+            try:
+                output = await self.__attempt(method, endpoint, data)
+            except _RETRYABLE_EXCEPTIONS as e:
+                delay = self._retry_delay(method, attempt, e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except exceptions.AuroraException:
+                self.circuit_breaker.record_success()
+                raise
+            except BaseException:
+                self.circuit_breaker.release()
+                raise
+            self.circuit_breaker.record_success()
+            return output
+
+    async def __attempt(self, method, endpoint, data):
+        url = self.base_url + endpoint
+        started = self._started(method, endpoint, data)
+        try:
+            async with self.__get_session().request(method=method, url=url, json=data) as r:
+                text = await r.text()
+                status = r.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._finished(started, method, endpoint, data, None, e)
+            sent = not isinstance(e, aiohttp.ClientConnectorError)
+            raise exceptions.ConnectionFailedException(e, sent=sent) from e
+        output = None if text == "" else json.loads(text)
+        try:
+            self._check(status=status, output=output)
+        except exceptions.AuroraException as e:
+            self._finished(started, method, endpoint, data, status, e)
+            raise
+        self._finished(started, method, endpoint, data, status)
+        self.cache.update(method, endpoint, data, output)
+        return output
+
+    def __get_session(self):
+        # The session has to be created from inside the running event loop
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.__client_timeout())
+        return self.session
+
+    def __client_timeout(self):
+        if self.timeout is None:
+            return aiohttp.ClientTimeout(total=None)
+        if isinstance(self.timeout, tuple):
+            connect, read = self.timeout
+            return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        return aiohttp.ClientTimeout(total=self.timeout)
@@ -0,0 +1,332 @@
+import asyncio
+import json
+import os
+import select
+import socket
+import time
+from pathlib import Path
+
+from app.nanoleaf.utils.requester import Requester
+
+# SSDP discovery of Auroras on the local network, and a registry that remembers them between runs.
+# For instructions or bug reports, please visit
+# https://github.com/software-2/nanoleaf
+
+SSDP_IP = "239.255.255.250"
+SSDP_PORT = 1900
+SSDP_MX = 3
+SSDP_ST = "nanoleaf_aurora:light"
+
+# Largest possible UDP payload, SSDP responses can exceed the old 1024 byte reads
+_MAX_DATAGRAM = 65507
+
+DEFAULT_REGISTRY_PATH = Path.home() / ".nanoleaf" / "devices.json"
+
+
+class DiscoveredDevice:
+
+    def __init__(self, device_id: str, ip_address: str):
+        self.device_id = device_id
+        self.ip_address = ip_address
+
+    def __repr__(self):
+        return f"<DiscoveredDevice({self.device_id}, {self.ip_address})>"
+
+    def __eq__(self, other):
+        return isinstance(other, DiscoveredDevice) and \
+            (self.device_id, self.ip_address) == (other.device_id, other.ip_address)
+
+    def __hash__(self):
+        return hash((self.device_id, self.ip_address))
+
+
+def search_request(search_target: str = SSDP_ST) -> bytes:
+    """Returns an SSDP M-SEARCH request for the given search target"""
+    req = ['M-SEARCH * HTTP/1.1',
+           'HOST: ' + SSDP_IP + ':' + str(SSDP_PORT),
+           'MAN: "ssdp:discover"',
+           'ST: ' + search_target,
+           'MX: ' + str(SSDP_MX),
+           '', '']
+    return '\r\n'.join(req).encode('utf-8')
+
+
+def parse_response(response: str, search_target: str = SSDP_ST):
+    """Returns the DiscoveredDevice described by an SSDP response, or None if it isn't an Aurora.
+
+    As of firmware 2.1.0, the Location may not include an IP address, in which case ip_address is None."""
+    if search_target not in response:
+        return None
+    headers = {}
+    for line in response.split("\n"):
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    location = headers.get("location")
+    if location is None:
+        return None
+    ip_address = location.replace("http://", "").split("/")[0].split(":")[0] or None
+    return DiscoveredDevice(headers.get("nl-deviceid"), ip_address)
+
+
+def local_addresses() -> list:
+    """Returns the IPv4 addresses of the local network interfaces, leaving out loopback addresses"""
+    addresses = set()
+    # Connecting a UDP socket sends nothing, but picks the interface multicast to SSDP would leave through
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.connect((SSDP_IP, SSDP_PORT))
+        addresses.add(sock.getsockname()[0])
+    except OSError:
+        pass
+    finally:
+        sock.close()
+    # Catches further interfaces, on hosts whose name resolves to them
+    try:
+        for info in socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET):
+            addresses.add(info[4][0])
+    except socket.gaierror:
+        pass
+    # Debian style hosts resolve their own name to 127.0.1.1
+    return sorted(address for address in addresses if not address.startswith("127.") and address != "0.0.0.0")
+
+
+class _Search:
+    """State shared by the blocking and asyncio discovery loops"""
+
+    def __init__(self, expected, timeout, interfaces, search_target, initial_interval, max_interval):
+        self.search_target = search_target
+        self.request = search_request(search_target)
+        self.deadline = time.monotonic() + timeout
+        self.next_send = time.monotonic()
+        self.interval = initial_interval
+        self.max_interval = max_interval
+        self.seen = set()
+        self.expected = expected
+        self.sockets = self.__open_sockets(interfaces)
+
+    def close(self):
+        for sock in self.sockets:
+            sock.close()
+
+    def send_due(self):
+        """Sends the M-SEARCH on every interface if it's time to, backing off after each round"""
+        now = time.monotonic()
+        if now < self.next_send:
+            return
+        for sock in self.sockets:
+            try:
+                sock.sendto(self.request, (SSDP_IP, SSDP_PORT))
+            except OSError:
+                pass
+        self.next_send = now + self.interval
+        self.interval = min(self.interval * 2, self.max_interval)
+
+    def wait_time(self) -> float:
+        now = time.monotonic()
+        return max(0.0, min(self.next_send, self.deadline) - now)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    @property
+    def done(self) -> bool:
+        if self.expired:
+            return True
+        if self.expected is None:
+            return False
+        if isinstance(self.expected, int):
+            return len([device for device in self.seen if device.ip_address]) >= self.expected
+        found = {device.device_id for device in self.seen} | {device.ip_address for device in self.seen}
+        return set(self.expected) <= found
+
+    def receive(self, data: bytes):
+        """Returns the device in a response if it wasn't seen before"""
+        device = parse_response(data.decode("utf-8", errors="replace"), self.search_target)
+        if device is None or device in self.seen:
+            return None
+        self.seen.add(device)
+        return device
+
+    @staticmethod
+    def __open_sockets(interfaces):
+        if interfaces is None:
+            interfaces = local_addresses() or [""]
+        sockets = []
+        for address in interfaces:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, SSDP_MX)
+            if address:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(address))
+            try:
+                sock.bind((address, 0))
+            except OSError:
+                sock.close()
+                continue
+            sock.setblocking(False)
+            sockets.append(sock)
+        if not sockets:
+            raise OSError("Could not open a discovery socket on any interface")
+        return sockets
+
+
+def discover(expected=None, timeout: float = 30, interfaces: list = None, search_target: str = SSDP_ST,
+             initial_interval: float = 0.5, max_interval: float = 8):
+    """Yields every Aurora found on the network as a DiscoveredDevice, as soon as it responds.
+
+    expected - A number of devices, or device IDs / IP addresses, to stop early once found
+    timeout - Maximum number of seconds to search for
+    interfaces - IP addresses of the interfaces to search on (defaults to all of them)
+    initial_interval, max_interval - The M-SEARCH is resent with exponential backoff between these intervals
+    """
+    search = _Search(expected, timeout, interfaces, search_target, initial_interval, max_interval)
+    try:
+        while not search.done:
+            search.send_due()
+            ready, _, _ = select.select(search.sockets, [], [], search.wait_time())
+            for sock in ready:
+                try:
+                    data = sock.recv(_MAX_DATAGRAM)
+                except OSError:
+                    continue
+                device = search.receive(data)
+                if device is not None:
+                    yield device
+    finally:
+        search.close()
+
+
+class _DiscoveryProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def datagram_received(self, data, addr):
+        self.queue.put_nowait(data)
+
+
+async def discover_async(expected=None, timeout: float = 30, interfaces: list = None,
+                         search_target: str = SSDP_ST, initial_interval: float = 0.5, max_interval: float = 8):
+    """Asynchronously yields every Aurora found on the network. Takes the same arguments as discover()."""
+    loop = asyncio.get_running_loop()
+    search = _Search(expected, timeout, interfaces, search_target, initial_interval, max_interval)
+    queue = asyncio.Queue()
+    transports = []
+    try:
+        for sock in search.sockets:
+            transport, _ = await loop.create_datagram_endpoint(lambda: _DiscoveryProtocol(queue), sock=sock)
+            transports.append(transport)
+        while not search.done:
+            search.send_due()
+            try:
+                data = await asyncio.wait_for(queue.get(), search.wait_time())
+            except asyncio.TimeoutError:
+                continue
+            device = search.receive(data)
+            if device is not None:
+                yield device
+    finally:
+        for transport in transports:
+            transport.close()
+        search.close()
+
+
+class DeviceRegistry:
+
+    def __init__(self, path=DEFAULT_REGISTRY_PATH):
+        """Remembers discovered Auroras on disk: device ID -> IP address, auth token, firmware and when last seen.
+
+        path - JSON file the registry is stored in, or None to keep it in memory only
+        """
+        self.path = None if path is None else Path(path)
+        self.devices = {}
+        self.load()
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    def __contains__(self, device_id):
+        return device_id in self.devices
+
+    def __getitem__(self, device_id) -> dict:
+        return self.devices[device_id]
+
+    def load(self):
+        """Reads the registry from disk"""
+        if self.path is None or not self.path.exists():
+            return
+        with open(self.path, "r") as f:
+            self.devices = json.load(f)
+
+    def save(self):
+        """Writes the registry to disk. The file holds auth tokens, so it's only readable by the current user."""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.devices, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def update(self, device_id: str, **fields):
+        """Updates the stored fields of a device and marks it as seen now"""
+        entry = self.devices.setdefault(device_id, {})
+        entry.update(fields)
+        entry["last_seen"] = time.time()
+        return entry
+
+    def stale(self, max_age: float) -> list:
+        """Returns the IDs of devices not seen in the last max_age seconds"""
+        now = time.time()
+        return [device_id for device_id, entry in self.devices.items()
+                if now - entry.get("last_seen", 0) > max_age]
+
+    def aurora(self, device_id: str, **options):
+        """Returns an Aurora for a registered device"""
+        from app.nanoleaf.aurora import Aurora
+        entry = self.devices[device_id]
+        return Aurora(entry["ip_address"], entry.get("auth_token"), **options)
+
+    def add_discovered(self, devices):
+        """Records discovered devices, keeping their stored auth tokens"""
+        for device in devices:
+            if device.device_id is not None and device.ip_address is not None:
+                self.update(device.device_id, ip_address=device.ip_address)
+
+    def refresh(self, max_age: float = 24 * 60 * 60, timeout: float = 10, probe_timeout: float = 2) -> list:
+        """Re-probes devices not seen within max_age and saves the registry.
+
+        Devices are first asked for their info at their last known IP address. Devices that don't answer
+        are searched for on the network. Returns the IDs of the devices that could not be found."""
+        missing = []
+        for device_id in self.stale(max_age):
+            if not self.__probe(device_id, probe_timeout):
+                missing.append(device_id)
+        if missing:
+            found = list(discover(expected=missing, timeout=timeout))
+            self.add_discovered(found)
+            found_ids = {device.device_id for device in found if device.ip_address}
+            for device_id in missing:
+                if device_id in found_ids:
+                    self.__probe(device_id, probe_timeout)
+            missing = [device_id for device_id in missing if device_id not in found_ids]
+        self.save()
+        return missing
+
+    def __probe(self, device_id, probe_timeout):
+        entry = self.devices[device_id]
+        if not entry.get("ip_address") or not entry.get("auth_token"):
+            return False
+        with Requester(entry["ip_address"], entry["auth_token"], timeout=probe_timeout) as requester:
+            try:
+                info = requester.snapshot()
+            except Exception:
+                return False
+        if not isinstance(info, dict):
+            return False
+        self.update(device_id, firmware=info.get("firmwareVersion"))
+        return True
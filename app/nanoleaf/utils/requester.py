@@ -1,22 +1,48 @@
+import json
 import os
+import time
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
 
-from app.nanoleaf import exceptions
+from app.nanoleaf import endpoints, exceptions
+from app.nanoleaf.cache import MISSING, StateCache
+from app.nanoleaf.utils.resilience import DEFAULT_TIMEOUT, CircuitBreaker, RetryPolicy
 
+DEFAULT_PORT = 16021
 
-class Requester:
+# Failures that count against a device's circuit breaker and may be retried.
+# Other error statuses show the device is up, so they're raised right away.
+_RETRYABLE_EXCEPTIONS = (exceptions.ConnectionFailedException, exceptions.InternalServerError)
 
-    def __init__(self, ip_address: str = None, auth_token: str = None):
+
+def _was_sent(error: requests.exceptions.RequestException) -> bool:
+    """Returns False if a request failed before any of it reached the device"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return False
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        return not isinstance(getattr(error.args[0], "reason", None), NewConnectionError)
+    return True
+
+
+class BaseRequester:
+
+    def __init__(self, ip_address: str = None, auth_token: str = None, cache_ttl: float = 0, metrics=None,
+                 retry_policy: RetryPolicy = None, circuit_breaker: CircuitBreaker = None):
         if ip_address is None:
             ip_address = os.getenv("NANOLEAF_IP")
 
         if auth_token is None:
             auth_token = os.getenv("NANOLEAF_AUTH_TOKEN")
 
-        self.base_url = f"http://{ip_address}:16021/api/v1/{auth_token}/"
+        self.base_url = f"http://{ip_address}:{DEFAULT_PORT}/api/v1/{auth_token}/"
         self.__ip_address = ip_address
         self.auth_token = auth_token
+        self.cache = StateCache(cache_ttl)
+        self.metrics = metrics
+        self.retry_policy = RetryPolicy() if retry_policy is None else retry_policy
+        self.circuit_breaker = CircuitBreaker() if circuit_breaker is None else circuit_breaker
 
     @property
     def ip_address(self):
@@ -26,32 +52,150 @@ class Requester:
     def ip_address(self, value):
         self.__ip_address = value
 
+    def _admit(self):
+        """Raises CircuitOpenException if the circuit breaker doesn't let a call through to the device"""
+        if not self.circuit_breaker.allow():
+            raise exceptions.CircuitOpenException(self.ip_address, self.circuit_breaker.retry_after)
+
+    def _retry_delay(self, method, attempt, error):
+        """Records a failed attempt. Returns the seconds to wait before retrying, or None to give up."""
+        self.circuit_breaker.record_failure()
+        if not self.retry_policy.should_retry(method, attempt, getattr(error, "sent", True)):
+            return None
+        return self.retry_policy.delay(attempt)
+
+    def _started(self, method, endpoint, data):
+        """Runs the metrics hooks before a request. Returns the start time, or None without metrics."""
+        if self.metrics is None:
+            return None
+        self.metrics.before_request(self.ip_address, method, endpoint, data)
+        return time.perf_counter()
+
+    def _finished(self, started, method, endpoint, data, status, error=None):
+        """Records a completed or failed request in the metrics"""
+        if started is None:
+            return
+        sent = 0 if data is None else len(json.dumps(data))
+        self.metrics.after_request(self.ip_address, method, endpoint, status, time.perf_counter() - started,
+                                   sent, error)
+
+    @staticmethod
+    def _check(status, output):
+        if status >= 400:
+            raise exceptions.exception_for_status(status, output)
+        return output
+
+
+class Requester(BaseRequester):
+
+    def __init__(self, ip_address: str = None, auth_token: str = None, pool_size: int = 10,
+                 timeout=DEFAULT_TIMEOUT, retries: int = 0, backoff_factor: float = 0, cache_ttl: float = 0,
+                 metrics=None, retry_policy: RetryPolicy = None, circuit_breaker: CircuitBreaker = None):
+        """Sends requests to a single Aurora over a pooled keep-alive session.
+
+        pool_size - Number of sockets kept open to the device
+        timeout - Seconds to wait for the device, either a float or a (connect, read) tuple. None waits forever.
+        retries - Number of times a failed read, or a request that never reached the device, is retried
+        backoff_factor - Jittered exponential backoff between retries, in seconds
+        cache_ttl - Seconds GET requests are served from a cached info document. 0 disables the cache.
+        metrics - Metrics that record the latency and outcome of every request
+        retry_policy - Overrides retries and backoff_factor
+        circuit_breaker - Fails calls fast after consecutive failures (defaults to CircuitBreaker())
+
+        Raises ConnectionFailedException if the device can't be reached, or CircuitOpenException while the
+        circuit breaker is open.
+        """
+        if retry_policy is None:
+            retry_policy = RetryPolicy(retries, backoff_factor)
+        super().__init__(ip_address, auth_token, cache_ttl, metrics, retry_policy, circuit_breaker)
+        self.timeout = timeout
+        self.session = self.__create_session(pool_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Closes every pooled connection to the device"""
+        self.session.close()
+
     def request(self, method: str, endpoint: str = "", data: dict = None):
+        if method == "GET" and self.cache.covers(endpoint):
+            output = self.cache.lookup(endpoint)
+            if output is MISSING:
+                self.__send(method="GET", endpoint=endpoints.INFO)
+                output = self.cache.lookup(endpoint)
+            if output is not MISSING:
+                return output
+        return self.__send(method=method, endpoint=endpoint, data=data)
+
+    def snapshot(self, max_age: float = None) -> dict:
+        """Returns the full info document in a single round trip.
+
+        The cached document is reused if it is younger than max_age (defaults to the cache TTL)."""
+        document = self.cache.lookup(endpoints.INFO, max_age)
+        if document is MISSING:
+            document = self.__send(method="GET", endpoint=endpoints.INFO)
+        return document
+
+    def stream(self, endpoint: str):
+        """Opens a long-lived GET request and returns the streaming response. Close it when done.
+
+        Only the connect timeout applies, since the device may stay quiet for any amount of time."""
+        connect_timeout = self.timeout[0] if isinstance(self.timeout, tuple) else self.timeout
+        r = self.session.request(method="GET", url=self.base_url + endpoint, stream=True,
+                                 timeout=(connect_timeout, None))
+        if r.status_code >= 400:
+            r.close()
+            self._check(status=r.status_code, output=None)
+        return r
+
+    def __send(self, method: str, endpoint: str = "", data: dict = None):
+        attempt = 0
+        while True:
+            self._admit()
+            try:
+                output = self.__attempt(method, endpoint, data)
+            except _RETRYABLE_EXCEPTIONS as e:
+                delay = self._retry_delay(method, attempt, e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except exceptions.AuroraException:
+                self.circuit_breaker.record_success()
+                raise
+            except BaseException:
+                self.circuit_breaker.release()
+                raise
+            self.circuit_breaker.record_success()
+            return output
+
+    def __attempt(self, method, endpoint, data):
         url = self.base_url + endpoint
+        started = self._started(method, endpoint, data)
         try:
-            r = requests.request(method=method, url=url, json=data)
+            r = self.session.request(method=method, url=url, json=data, timeout=self.timeout)
         except requests.exceptions.RequestException as e:
-            print(e)
-            return
+            self._finished(started, method, endpoint, data, None, e)
+            raise exceptions.ConnectionFailedException(e, sent=_was_sent(e)) from e
         output = None if r.text == "" else r.json()
-        self.__check(status=r.status_code, output=output)
-        return output
-
-    def __check(self, status, output):
-        if status >= 400:
-            raise self.__create_exception(status, output)
+        try:
+            self._check(status=r.status_code, output=output)
+        except exceptions.AuroraException as e:
+            self._finished(started, method, endpoint, data, r.status_code, e)
+            raise
+        self._finished(started, method, endpoint, data, r.status_code)
+        self.cache.update(method, endpoint, data, output)
         return output
 
-    def __create_exception(self, status, output):
-        if status == 403:
-            cls = exceptions.BadRequestException
-        elif status == 401:
-            cls = exceptions.InvalidCredentialsException
-        elif status == 404:
-            cls = exceptions.ResourceNotFoundException
-        elif status == 422:
-            cls = exceptions.UnprocessableEntityException
-        elif status == 500:
-            cls = exceptions.InternalServerError
-
-        return cls(status, output)
+    @staticmethod
+    def __create_session(pool_size):
+        # Retries are handled by the retry policy, so they share the circuit breaker and metrics
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        return session
@@ -0,0 +1,121 @@
+import random
+import threading
+import time
+
+# Per-device resilience policies shared by the sync and async requesters.
+# Reads are retried with jittered exponential backoff, and a circuit breaker stops calling a device that keeps
+# failing until it has had time to recover, so one bad controller fails fast instead of stalling its callers.
+
+# Seconds to wait for a connection and for each read from the device
+DEFAULT_TIMEOUT = (3.05, 10)
+
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+
+
+class RetryPolicy:
+
+    def __init__(self, retries: int = 0, backoff_factor: float = 0.1, max_backoff: float = 5, jitter: float = 1):
+        """Decides whether and when a failed request is sent again.
+
+        retries - Number of times a request is retried
+        backoff_factor - Delay before the first retry, doubled for every further retry
+        max_backoff - Longest delay between two attempts
+        jitter - Share of each delay that is randomized, so clients that failed together don't retry together
+
+        Reads are retried after any connection failure. Other methods are only retried if the request never
+        reached the device."""
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+    def __repr__(self):
+        return f"<RetryPolicy(retries={self.retries}, backoff_factor={self.backoff_factor})>"
+
+    def should_retry(self, method: str, attempt: int, sent: bool = True) -> bool:
+        """Returns True if a request that failed on its attempt-th try (counting from 0) should be retried"""
+        return attempt < self.retries and (method in IDEMPOTENT_METHODS or not sent)
+
+    def delay(self, attempt: int) -> float:
+        """Returns the seconds to wait before retrying after the attempt-th try"""
+        backoff = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        return backoff * (1 - self.jitter * random.random())
+
+
+class CircuitBreaker:
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30):
+        """Fails calls to a device fast after consecutive failures.
+
+        failure_threshold - Number of consecutive failures that open the circuit
+        recovery_timeout - Seconds the circuit stays open before a single probe request is let through.
+                           The circuit closes again if the probe succeeds, and re-opens if it fails.
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<CircuitBreaker({self.state}, failures={self.failures})>"
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    @property
+    def retry_after(self) -> float:
+        """Returns the seconds until the next probe is let through, 0 if calls are allowed"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        """Returns True if a call may be sent to the device now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probing = False
+            # Half open: let a single probe through at a time
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._state = self.CLOSED
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release(self):
+        """Lets another probe through after one ended without a verdict, for instance when it was cancelled"""
+        with self._lock:
+            self._probing = False
+
+    def reset(self):
+        """Closes the circuit"""
+        self.record_success()
@@ -1,83 +1,40 @@
 import requests
 import socket
-import select
-import time
+
+from app.nanoleaf.utils.discovery import discover
 
 # Setup functions for discovering and authenticating your Auroras
 # For instructions or bug reports, please visit
 # https://github.com/software-2/nanoleaf
 
 
-def find_auroras(seek_time: float = 30):
+def find_auroras(seek_time: float = 30, expected: int = None):
     """
     Returns a list of the IP addresses of all Auroras found on the network
     
-    Discovery will take about 30 seconds by default.
+    Discovery will take about 30 seconds by default, or stops as soon as the expected number of Auroras is found.
     If your Auroras are not found, try increasing the seek time to 90 seconds.
     """
-    SSDP_IP = "239.255.255.250"
-    SSDP_PORT = 1900
-    SSDP_MX = 3
-    SSDP_ST = "nanoleaf_aurora:light"
-
-    req = ['M-SEARCH * HTTP/1.1',
-           'HOST: ' + SSDP_IP + ':' + str(SSDP_PORT),
-           'MAN: "ssdp:discover"',
-           'ST: ' + SSDP_ST,
-           'MX: ' + str(SSDP_MX)]
-    req = '\r\n'.join(req).encode('utf-8')
-
     aurora_locations = []
-    broken_auroras = []
-
-    def get_deviceid(r):
-        for line in r.split("\n"):
-            if "deviceid:" in line:
-                return line.replace("nl-deviceid:", "").strip()
-    
-    def check_if_new_aurora(r):
-        if SSDP_ST not in r:
-            return
-        for line in r.split("\n"):
-            if "Location:" in line:
-                new_location = line.replace("Location:", "").strip() \
-                                  .replace("http://", "") \
-                                  .replace(":16021", "")
-                if new_location not in aurora_locations:
-                    # BUG: As of firmware 2.1.0, the Aurora's Location may not include an IP address.
-                    if new_location == "":
-                        broken = get_deviceid(r)
-                        if broken not in broken_auroras:
-                            broken_auroras.append(broken)
-                            print("New Aurora found (deviceid: " + broken + "). But the device does not have an IP address.")
-                        return
-                    aurora_locations.append(new_location)
-                    print("New Aurora found at " + new_location + " - deviceid:" + get_deviceid(r))
-                return
-
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, SSDP_MX)
-    sock.bind((socket.gethostname(), 9090))
-    sock.sendto(req, (SSDP_IP, SSDP_PORT))
-    sock.setblocking(False)
 
-    timeout = time.time() + seek_time
-    print("Starting discovery. This will continue for " + str(seek_time) + " seconds.")
-    while time.time() < timeout:
-        try:
-            ready = select.select([sock], [], [], 5)
-            if ready[0]:
-                response = sock.recv(1024).decode("utf-8")
-                check_if_new_aurora(response)
-        except socket.error as err:
-            print("Socket error while discovering SSDP devices!")
-            print(err)
-            print("If you are sure your network connection is working, "
-                  "please post an issue on the GitHub page: https://github.com/software-2/nanoleaf/issues")
-            print("Please include as much information as possible, including your OS, "
-                  "how your computer is connected to your network, etc.")
-            sock.close()
-            break
+    print("Starting discovery. This will continue for up to " + str(seek_time) + " seconds.")
+    try:
+        for device in discover(expected=expected, timeout=seek_time):
+            # BUG: As of firmware 2.1.0, the Aurora's Location may not include an IP address.
+            if device.ip_address is None:
+                print("New Aurora found (deviceid: " + str(device.device_id) + "). "
+                      "But the device does not have an IP address.")
+                continue
+            if device.ip_address not in aurora_locations:
+                aurora_locations.append(device.ip_address)
+                print("New Aurora found at " + device.ip_address + " - deviceid:" + str(device.device_id))
+    except socket.error as err:
+        print("Socket error while discovering SSDP devices!")
+        print(err)
+        print("If you are sure your network connection is working, "
+              "please post an issue on the GitHub page: https://github.com/software-2/nanoleaf/issues")
+        print("Please include as much information as possible, including your OS, "
+              "how your computer is connected to your network, etc.")
 
     if len(aurora_locations) == 0:
         print("Discovery complete, but no Auroras found!")
@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+from app.nanoleaf import Aurora
+from app.tests.mock_aurora import MockAurora
+
+
+INFO = {
+    "firmwareVersion": "1.5.0",
+    "model": "NL22",
+    "serialNo": "S123",
+    "state": {
+        "on": {"value": True},
+        "brightness": {"value": 100, "min": 0, "max": 100},
+        "hue": {"value": 120, "min": 0, "max": 360},
+        "sat": {"value": 100, "min": 0, "max": 100},
+        "ct": {"value": 4000, "min": 1200, "max": 6500},
+        "colorMode": "hs",
+    },
+    "effects": {"select": "Flames", "effectsList": ["Flames", "Forest"]},
+    "panelLayout": {"layout": {"numPanels": 10, "sideLength": 150, "positionData": []},
+                    "globalOrientation": {"value": 0, "min": 0, "max": 360}},
+    "rhythm": {"rhythmConnected": True, "rhythmMode": 0},
+}
+
+EFFECT_DETAILS = {name: {"animName": name, "animType": "plugin", "loop": True, "palette": []}
+                  for name in INFO["effects"]["effectsList"]}
+
+
+class _Response:
+
+    def __init__(self, status_code, output):
+        self.status_code = status_code
+        self.text = "" if output is None else json.dumps(output)
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class _Session:
+
+    def __init__(self):
+        self.calls = []
+        self.bodies = []
+
+    def request(self, method, url, json=None, timeout=None):
+        endpoint = url.split("/api/v1/token/")[1]
+        self.calls.append((method, endpoint))
+        self.bodies.append(json)
+        if method == "GET":
+            value = INFO
+            for key in filter(None, endpoint.split("/")):
+                value = value[key]
+            return _Response(200, value)
+        command = (json or {}).get("write", {}).get("command")
+        if command == "request":
+            return _Response(200, EFFECT_DETAILS[json["write"]["animName"]])
+        if command == "requestAll":
+            return _Response(200, {"animations": list(EFFECT_DETAILS.values())})
+        return _Response(204, None)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_aurora():
+    """Returns a factory of Auroras whose requests are answered from INFO without a network.
+
+    Each call returns the Aurora and the list of (method, endpoint) requests it makes."""
+    def factory(**options):
+        aurora = Aurora("127.0.0.1", "token", **options)
+        aurora._requester.session = _Session()
+        return aurora, aurora._requester.session.calls
+    return factory
+
+
+@pytest.fixture(scope="module")
+def device_aurora():
+    """Returns an Aurora for the device named by NANOLEAF_IP, or one talking to a MockAurora if it isn't set"""
+    if os.getenv("NANOLEAF_IP"):
+        with Aurora() as aurora:
+            yield aurora
+        return
+    with MockAurora() as mock, mock.aurora() as aurora:
+        yield aurora
+
+
+@pytest.fixture
+def mock_aurora():
+    """Returns a fresh MockAurora for a single test"""
+    with MockAurora() as mock:
+        yield mock
@@ -0,0 +1,274 @@
+import copy
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A local stand-in for an Aurora: the REST API used by the library plus the UDP external control receiver.
+# Latency and packet loss can be injected to measure how the client behaves on a bad network.
+
+TOKEN = "mocktoken"
+
+
+def default_document(panel_count: int = 9) -> dict:
+    """Returns the info document of a strip of panel_count triangles"""
+    positions = [{"panelId": 100 + i, "x": 75 * i, "y": 0 if i % 2 == 0 else 43, "o": 0 if i % 2 == 0 else 60,
+                  "shapeType": 0} for i in range(panel_count)]
+    return {
+        "name": "Mock Aurora",
+        "serialNo": "MOCK0001",
+        "manufacturer": "Nanoleaf",
+        "firmwareVersion": "3.0.6",
+        "model": "NL22",
+        "state": {
+            "on": {"value": True},
+            "brightness": {"value": 100, "max": 100, "min": 0},
+            "hue": {"value": 0, "max": 360, "min": 0},
+            "sat": {"value": 0, "max": 100, "min": 0},
+            "ct": {"value": 4000, "max": 6500, "min": 1200},
+            "colorMode": "effect",
+        },
+        "effects": {"select": "Flames", "effectsList": ["Flames", "Forest", "Nemo"]},
+        "panelLayout": {
+            "layout": {"numPanels": panel_count, "sideLength": 150, "positionData": positions},
+            "globalOrientation": {"value": 0, "max": 360, "min": 0},
+        },
+        "rhythm": {"rhythmConnected": False, "rhythmActive": False, "rhythmId": 0, "hardwareVersion": "",
+                   "firmwareVersion": "", "auxAvailable": False, "rhythmMode": 0,
+                   "rhythmPos": {"x": 0, "y": 0, "o": 0}},
+    }
+
+
+class MockAurora:
+
+    def __init__(self, port: int = 0, latency: float = 0, loss: float = 0, stream_loss: float = 0,
+                 document: dict = None, seed: int = None):
+        """An Aurora served from 127.0.0.1.
+
+        port - HTTP port to listen on (0 picks a free one)
+        latency - Seconds every HTTP response is delayed by
+        loss - Share of HTTP requests whose connection is dropped without a response
+        stream_loss - Share of external control packets that are dropped
+        document - Info document to start from (defaults to default_document())
+        """
+        self.latency = latency
+        self.loss = loss
+        self.stream_loss = stream_loss
+        self.document = document if document is not None else default_document()
+        self.effects = {name: {"animName": name, "animType": "plugin", "loop": True, "palette": []}
+                        for name in self.document["effects"]["effectsList"]}
+        self.requests = []
+        self.packets = []
+        self.dropped_packets = 0
+        self.panels = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self.__handler())
+        self._httpd.daemon_threads = True
+        self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._udp.bind(("127.0.0.1", 0))
+        self._udp.settimeout(0.1)
+        self._running = False
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_port
+
+    @property
+    def stream_port(self) -> int:
+        return self._udp.getsockname()[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/api/v1/{TOKEN}/"
+
+    def start(self):
+        self._running = True
+        self._threads = [threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True),
+                         threading.Thread(target=self.__receive, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._udp.close()
+
+    def aurora(self, **options):
+        """Returns an Aurora that talks to this mock"""
+        from app.nanoleaf import Aurora
+        aurora = Aurora("127.0.0.1", TOKEN, **options)
+        aurora._requester.base_url = self.base_url
+        return aurora
+
+    def wait_for_packets(self, count: int, timeout: float = 2) -> bool:
+        """Waits until count stream packets were received (or dropped)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if len(self.packets) + self.dropped_packets >= count:
+                return True
+            time.sleep(0.001)
+        return False
+
+    def handle(self, method: str, path: str, body):
+        """Returns the (status, output) of a request to an endpoint path below the auth token"""
+        with self._lock:
+            self.requests.append((method, path))
+            if method == "GET":
+                return self.__get(path)
+            if method == "PUT":
+                return self.__put(path, body or {})
+            if method == "DELETE" and path == "":
+                return 204, None
+            return 404, None
+
+    def __get(self, path):
+        value = self.document
+        for key in filter(None, path.split("/")):
+            if not isinstance(value, dict) or key not in value:
+                return 404, None
+            value = value[key]
+        return 200, copy.deepcopy(value)
+
+    def __put(self, path, body):
+        if path == "state":
+            return self.__put_state(body)
+        if path == "effects":
+            return self.__put_effects(body)
+        if path == "rhythm":
+            self.document["rhythm"].update(body)
+            return 204, None
+        if path == "identify":
+            return 204, None
+        return 404, None
+
+    def __put_state(self, body):
+        state = self.document["state"]
+        for key, change in body.items():
+            if key == "on" and not isinstance(change, dict):
+                state["on"]["value"] = bool(change)
+                continue
+            if key not in state or not isinstance(change, dict):
+                return 400, None
+            field = state[key]
+            if "value" in change:
+                value = change["value"]
+            elif "increment" in change:
+                value = field["value"] + change["increment"]
+            else:
+                return 400, None
+            if isinstance(field["value"], bool):
+                field["value"] = bool(value)
+            else:
+                field["value"] = max(field["min"], min(field["max"], value))
+            if key in ("hue", "sat"):
+                state["colorMode"] = "hs"
+            elif key == "ct":
+                state["colorMode"] = "ct"
+        return 204, None
+
+    def __put_effects(self, body):
+        effects = self.document["effects"]
+        if "select" in body:
+            if body["select"] not in self.effects:
+                return 404, None
+            effects["select"] = body["select"]
+            self.document["state"]["colorMode"] = "effect"
+            return 204, None
+        write = body.get("write", {})
+        command = write.get("command")
+        name = write.get("animName")
+        if command == "request":
+            if name not in self.effects:
+                return 404, None
+            return 200, copy.deepcopy(self.effects[name])
+        if command == "requestAll":
+            return 200, {"animations": copy.deepcopy(list(self.effects.values()))}
+        if command == "add":
+            self.effects[name] = {key: value for key, value in write.items() if key != "command"}
+        elif command == "delete":
+            self.effects.pop(name, None)
+        elif command == "rename":
+            self.effects[write["newName"]] = self.effects.pop(name)
+            self.effects[write["newName"]]["animName"] = write["newName"]
+        elif command == "display" and write.get("animType") == "extControl":
+            effects["select"] = "*ExtControl*"
+            return 200, {"streamControlIpAddr": "127.0.0.1", "streamControlPort": self.stream_port,
+                         "streamControlProtocol": "udp"}
+        else:
+            return 400, None
+        effects["effectsList"] = list(self.effects)
+        return 204, None
+
+    def __receive(self):
+        while self._running:
+            try:
+                packet = self._udp.recv(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            if self.stream_loss and self._random.random() < self.stream_loss:
+                self.dropped_packets += 1
+                continue
+            self.packets.append((time.perf_counter(), packet))
+            count = packet[0]
+            for i in range(count):
+                record = packet[1 + 7 * i:8 + 7 * i]
+                self.panels[record[0]] = tuple(record[2:5])
+
+    def __handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, which stalls on delayed ACKs with Nagle enabled
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.__respond("GET")
+
+            def do_PUT(self):
+                self.__respond("PUT")
+
+            def do_DELETE(self):
+                self.__respond("DELETE")
+
+            def __respond(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                if mock.loss and mock._random.random() < mock.loss:
+                    self.close_connection = True
+                    return
+                prefix = f"/api/v1/{TOKEN}/"
+                if not self.path.startswith(prefix) and self.path != prefix.rstrip("/"):
+                    status, output = 401, None
+                else:
+                    body = json.loads(raw) if raw else None
+                    status, output = mock.handle(method, self.path[len(prefix):], body)
+                if mock.latency:
+                    time.sleep(mock.latency)
+                payload = b"" if output is None else json.dumps(output).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
@@ -0,0 +1,71 @@
+import pytest
+
+from app.nanoleaf.animation import CustomEffect, effect_hash
+from app.nanoleaf.exceptions import ResourceNotFoundException
+
+
+class TestCustomEffect:
+
+    def test_anim_data(self):
+        effect = CustomEffect("Blink", [7, 3])
+        effect.add_keyframe(7, 255, 0, 0, transition_time=5)
+        effect.add_keyframe(7, 0, 0, 0, transition_time=5)
+        effect.set_keyframes(3, [(0, 0, 255, 10)])
+        assert effect.anim_data == "2 7 2 255 0 0 0 5 0 0 0 0 5 3 1 0 0 255 0 10"
+        effect.set_keyframes(3, [(0, 255, 0, 0, 2)])
+        assert effect.anim_data.endswith("3 1 0 255 0 0 2")
+
+    def test_set_frames_matches_keyframes(self):
+        np = pytest.importorskip("numpy")
+        colors = np.arange(2 * 3 * 3).reshape(2, 3, 3)
+        vectorized = CustomEffect("Ramp", [1, 2, 3])
+        vectorized.set_frames(colors, transition_times=[4, 6])
+        manual = CustomEffect("Ramp", [1, 2, 3])
+        for panel_slot, panel_id in enumerate([1, 2, 3]):
+            for frame, transition_time in zip(colors, [4, 6]):
+                manual.add_keyframe(panel_id, *frame[panel_slot], transition_time=transition_time)
+        assert vectorized.anim_data == manual.anim_data
+        assert vectorized.content_hash == manual.content_hash
+
+    def test_hash_ignores_device_fields_and_spacing(self):
+        effect = CustomEffect("Blink", [7])
+        effect.add_keyframe(7, 1, 2, 3)
+        details = {"animName": "Blink", "animType": "custom", "loop": True, "palette": [], "version": "1.0",
+                   "animData": "1  7 1 1 2 3 0 1 "}
+        assert effect_hash(details) == effect.content_hash
+        effect.loop = False
+        assert effect_hash(details) != effect.content_hash
+
+
+class TestEffectInstall:
+
+    def test_skips_identical_effect(self, fake_aurora):
+        aurora, calls = fake_aurora()
+        effect = CustomEffect("Blink", [7])
+        effect.add_keyframe(7, 1, 2, 3)
+        aurora.effect.effect_details = lambda name, refresh=False: dict(effect.compile(), animName=name)
+        assert aurora.effect.effect_install(effect) is False
+        assert calls == []
+
+    def test_uploads_missing_effect(self, fake_aurora):
+        aurora, calls = fake_aurora()
+        effect = CustomEffect("Blink", [7])
+        effect.add_keyframe(7, 1, 2, 3)
+
+        def missing(name, refresh=False):
+            raise ResourceNotFoundException(404, None)
+        aurora.effect.effect_details = missing
+        assert aurora.effect.effect_install(effect, activate=True) is True
+        bodies = aurora._requester.session.bodies
+        assert bodies[0] == {"write": effect.compile()}
+        assert bodies[1] == {"select": "Blink"}
+
+    def test_compares_with_device_not_catalog(self, fake_aurora):
+        aurora, calls = fake_aurora()
+        effect = CustomEffect("Flames", [7])
+        effect.add_keyframe(7, 1, 2, 3)
+        # Cached before another client overwrote the effect on the device
+        aurora.effect.catalog.sync_names(["Flames", "Forest"])
+        aurora.effect.catalog.store("Flames", dict(effect.compile(), animName="Flames"))
+        assert aurora.effect.effect_install(effect) is True
+        assert [body["write"]["command"] for body in aurora._requester.session.bodies] == ["request", "add"]
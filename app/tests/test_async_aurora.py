@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+web = pytest.importorskip("aiohttp.web")
+
+from app.nanoleaf import AsyncAurora
+from app.nanoleaf.exceptions import ResourceNotFoundException
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _serve(routes):
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port
+
+
+def _aurora(port):
+    aurora = AsyncAurora("127.0.0.1", "token")
+    aurora._requester.base_url = f"http://127.0.0.1:{port}/api/v1/token/"
+    return aurora
+
+
+class TestAsyncAurora:
+
+    def test_state_round_trip(self):
+        state = {"brightness": 10}
+
+        async def get_brightness(request):
+            return web.json_response(state["brightness"])
+
+        async def put_state(request):
+            state["brightness"] = (await request.json())["brightness"]["value"]
+            return web.Response(status=204)
+
+        async def scenario():
+            runner, port = await _serve([web.get("/api/v1/token/state/brightness/value", get_brightness),
+                                         web.put("/api/v1/token/state", put_state)])
+            try:
+                async with _aurora(port) as aurora:
+                    await aurora.state.set_brightness(75)
+                    return await asyncio.gather(*[aurora.state.brightness() for _ in range(10)])
+            finally:
+                await runner.cleanup()
+
+        assert _run(scenario()) == [75] * 10
+
+    def test_shares_exception_mapping(self):
+        async def missing(request):
+            return web.Response(status=404)
+
+        async def scenario():
+            runner, port = await _serve([web.get("/api/v1/token/effects/select", missing)])
+            try:
+                async with _aurora(port) as aurora:
+                    await aurora.effect.effect()
+            finally:
+                await runner.cleanup()
+
+        with pytest.raises(ResourceNotFoundException):
+            _run(scenario())
+
+    def test_install_updates_catalog(self):
+        from app.nanoleaf.animation import CustomEffect
+        effect = CustomEffect("Blink", [7])
+        effect.add_keyframe(7, 9, 9, 9)
+        device = {"Blink": {"animName": "Blink", "animType": "custom", "animData": "1 7 1 0 0 0 0 1",
+                            "loop": True, "palette": []}}
+
+        async def effects_list(request):
+            return web.json_response(list(device))
+
+        async def write(request):
+            command = (await request.json())["write"]
+            if command["command"] == "request":
+                return web.json_response(device[command["animName"]])
+            device[command["animName"]] = {key: value for key, value in command.items() if key != "command"}
+            return web.Response(status=204)
+
+        async def scenario():
+            runner, port = await _serve([web.get("/api/v1/token/effects/effectsList", effects_list),
+                                         web.put("/api/v1/token/effects", write)])
+            try:
+                async with _aurora(port) as aurora:
+                    assert await aurora.effect.effect_install(effect)
+                    return await aurora.effect.effect_details("Blink")
+            finally:
+                await runner.cleanup()
+
+        assert _run(scenario())["animData"] == effect.compile()["animData"]
@@ -0,0 +1,159 @@
+import io
+import wave
+
+import pytest
+
+from app.nanoleaf import audio
+from app.nanoleaf.audio import AudioAnalyzer, AudioFrame, AudioReactive, BandMapper, read_pcm, read_wave
+from app.nanoleaf.geometry import LayoutGeometry
+
+np = pytest.importorskip("numpy")
+
+SAMPLE_RATE = 44100
+
+STRIP = [{"panelId": 10 + i, "x": 75 * i, "y": 0 if i % 2 == 0 else 43, "o": 0 if i % 2 == 0 else 60}
+         for i in range(8)]
+
+
+def tone(frequency, seconds, amplitude=0.3):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return amplitude * np.sin(2 * np.pi * frequency * t)
+
+
+class _Clock:
+    """Stands in for the time module, advancing only when slept"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def with_clicks(signal, times):
+    signal = signal.copy()
+    noise = np.random.default_rng(0)
+    for at in times:
+        start = int(at * SAMPLE_RATE)
+        signal[start:start + 2000] += noise.normal(0, 0.5, 2000)
+    return (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+
+
+def analyze(analyzer, pcm, chunk=512):
+    frames = []
+    for start in range(0, len(pcm), chunk):
+        frames += analyzer.feed(pcm[start:start + chunk])
+    return frames
+
+
+class _Stream:
+
+    def __init__(self):
+        self.frames = []
+
+    def panels_set(self, panel_ids, colors, transition_times=None):
+        self.frames.append((list(panel_ids), np.array(colors)))
+
+
+class TestAudioAnalyzer:
+
+    def test_one_frame_per_hop(self):
+        analyzer = AudioAnalyzer(window=1024, hop=256)
+        assert len(analyzer.feed(np.zeros(1000, dtype=np.int16))) == 3
+        assert len(analyzer.feed(np.zeros(24, dtype=np.int16))) == 1
+        assert analyzer.position == 1024
+
+    def test_tone_peaks_in_its_band(self):
+        analyzer = AudioAnalyzer(bands=8)
+        frames = analyze(analyzer, (tone(1000, 0.5) * 32767).astype(np.int16))
+        band = max(i for i, low in enumerate(analyzer.band_frequencies) if low <= 1000)
+        assert int(np.argmax(frames[-1].bands)) == band
+
+    def test_detects_onsets(self):
+        pcm = with_clicks(tone(100, 2), [0.25, 0.75, 1.25, 1.75])
+        frames = analyze(AudioAnalyzer(), pcm)
+        onsets = [frame.position / SAMPLE_RATE for frame in frames if frame.onset]
+        assert len(onsets) == 4
+        assert all(abs(found - expected) < 0.05 for found, expected in zip(onsets, [0.25, 0.75, 1.25, 1.75]))
+
+    def test_mixes_down_channels_and_bytes(self):
+        stereo = np.repeat((tone(440, 0.1) * 32767).astype(np.int16), 2)
+        mono_frames = analyze(AudioAnalyzer(), stereo[::2])
+        stereo_frames = AudioAnalyzer(channels=2).feed(stereo.tobytes())
+        assert np.allclose(mono_frames[-1].bands, stereo_frames[-1].bands, atol=1e-4)
+
+
+class TestBandMapper:
+
+    def test_bands_follow_panel_position(self):
+        mapper = BandMapper(LayoutGeometry(STRIP), bands=4)
+        order = np.argsort(np.frombuffer(mapper.geometry.x, dtype=np.float64))
+        assert mapper.panel_bands[order].tolist() == sorted(mapper.panel_bands.tolist())
+        bands = np.array([1, 0, 0, 0], dtype=np.float32)
+        colors = mapper.colors(AudioFrame(bands, 0.25, False, 0))
+        lit = colors.max(axis=1)
+        assert (lit[mapper.panel_bands == 0] > 200).all()
+        assert (lit[mapper.panel_bands != 0] < 20).all()
+
+
+class TestAudioReactive:
+
+    def test_streams_frames_within_latency(self):
+        stream = _Stream()
+        reactive = AudioReactive(LayoutGeometry(STRIP), stream, max_latency=0.05)
+        pcm = with_clicks(tone(200, 1), [0.5])
+        stats = reactive.run((pcm[i:i + 512] for i in range(0, len(pcm), 512)), realtime=False)
+        assert stats.frames_sent == len(stream.frames) > 80
+        assert stats.percentile(99) <= 0.05
+        assert stream.frames[0][0] == [10 + i for i in range(8)]
+
+    def test_late_chunks_are_not_sent(self):
+        stream = _Stream()
+        reactive = AudioReactive(LayoutGeometry(STRIP), stream, max_latency=0.01)
+        assert reactive.process(np.zeros(512, dtype=np.int16), captured_at=0) is None
+        assert reactive.stats.late_chunks == 1
+        assert stream.frames == []
+
+    def test_analyzer_options(self):
+        reactive = AudioReactive(LayoutGeometry(STRIP), _Stream(), analyzer_options={"onset_sensitivity": 3})
+        assert reactive.analyzer.onset_sensitivity == 3
+
+    def test_paces_bytes_at_sample_rate(self, monkeypatch):
+        clock = _Clock()
+        monkeypatch.setattr(audio, "time", clock)
+        reactive = AudioReactive(LayoutGeometry(STRIP), _Stream())
+        pcm = (tone(200, 0.2) * 32767).astype(np.int16)
+        reactive.run(pcm[i:i + 512].tobytes() for i in range(0, len(pcm), 512))
+        # Each chunk holds half as many samples as bytes, so the audio plays at its own length, not twice that
+        assert clock.now == pytest.approx(len(pcm) / SAMPLE_RATE)
+
+    def test_end_to_end(self, mock_aurora):
+        with mock_aurora.aurora() as aurora:
+            stream = aurora.effect.effect_stream()
+            reactive = AudioReactive(aurora.panel_layout.geometry(), stream)
+            pcm = (tone(200, 0.2) * 32767).astype(np.int16)
+            reactive.run((pcm[i:i + 512] for i in range(0, len(pcm), 512)), realtime=False)
+        assert mock_aurora.wait_for_packets(reactive.stats.frames_sent)
+        assert len(mock_aurora.panels) == 9
+
+
+class TestSources:
+
+    def test_read_wave(self, tmp_path):
+        path = tmp_path / "tone.wav"
+        pcm = (tone(440, 0.1) * 32767).astype(np.int16)
+        with wave.open(str(path), "wb") as target:
+            target.setnchannels(1)
+            target.setsampwidth(2)
+            target.setframerate(SAMPLE_RATE)
+            target.writeframes(pcm.tobytes())
+        chunks = list(read_wave(path, chunk=1000))
+        assert np.array_equal(np.concatenate(chunks), pcm)
+
+    def test_read_pcm_keeps_frames_whole(self):
+        pipe = io.BytesIO(np.arange(1001, dtype=np.int16).tobytes() + b"\x00")
+        chunks = list(read_pcm(pipe, chunk=100, channels=1))
+        assert np.array_equal(np.concatenate(chunks), np.arange(1001, dtype=np.int16))
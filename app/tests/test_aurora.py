@@ -1,9 +1,6 @@
-from app.nanoleaf import Aurora
-
-
 class TestAurora:
 
-    def test_info(self):
-        aurora = Aurora()
+    def test_info(self, device_aurora):
+        aurora = device_aurora
         aurora.state.brightness = -1
         print(aurora.state.brightness)
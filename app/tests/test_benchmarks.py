@@ -0,0 +1,151 @@
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from app.tests.mock_aurora import MockAurora
+
+# End-to-end benchmarks against a MockAurora. Run with:
+#   pytest app/tests/test_benchmarks.py --benchmark-only
+# Compare runs with --benchmark-autosave and --benchmark-compare to catch regressions.
+
+
+def _percentile(samples, percent):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def triangle_grid(rows, columns):
+    """A rows x columns wall of alternating up and down triangles"""
+    return [{"panelId": row * columns + column, "x": 75 * column,
+             "y": 130 * row + (0 if (row + column) % 2 == 0 else 43), "o": 0 if (row + column) % 2 == 0 else 60}
+            for row in range(rows) for column in range(columns)]
+
+
+@pytest.fixture(scope="module")
+def mock():
+    with MockAurora() as mock:
+        yield mock
+
+
+@pytest.fixture
+def aurora(mock):
+    with mock.aurora() as aurora:
+        yield aurora
+
+
+class TestRequestBenchmarks:
+
+    def test_get_throughput(self, benchmark, aurora):
+        assert benchmark(lambda: aurora.state.brightness) is not None
+
+    def test_put_throughput(self, benchmark, aurora):
+        benchmark(lambda: setattr(aurora.state, "brightness", 50))
+
+    def test_cached_read_throughput(self, benchmark, mock):
+        with mock.aurora(cache_ttl=60) as aurora:
+            aurora.snapshot()
+            assert benchmark(lambda: aurora.state.brightness) is not None
+
+    def test_latency_percentiles(self, benchmark, aurora):
+        samples = []
+
+        def timed_read():
+            start = time.perf_counter()
+            aurora.state.brightness
+            samples.append(time.perf_counter() - start)
+
+        benchmark.pedantic(timed_read, rounds=500, iterations=1, warmup_rounds=10)
+        benchmark.extra_info["p50_ms"] = _percentile(samples, 50) * 1000
+        benchmark.extra_info["p99_ms"] = _percentile(samples, 99) * 1000
+
+    def test_latency_under_injected_delay(self, benchmark):
+        with MockAurora(latency=0.005) as mock, mock.aurora() as aurora:
+            benchmark.pedantic(lambda: aurora.state.brightness, rounds=50, iterations=1)
+            assert benchmark.stats.stats.min >= 0.005
+
+
+class TestStreamBenchmarks:
+
+    PANELS = 100
+
+    def _stream(self, mock, aurora):
+        stream = aurora.effect.effect_stream()
+        for panel_id in range(self.PANELS):
+            stream.frame.slot(panel_id)
+        return stream
+
+    def test_stream_fps(self, benchmark, mock, aurora):
+        np = pytest.importorskip("numpy")
+        stream = self._stream(mock, aurora)
+        panel_ids = np.arange(self.PANELS)
+        frames = [np.full((self.PANELS, 3), i, dtype=np.uint8) for i in range(16)]
+        counter = iter(range(1 << 30))
+
+        def frame():
+            stream.panels_set(panel_ids, frames[next(counter) % len(frames)])
+
+        benchmark(frame)
+        benchmark.extra_info["fps"] = 1 / benchmark.stats.stats.mean
+
+    def test_allocation_per_frame(self, benchmark, mock, aurora):
+        stream = self._stream(mock, aurora)
+        frame_count = 200
+
+        def render_frames():
+            for frame_number in range(frame_count):
+                for panel_id in range(self.PANELS):
+                    stream.panel_prepare(panel_id, frame_number % 256, panel_id % 256, 0)
+                stream.panel_strobe()
+
+        render_frames()
+        tracemalloc.start()
+        render_frames()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        benchmark.extra_info["peak_bytes_per_frame"] = peak / frame_count
+        benchmark.pedantic(render_frames, rounds=5, iterations=1)
+
+
+class TestSamplerBenchmarks:
+
+    def test_sample_fps_for_large_layouts(self, benchmark):
+        np = pytest.importorskip("numpy")
+        from app.nanoleaf.geometry import LayoutGeometry
+        from app.nanoleaf.sampler import CanvasSampler
+        geometry = LayoutGeometry(triangle_grid(10, 12))
+        sampler = CanvasSampler(geometry, 1280, 720)
+        frames = [np.random.randint(0, 256, (720, 1280, 3), dtype=np.uint8) for _ in range(4)]
+        counter = iter(range(1 << 30))
+
+        def sample():
+            sampler.sample(frames[next(counter) % len(frames)])
+
+        benchmark(sample)
+        benchmark.extra_info["panels"] = len(geometry)
+        benchmark.extra_info["fps"] = 1 / benchmark.stats.stats.mean
+
+
+class TestImportBenchmarks:
+
+    def _cold_import(self, statement):
+        subprocess.check_call([sys.executable, "-c", statement])
+
+    @pytest.mark.parametrize("statement", ["import app.nanoleaf",
+                                           "from app.nanoleaf import Aurora",
+                                           "from app.nanoleaf.stream import AuroraStream",
+                                           "from app.nanoleaf import AsyncAurora"])
+    def test_cold_start(self, benchmark, statement):
+        baseline = min(self.__time(lambda: self._cold_import("pass")) for _ in range(3))
+        benchmark.pedantic(self._cold_import, args=(statement,), rounds=5, iterations=1)
+        benchmark.extra_info["import_seconds"] = benchmark.stats.stats.min - baseline
+
+    @staticmethod
+    def __time(function):
+        started = time.perf_counter()
+        function()
+        return time.perf_counter() - started
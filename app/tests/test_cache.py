@@ -0,0 +1,57 @@
+from app.nanoleaf import endpoints
+from app.nanoleaf.cache import MISSING, StateCache
+from app.tests.conftest import INFO
+
+
+class TestStateCache:
+
+    def test_write_through_and_invalidate(self):
+        cache = StateCache(ttl=60)
+        cache.store(INFO)
+        cache.update("PUT", endpoints.STATE, {"brightness": {"value": 20}, "hue": {"increment": 5}}, None)
+        assert cache.lookup(endpoints.STATE_BRIGHTNESS) == 20
+        assert cache.lookup(endpoints.STATE_HUE) is MISSING
+        assert cache.lookup(endpoints.STATE_COLOR_MODE) is MISSING
+        assert cache.lookup(endpoints.STATE_ON) is True
+
+    def test_expires(self):
+        cache = StateCache(ttl=0)
+        cache.store(INFO)
+        assert cache.lookup(endpoints.STATE_ON) is MISSING
+        assert cache.lookup(endpoints.STATE_ON, max_age=60) is True
+
+    def test_lookup_returns_copy(self):
+        cache = StateCache(ttl=60)
+        cache.store(INFO)
+        cache.lookup(endpoints.EFFECTS_LIST).remove("Flames")
+        assert cache.lookup(endpoints.EFFECTS_LIST) == ["Flames", "Forest"]
+
+
+class TestSnapshotReads:
+
+    def test_rgb_single_round_trip(self, fake_aurora):
+        aurora, calls = fake_aurora()
+        assert aurora.state.rgb == [0, 255, 0]
+        assert calls == [("GET", "")]
+
+    def test_panel_count_single_round_trip(self, fake_aurora):
+        aurora, calls = fake_aurora()
+        assert aurora.panel_layout.panel_count == 9
+        assert calls == [("GET", "")]
+
+    def test_static_fields_reuse_snapshot(self, fake_aurora):
+        aurora, calls = fake_aurora()
+        assert (aurora.firmware, aurora.model, aurora.serial_number) == ("1.5.0", "NL22", "S123")
+        assert len(calls) == 1
+
+    def test_read_through_cache(self, fake_aurora):
+        aurora, calls = fake_aurora(cache_ttl=60)
+        assert aurora.state.brightness == 100
+        assert aurora.state.on is True
+        assert aurora.effect.effect == "Flames"
+        aurora.state.brightness = 40
+        assert aurora.state.brightness == 40
+        assert calls == [("GET", ""), ("PUT", "state")]
+        aurora.invalidate()
+        assert aurora.state.brightness == 100
+        assert len(calls) == 3
@@ -0,0 +1,68 @@
+from app.nanoleaf.catalog import EffectCatalog
+
+
+def effect_calls(aurora):
+    session = aurora._requester.session
+    return [body["write"]["command"] for body in session.bodies if body and "write" in body]
+
+
+class TestEffectCatalog:
+
+    def test_list_is_served_from_catalog(self, fake_aurora):
+        aurora, calls = fake_aurora()
+        assert aurora.effect.effects_list == ["Flames", "Forest"]
+        assert aurora.effect.effects_list == ["Flames", "Forest"]
+        assert calls == [("GET", "effects/effectsList")]
+
+    def test_details_all_fetched_once(self, fake_aurora):
+        aurora, calls = fake_aurora()
+        first = aurora.effect.effect_details_all()
+        assert [details["animName"] for details in first["animations"]] == ["Flames", "Forest"]
+        assert aurora.effect.effect_details_all() == first
+        assert aurora.effect.effect_details("Forest")["animName"] == "Forest"
+        assert effect_calls(aurora) == ["requestAll"]
+
+    def test_incremental_sync(self, fake_aurora):
+        aurora, calls = fake_aurora()
+        aurora.effect.effect_details_all()
+        aurora.effect.catalog.sync_names(["Flames"])
+        aurora.effect.catalog.invalidate()
+        aurora.effect.effect_details_all()
+        # Forest was dropped and fetched again on its own
+        assert effect_calls(aurora) == ["requestAll", "request"]
+
+    def test_follows_writes(self, fake_aurora):
+        aurora, calls = fake_aurora()
+        effect = aurora.effect
+        effect.effects_list
+        effect.effect_rename("Flames", "Fire")
+        effect.effect_delete("Forest")
+        effect.effect_set_raw({"command": "add", "animName": "Blink", "animType": "custom", "animData": "0"})
+        assert effect.effects_list == ["Fire", "Blink"]
+        assert effect.effect_details("Blink")["animData"] == "0"
+        assert "request" not in effect_calls(aurora)
+
+    def test_details_diffed_before_use(self, fake_aurora, tmp_path):
+        path = tmp_path / "effects.json"
+        stale = EffectCatalog(path)
+        stale.sync_names(["Flames", "Gone"])
+        stale.store("Gone", {"animName": "Gone"})
+        stale.store("Flames", {"animName": "Flames"})
+        aurora, calls = fake_aurora(catalog_path=path)
+        assert aurora.effect.effect_details("Flames") == {"animName": "Flames"}
+        assert calls == [("GET", "effects/effectsList")]
+        # Deleted by another client
+        assert aurora.effect.catalog.details("Gone") is None
+
+    def test_persists(self, tmp_path):
+        path = tmp_path / "effects.json"
+        catalog = EffectCatalog(path)
+        catalog.sync_names(["Flames"])
+        catalog.store("Flames", {"animName": "Flames"})
+        loaded = EffectCatalog(path)
+        assert loaded.names == ["Flames"]
+        assert not loaded.fresh
+        # Held back until diffed against the device
+        assert loaded.details("Flames") is None
+        assert loaded.sync_names(["Flames"]) == []
+        assert loaded.details("Flames") == {"animName": "Flames"}
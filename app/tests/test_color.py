@@ -0,0 +1,42 @@
+import colorsys
+
+import pytest
+
+from app.nanoleaf import color
+from app.nanoleaf.state import rgb_from_hsv
+
+np = pytest.importorskip("numpy")
+
+
+class TestColor:
+
+    def test_hsv_to_rgb_matches_state(self):
+        hue, saturation, brightness = (grid.ravel() for grid in np.meshgrid(np.arange(0, 361, 5),
+                                                                             np.arange(0, 101, 10),
+                                                                             np.arange(0, 101, 10)))
+        expected = [rgb_from_hsv(*values) for values in zip(hue.tolist(), saturation.tolist(), brightness.tolist())]
+        assert color.hsv_to_rgb(hue, saturation, brightness).tolist() == expected
+
+    def test_rgb_to_hsv_matches_colorsys(self):
+        colors = np.random.default_rng(0).integers(0, 256, (500, 3))
+        expected = [colorsys.rgb_to_hsv(*(channel / 255 for channel in rgb)) for rgb in colors.tolist()]
+        assert np.allclose(color.rgb_to_hsv(colors), np.array(expected) * [360, 100, 100])
+
+    def test_linear_round_trip(self):
+        colors = np.arange(256, dtype=np.uint8)
+        assert np.array_equal(color.linear_to_srgb(color.srgb_to_linear(colors)), colors)
+
+    def test_kelvin_to_rgb(self):
+        assert color.kelvin_to_rgb(6600).tolist() == [255, 255, 255]
+        warm, cool = color.kelvin_to_rgb([2700, 6500])
+        assert warm[0] == 255 and warm[2] < cool[2]
+        assert color.kelvin_to_rgb(500).tolist() == color.kelvin_to_rgb(color.MIN_KELVIN).tolist()
+
+    def test_correction(self):
+        correction = color.Correction(gamma=2.2, white_balance=(255, 200, 100))
+        colors = np.array([[255, 255, 255, 7], [0, 0, 0, 0], [128, 128, 128, 0]], dtype=np.uint8)
+        corrected = correction(colors)
+        assert corrected[0].tolist() == [255, 200, 100, 7]
+        assert corrected[1].tolist() == [0, 0, 0, 0]
+        assert corrected[2, 0] == round(255 * (128 / 255) ** 2.2)
+        assert correction.correct(128, 128, 128) == tuple(corrected[2, :3].tolist())
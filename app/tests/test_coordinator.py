@@ -0,0 +1,45 @@
+import socket
+
+import pytest
+
+from app.nanoleaf.coordinator import StreamCoordinator
+from app.nanoleaf.stream import AuroraStream
+
+
+@pytest.fixture
+def receivers():
+    socks = []
+    for _ in range(2):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        sock.settimeout(1)
+        socks.append(sock)
+    yield socks
+    for sock in socks:
+        sock.close()
+
+
+class TestStreamCoordinator:
+
+    def test_splits_canvas_per_device(self, receivers):
+        np = pytest.importorskip("numpy")
+        streams = {name: AuroraStream(*sock.getsockname()) for name, sock in zip("ab", receivers)}
+        coordinator = StreamCoordinator(streams, canvas=[("a", 1), ("b", 7), ("a", 2)])
+        colors = np.array([[1, 1, 1], [2, 2, 2], [3, 3, 3]], dtype=np.uint8)
+        coordinator.present(colors, transition_times=np.array([4, 5, 6]))
+        assert receivers[0].recv(64) == bytes([2, 1, 1, 1, 1, 1, 0, 4, 2, 1, 3, 3, 3, 0, 6])
+        assert receivers[1].recv(64) == bytes([1, 7, 1, 2, 2, 2, 0, 5])
+        assert coordinator.skew.frames == 1
+        assert set(coordinator.skew.offsets) == {"a", "b"}
+        assert coordinator.skew.offsets["a"] == 0
+
+    def test_partial_frame(self, receivers):
+        streams = {name: AuroraStream(*sock.getsockname()) for name, sock in zip("ab", receivers)}
+        coordinator = StreamCoordinator(streams, canvas=[("a", 1), ("b", 7)])
+        coordinator.panels_set([1], [[9, 9, 9]])
+        assert receivers[1].recv(64) == bytes([1, 7, 1, 9, 9, 9, 0, 1])
+        assert coordinator.skew.last == 0
+
+    def test_unknown_device(self):
+        with pytest.raises(KeyError):
+            StreamCoordinator({}, canvas=[("missing", 1)])
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from app.nanoleaf.utils import discovery
+from app.nanoleaf.utils.discovery import DeviceRegistry, DiscoveredDevice, discover, discover_async, \
+    parse_response
+
+
+def _response(device_id, ip_address):
+    return ("HTTP/1.1 200 OK\r\n"
+            "Cache-Control: max-age=60\r\n"
+            "ST: nanoleaf_aurora:light\r\n"
+            f"Location: http://{ip_address}:16021\r\n"
+            f"nl-deviceid: {device_id}\r\n"
+            "\r\n")
+
+
+@pytest.fixture
+def responder(monkeypatch):
+    """Answers every M-SEARCH with two Auroras, standing in for the multicast group"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.1)
+    searches = []
+    running = threading.Event()
+    running.set()
+
+    def serve():
+        while running.is_set():
+            try:
+                data, addr = sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            searches.append(data)
+            sock.sendto(_response("AA:01", "10.0.0.5").encode(), addr)
+            sock.sendto(_response("AA:02", "10.0.0.6").encode(), addr)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    monkeypatch.setattr(discovery, "SSDP_IP", "127.0.0.1")
+    monkeypatch.setattr(discovery, "SSDP_PORT", sock.getsockname()[1])
+    yield searches
+    running.clear()
+    thread.join()
+    sock.close()
+
+
+class TestDiscovery:
+
+    def test_parse_response(self):
+        assert parse_response(_response("AA:01", "10.0.0.5")) == DiscoveredDevice("AA:01", "10.0.0.5")
+        assert parse_response(_response("AA:01", "")).ip_address is None
+        assert parse_response("HTTP/1.1 200 OK\r\nST: upnp:rootdevice\r\n") is None
+
+    def test_local_addresses_skip_loopback(self, monkeypatch):
+        infos = [(socket.AF_INET, 0, 0, "", (address, 0)) for address in ("127.0.1.1", "127.0.0.1", "10.1.2.3")]
+        monkeypatch.setattr(discovery.socket, "getaddrinfo", lambda *args: infos)
+        addresses = discovery.local_addresses()
+        assert "10.1.2.3" in addresses
+        assert not any(address.startswith("127.") for address in addresses)
+
+    def test_returns_early_when_expected_found(self, responder):
+        start = time.monotonic()
+        devices = list(discover(expected=2, timeout=10, interfaces=["127.0.0.1"]))
+        assert time.monotonic() - start < 2
+        assert {device.device_id for device in devices} == {"AA:01", "AA:02"}
+        assert b"ST: nanoleaf_aurora:light" in responder[0]
+
+    def test_resends_until_timeout(self, responder):
+        devices = list(discover(timeout=1.2, interfaces=["127.0.0.1"], initial_interval=0.2))
+        assert len(devices) == 2
+        assert len(responder) >= 3
+
+    def test_async(self, responder):
+        async def search():
+            return [device async for device in discover_async(expected=["AA:02"], timeout=10,
+                                                              interfaces=["127.0.0.1"])]
+
+        assert DiscoveredDevice("AA:02", "10.0.0.6") in asyncio.run(search())
+
+
+class TestDeviceRegistry:
+
+    def test_persists(self, tmp_path):
+        path = tmp_path / "devices.json"
+        registry = DeviceRegistry(path)
+        registry.add_discovered([DiscoveredDevice("AA:01", "10.0.0.5")])
+        registry.update("AA:01", auth_token="token")
+        registry.save()
+        assert os.stat(path).st_mode & 0o777 == 0o600
+        reloaded = DeviceRegistry(path)
+        assert reloaded["AA:01"]["ip_address"] == "10.0.0.5"
+        assert reloaded["AA:01"]["auth_token"] == "token"
+        assert reloaded.stale(max_age=60) == []
+        assert reloaded.stale(max_age=-1) == ["AA:01"]
+
+    def test_refresh_rediscovers_missing(self, responder):
+        registry = DeviceRegistry(None)
+        registry.update("AA:02", ip_address="10.0.0.99")
+        registry.devices["AA:02"]["last_seen"] = 0
+        missing = registry.refresh(max_age=60, timeout=5)
+        assert missing == []
+        assert registry["AA:02"]["ip_address"] == "10.0.0.6"
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from app.nanoleaf import endpoints
+from app.nanoleaf.events import AuroraEvent, EFFECTS_EVENT, LAYOUT_EVENT, STATE_EVENT, TOUCH_EVENT, \
+    _SSEParser, events_endpoint
+from app.tests.conftest import INFO
+
+STREAM = [b"id: 1", b'data: {"events":[{"attr":2,"value":65}]}', b"",
+          b"id: 4", b'data: {"events":[{"panelId":7,"gesture":1}]}', b"",
+          b"id: 2", b'data: {"events":[{"attr":2,"value":90}]}', b""]
+
+
+class _StreamResponse:
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.closed = False
+
+    def iter_lines(self, chunk_size=None, delimiter=None):
+        return iter(self.lines)
+
+    def close(self):
+        self.closed = True
+
+
+def _listening_aurora(fake_aurora, lines=STREAM):
+    aurora, calls = fake_aurora()
+    aurora._requester.stream = lambda endpoint: _StreamResponse(lines)
+    return aurora, calls
+
+
+class TestParser:
+
+    def test_events(self):
+        parser = _SSEParser()
+        events = [event for line in STREAM for event in parser.feed(line)]
+        assert events == [AuroraEvent(STATE_EVENT, attribute=2, value=65),
+                          AuroraEvent(TOUCH_EVENT, panel_id=7, gesture=1),
+                          AuroraEvent(LAYOUT_EVENT, attribute=2, value=90)]
+        assert events[0].endpoint == endpoints.STATE_BRIGHTNESS
+
+    def test_endpoint(self):
+        assert events_endpoint([STATE_EVENT, EFFECTS_EVENT]) == "events?id=1,3"
+
+
+class TestEventListener:
+
+    def test_events_update_cache(self, fake_aurora):
+        aurora, calls = _listening_aurora(fake_aurora)
+        aurora.panel_layout._geometry = object()
+        listener = aurora.events()
+        events = listener.listen()
+        next(events)
+        assert listener.connected
+        assert aurora.state.brightness == 65
+        assert aurora.state.on is True
+        assert calls == [("GET", "")]
+        next(events)
+        next(events)
+        assert aurora.panel_layout.orientation == 90
+        assert aurora.panel_layout._geometry is None
+        listener.stop()
+        events.close()
+        assert not listener.connected
+        aurora.state.brightness
+        assert calls[-1] == ("GET", endpoints.STATE_BRIGHTNESS)
+
+    def test_callbacks_on_background_thread(self, fake_aurora):
+        aurora, calls = _listening_aurora(fake_aurora)
+        touches = []
+        with aurora.events(reconnect_delay=0.01) as listener:
+            listener.add_callback(touches.append, event_types=[TOUCH_EVENT])
+            received = listener.events(timeout=1)
+            for event in received:
+                if touches:
+                    break
+            received.close()
+        assert touches[0].panel_id == 7
+        assert touches[0].gesture == 1
+
+    def test_callback_errors_are_logged(self, fake_aurora, caplog):
+        aurora, calls = _listening_aurora(fake_aurora)
+        listener = aurora.events()
+        received = []
+
+        def fail(event):
+            raise ValueError("broken callback")
+        listener.add_callback(fail)
+        listener.add_callback(received.append)
+        events = listener.listen()
+        with caplog.at_level("ERROR", logger="app.nanoleaf.events"):
+            next(events)
+        events.close()
+        assert len(received) == 1
+        assert "broken callback" in caplog.text
+
+
+class TestAsyncEventListener:
+
+    def test_async_iteration(self):
+        web = pytest.importorskip("aiohttp.web")
+        from app.tests.test_async_aurora import _aurora, _serve
+
+        async def events(request):
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            await response.write(b"\n".join(STREAM[:3]) + b"\n")
+            await asyncio.sleep(0.5)
+            return response
+
+        async def info(request):
+            return web.json_response(INFO)
+
+        async def scenario():
+            runner, port = await _serve([web.get("/api/v1/token/events", events),
+                                         web.get("/api/v1/token/", info)])
+            try:
+                async with _aurora(port) as aurora:
+                    received = aurora.events([STATE_EVENT]).listen()
+                    event = await received.__anext__()
+                    brightness = await aurora.state.brightness()
+                    await received.aclose()
+                    return event, brightness
+            finally:
+                await runner.cleanup()
+
+        event, brightness = asyncio.run(scenario())
+        assert event.value == 65
+        assert brightness == 65
@@ -0,0 +1,57 @@
+import math
+
+import pytest
+
+from app.nanoleaf.geometry import LayoutGeometry
+
+# A strip of four triangles alternating up and down, plus the rhythm module
+STRIP = [{"panelId": 10 + i, "x": 75 * i, "y": 0 if i % 2 == 0 else 43, "o": 0 if i % 2 == 0 else 60}
+         for i in range(4)] + [{"panelId": 99, "x": 500, "y": 500, "o": 0, "shapeType": 1}]
+
+
+class TestLayoutGeometry:
+
+    def test_slots_follow_layout_order(self):
+        geometry = LayoutGeometry(STRIP)
+        assert geometry.panel_ids == (10, 11, 12, 13)
+        assert geometry.slot(12) == 2
+        assert 99 not in geometry
+
+    def test_neighbors(self):
+        geometry = LayoutGeometry(STRIP)
+        assert geometry.neighbors(10) == (11,)
+        assert geometry.neighbors(11) == (10, 12)
+        assert geometry.neighbors(13) == (12,)
+
+    def test_spatial_queries(self):
+        geometry = LayoutGeometry(STRIP)
+        assert geometry.nearest(160, 10) == 12
+        assert geometry.nearest(-1000, 0) == 10
+        assert geometry.within(0, 0, 100, 50) == [10, 11]
+        assert geometry.within_radius(75, 43, 1) == [11]
+        assert geometry.bounds == (0, 0, 225, 43)
+        assert geometry.sorted_by_y()[:2] == [10, 12]
+
+    def test_orientation(self):
+        geometry = LayoutGeometry(STRIP, orientation=90)
+        x, y = geometry.position(10)
+        center_x, center_y = 112.5, 21.5
+        assert x == pytest.approx(center_x + 21.5)
+        assert y == pytest.approx(center_y - 112.5)
+        assert geometry.panel_orientation(11) == 150
+        assert geometry.neighbors(11) == (10, 12)
+
+    def test_immutable(self):
+        geometry = LayoutGeometry(STRIP)
+        with pytest.raises(AttributeError):
+            geometry.extra = 1
+        with pytest.raises(TypeError):
+            geometry.x[0] = 1.0
+
+    def test_panel_layout_geometry_is_cached(self, fake_aurora):
+        aurora, calls = fake_aurora()
+        assert len(aurora.panel_layout.geometry()) == 0
+        aurora.panel_layout.geometry()
+        assert calls == [("GET", "")]
+        assert math.isclose(aurora.panel_layout.geometry(refresh=True).side_length, 150)
+        assert len(calls) == 2
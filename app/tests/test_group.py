@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from app.nanoleaf import AuroraGroup
+from app.nanoleaf.exceptions import GroupException
+
+
+class _BarrierSession:
+    """Holds every request until all members are requesting at once, which only concurrent dispatch achieves"""
+
+    def __init__(self, session, barrier):
+        self.session = session
+        self.barrier = barrier
+
+    def request(self, *args, **kwargs):
+        self.barrier.wait()
+        return self.session.request(*args, **kwargs)
+
+    def close(self):
+        pass
+
+
+class _BrokenSession:
+
+    def request(self, *args, **kwargs):
+        raise RuntimeError("unreachable")
+
+    def close(self):
+        pass
+
+
+class TestAuroraGroup:
+
+    def test_dispatches_concurrently(self, fake_aurora):
+        members = []
+        # Sequential dispatch would leave the first request waiting until the barrier times out
+        barrier = threading.Barrier(8, timeout=10)
+        for _ in range(8):
+            aurora, _ = fake_aurora()
+            aurora._requester.session = _BarrierSession(aurora._requester.session, barrier)
+            members.append(aurora)
+        with AuroraGroup(members) as group:
+            group.state.brightness = 30
+            assert group.last_result.ok
+            assert len(group.last_result) == 8
+            brightness = group.state.brightness
+            assert [brightness[aurora] for aurora in members] == [100] * 8
+
+    def test_aggregates_errors(self, fake_aurora):
+        healthy, calls = fake_aurora()
+        broken, _ = fake_aurora()
+        broken._requester.session = _BrokenSession()
+        with AuroraGroup([healthy, broken]) as group:
+            result = group.effect.effect_details("Flames")
+            assert not result.ok
+            assert list(result.errors) == [broken]
+            assert healthy in result.results
+            with pytest.raises(GroupException):
+                result.raise_for_errors()
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import app.nanoleaf
+
+
+def _loaded_modules(statement):
+    """Runs statement in a fresh interpreter and returns the modules it loaded"""
+    code = f"import sys, json\n{statement}\nprint(json.dumps(sorted(sys.modules)))"
+    output = subprocess.check_output([sys.executable, "-c", code])
+    return set(json.loads(output))
+
+
+class TestLazyImports:
+
+    def test_package_import_loads_nothing(self):
+        modules = _loaded_modules("import app.nanoleaf")
+        assert not {"app.nanoleaf.aurora", "requests", "aiohttp", "numpy", "dotenv"} & modules
+
+    def test_sync_aurora_skips_async_and_numpy(self):
+        modules = _loaded_modules("from app.nanoleaf import Aurora")
+        assert "requests" in modules
+        assert not {"aiohttp", "asyncio", "numpy", "dotenv"} & modules
+
+    def test_stream_skips_http(self):
+        modules = _loaded_modules("from app.nanoleaf.stream import AuroraStream")
+        assert not {"requests", "aiohttp", "asyncio"} & modules
+        assert "numpy" not in modules
+
+    def test_stream_still_importable_from_effect(self):
+        modules = _loaded_modules("import app.nanoleaf.effect")
+        assert "app.nanoleaf.stream" not in modules
+        from app.nanoleaf.effect import AuroraStream
+        from app.nanoleaf.stream import AuroraStream as stream_class
+        assert AuroraStream is stream_class
+
+    def test_names_resolve_lazily(self):
+        from app.nanoleaf.aurora import Aurora
+        assert app.nanoleaf.Aurora is Aurora
+        assert "AsyncAurora" in dir(app.nanoleaf)
+        with pytest.raises(AttributeError):
+            app.nanoleaf.Missing
+
+    def test_load_env(self, tmp_path, monkeypatch):
+        pytest.importorskip("dotenv")
+        monkeypatch.delenv("NANOLEAF_TEST_VALUE", raising=False)
+        path = tmp_path / ".env"
+        path.write_text("NANOLEAF_TEST_VALUE=42\n")
+        assert app.nanoleaf.load_env(path)
+        assert os.environ["NANOLEAF_TEST_VALUE"] == "42"
+        monkeypatch.delenv("NANOLEAF_TEST_VALUE")
@@ -0,0 +1,67 @@
+import socket
+
+import pytest
+
+from app.nanoleaf import Aurora
+from app.nanoleaf.exceptions import ConnectionFailedException, ResourceNotFoundException
+from app.nanoleaf.metrics import Histogram, Metrics
+from app.nanoleaf.stream import AuroraStream
+
+
+class TestHistogram:
+
+    def test_buckets_and_percentiles(self):
+        histogram = Histogram(buckets=(0.01, 0.1, 1))
+        for value in (0.005, 0.005, 0.05, 0.5, 5):
+            histogram.observe(value)
+        assert histogram.cumulative() == [(0.01, 2), (0.1, 3), (1, 4), (float("inf"), 5)]
+        assert histogram.percentile(50) == 0.1
+        assert histogram.percentile(100) == float("inf")
+
+
+class TestMetrics:
+
+    def test_records_requests_and_hooks(self, mock_aurora):
+        metrics = Metrics()
+        before = []
+        metrics.add_hook(before=lambda *args: before.append(args))
+        with mock_aurora.aurora(metrics=metrics) as aurora:
+            aurora.state.brightness = 20
+            aurora.state.brightness
+            try:
+                aurora.effect.effect = "Missing"
+            except ResourceNotFoundException:
+                pass
+        device = "127.0.0.1"
+        assert before[0] == (device, "PUT", "state", {"brightness": {"value": 20}})
+        assert metrics.latency[(device, "GET", "state/brightness/value")].count == 1
+        assert metrics.requests[(device, "PUT", "state", 204)] == 1
+        assert metrics.errors == {(device, "effects", "ResourceNotFoundException"): 1}
+        assert metrics.bytes_sent[(device, "http")] > 0
+
+    def test_connection_errors(self):
+        metrics = Metrics()
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        with Aurora("127.0.0.1", "token", metrics=metrics, timeout=1) as aurora:
+            aurora._requester.base_url = f"http://127.0.0.1:{port}/api/v1/token/"
+            with pytest.raises(ConnectionFailedException):
+                aurora.identify()
+        assert metrics.error_count("127.0.0.1") == 1
+        assert metrics.requests[("127.0.0.1", "PUT", "identify", None)] == 1
+
+    def test_stream_packets_and_prometheus(self):
+        metrics = Metrics()
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as receiver:
+            receiver.bind(("127.0.0.1", 0))
+            stream = AuroraStream(*receiver.getsockname(), metrics=metrics)
+            for i in range(3):
+                stream.panel_set(1, i, 0, 0)
+        metrics.after_request("10.0.0.2", "GET", "state", 200, 0.003)
+        text = metrics.prometheus()
+        assert 'nanoleaf_stream_packets_total{device="127.0.0.1"} 3' in text
+        assert 'nanoleaf_bytes_sent_total{device="127.0.0.1",transport="stream"} 24' in text
+        assert 'nanoleaf_request_duration_seconds_bucket{device="10.0.0.2",method="GET",endpoint="state",' \
+               'le="0.005"} 1' in text
+        assert 'nanoleaf_requests_total{device="10.0.0.2",method="GET",endpoint="state",status="200"} 1' in text
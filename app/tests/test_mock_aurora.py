@@ -0,0 +1,41 @@
+from app.nanoleaf.animation import CustomEffect
+from app.tests.mock_aurora import MockAurora
+
+
+class TestMockAurora:
+
+    def test_state_round_trip(self, mock_aurora):
+        with mock_aurora.aurora() as aurora:
+            aurora.state.brightness = 40
+            aurora.state.hue = 200
+            assert aurora.state.brightness == 40
+            assert aurora.state.color_mode == "hs"
+            aurora.state.brightness_raise(100)
+            assert aurora.state.brightness == 100
+
+    def test_effects(self, mock_aurora):
+        with mock_aurora.aurora() as aurora:
+            aurora.effect.effect = "Forest"
+            assert aurora.effect.effect == "Forest"
+            blink = CustomEffect.from_layout("Blink", aurora.panel_layout)
+            for panel_id in blink.panel_ids:
+                blink.add_keyframe(panel_id, 255, 0, 0)
+            assert aurora.effect.effect_install(blink) is True
+            assert aurora.effect.effect_install(blink) is False
+            aurora.effect.effect_rename("Blink", "Flash")
+            assert "Flash" in mock_aurora.document["effects"]["effectsList"]
+
+    def test_stream(self, mock_aurora):
+        with mock_aurora.aurora() as aurora:
+            stream = aurora.effect.effect_stream()
+            stream.panel_set(100, 1, 2, 3)
+            assert mock_aurora.wait_for_packets(1)
+            assert mock_aurora.panels[100] == (1, 2, 3)
+
+    def test_injected_stream_loss(self):
+        with MockAurora(stream_loss=0.5, seed=1) as mock, mock.aurora() as aurora:
+            stream = aurora.effect.effect_stream()
+            for i in range(100):
+                stream.panel_set(100, i, 0, 0)
+            assert mock.wait_for_packets(100)
+            assert 20 < mock.dropped_packets < 80
@@ -0,0 +1,148 @@
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from app.nanoleaf import recording as recording_module
+from app.nanoleaf.recording import HEADER, Recorder, Recording
+from app.nanoleaf.stream import AuroraStream
+
+
+@pytest.fixture
+def receiver_address():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    yield sock.getsockname()
+    sock.close()
+
+
+class _Clock:
+    """Stands in for the time module, advancing only when slept"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class _Stream:
+
+    def __init__(self, clock=time, send_time: float = 0):
+        self.packets = []
+        self.clock = clock
+        self.send_time = send_time
+
+    def send_packet(self, packet):
+        self.packets.append((self.clock.perf_counter(), bytes(packet)))
+        self.clock.sleep(self.send_time)
+
+
+class TestRecording:
+
+    def test_records_stream_packets(self, tmp_path, receiver_address):
+        path = tmp_path / "session.nlr"
+        stream = AuroraStream(*receiver_address)
+        with Recorder(path) as recorder:
+            recorder.attach(stream)
+            stream.panel_set(3, 1, 2, 3)
+            stream.panel_prepare(1, 255, 0, 0)
+            stream.panel_strobe()
+            recorder.detach(stream)
+            stream.panel_set(4, 0, 0, 0)
+        with Recording(path) as recording:
+            assert len(recording) == 2
+            assert struct.unpack_from("<Q", path.read_bytes(), 8) == (2,)
+            assert recording[0][0] == 0
+            assert bytes(recording[0][1]) == bytes([1, 3, 1, 1, 2, 3, 0, 1])
+            assert bytes(recording[1][1]) == bytes([1, 1, 1, 255, 0, 0, 0, 1])
+
+    def test_generated_frames(self, tmp_path):
+        path = tmp_path / "fade.nlr"
+        with Recorder(path) as recorder:
+            for frame in range(3):
+                recorder.add_frame(frame / 30, [10, 11], [[frame, 0, 0], [0, frame, 0]], 2)
+        with Recording(path) as recording:
+            assert list(recording.timestamps) == [0, 1 / 30, 2 / 30]
+            assert bytes(recording[2][1]) == bytes([2, 10, 1, 2, 0, 0, 0, 2, 11, 1, 0, 2, 0, 0, 2])
+            assert recording.duration == 2 / 30
+
+    def test_reads_up_to_a_truncated_frame(self, tmp_path):
+        path = tmp_path / "cut.nlr"
+        with Recorder(path) as recorder:
+            recorder.add_packet(b"\x01" * 8, 0)
+            recorder.add_packet(b"\x02" * 8, 0.1)
+        path.write_bytes(path.read_bytes()[:-3])
+        with Recording(path) as recording:
+            assert len(recording) == 1
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "other.bin"
+        path.write_bytes(b"\x00" * HEADER.size)
+        with pytest.raises(ValueError):
+            Recording(path)
+
+    def test_replays_at_scaled_rate(self, tmp_path, monkeypatch):
+        path = tmp_path / "timed.nlr"
+        with Recorder(path) as recorder:
+            for frame in range(5):
+                recorder.add_packet(bytes([frame]), frame * 0.05)
+        clock = _Clock()
+        monkeypatch.setattr(recording_module, "time", clock)
+        stream = _Stream(clock)
+        with Recording(path) as recording:
+            assert recording.play(stream, rate=2) == 5
+        assert [packet for _, packet in stream.packets] == [bytes([frame]) for frame in range(5)]
+        assert [at for at, _ in stream.packets] == pytest.approx([frame * 0.025 for frame in range(5)])
+
+    def test_stops_looping(self, tmp_path):
+        path = tmp_path / "loop.nlr"
+        with Recorder(path) as recorder:
+            recorder.add_packet(b"\x00", 0)
+            recorder.add_packet(b"\x01", 0.01)
+        stream = _Stream()
+        stop = threading.Event()
+        threading.Timer(0.1, stop.set).start()
+        with Recording(path) as recording:
+            sent = recording.play(stream, loop=True, stop=stop)
+        assert sent > 4
+
+    def test_delta_recordings_start_with_a_keyframe(self, tmp_path, receiver_address):
+        path = tmp_path / "delta.nlr"
+        stream = AuroraStream(*receiver_address, delta=True)
+        stream.panels_set([1, 2], [[10, 0, 0], [0, 10, 0]])
+        with Recorder(path) as recorder:
+            recorder.attach(stream)
+            stream.panels_set([1, 2], [[10, 0, 0], [0, 20, 0]])
+        with Recording(path) as recording:
+            assert recording.delta
+            assert [bytes(packet)[0] for _, packet in recording] == [2, 1]
+
+    @pytest.mark.parametrize("delta, expected", [(False, 2), (True, 5)])
+    def test_late_frames_skipped_unless_delta(self, tmp_path, monkeypatch, delta, expected):
+        path = tmp_path / "late.nlr"
+        with Recorder(path, delta=delta) as recorder:
+            for frame in range(5):
+                recorder.add_packet(bytes([frame]), frame * 0.01)
+        clock = _Clock()
+        monkeypatch.setattr(recording_module, "time", clock)
+        # Every send takes 0.1s, falling far behind frames 0.01s apart
+        stream = _Stream(clock, send_time=0.1)
+        with Recording(path) as recording:
+            assert recording.play(stream) == expected
+        assert stream.packets[-1][1] == bytes([4])
+
+    def test_replays_to_mock(self, tmp_path, mock_aurora):
+        path = tmp_path / "mock.nlr"
+        with Recorder(path) as recorder:
+            for frame in range(10):
+                recorder.add_frame(frame / 100, [100, 101], [[frame, 0, 0], [0, 0, frame]])
+        with mock_aurora.aurora() as aurora, Recording(path) as recording:
+            recording.play(aurora.effect.effect_stream())
+        assert mock_aurora.wait_for_packets(10)
+        assert mock_aurora.panels[101] == (0, 0, 9)
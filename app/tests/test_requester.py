@@ -0,0 +1,61 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from app.nanoleaf import Aurora
+from app.nanoleaf.utils import Requester
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+
+    def do_GET(self):
+        self.connections.add(self.client_address)
+        body = json.dumps({"firmwareVersion": "1.5.0"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.connections = set()
+    httpd = HTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestRequester:
+
+    def test_reuses_connection(self, server):
+        requester = Requester("127.0.0.1", "token")
+        requester.base_url = f"http://127.0.0.1:{server.server_port}/api/v1/token/"
+        with requester:
+            for _ in range(5):
+                assert requester.request(method="GET")["firmwareVersion"] == "1.5.0"
+        assert len(_Handler.connections) == 1
+
+    def test_pool_options(self):
+        requester = Requester("127.0.0.1", "token", pool_size=4, timeout=(1, 2), retries=3)
+        adapter = requester.session.get_adapter(requester.base_url)
+        assert adapter._pool_maxsize == 4
+        assert requester.retry_policy.retries == 3
+        assert requester.timeout == (1, 2)
+
+    def test_aurora_context_manager_closes_session(self):
+        with Aurora("127.0.0.1", "token") as aurora:
+            session = aurora._requester.session
+            session.get_adapter(aurora._requester.base_url).poolmanager.connection_from_url(
+                aurora._requester.base_url)
+        assert len(session.get_adapter(aurora._requester.base_url).poolmanager.pools) == 0
@@ -0,0 +1,106 @@
+import socket
+import time
+
+import pytest
+
+from app.nanoleaf.exceptions import CircuitOpenException, ConnectionFailedException
+from app.nanoleaf.utils import Requester
+from app.nanoleaf.utils.resilience import CircuitBreaker, RetryPolicy
+
+
+def _unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _requester(**options):
+    requester = Requester("127.0.0.1", "token", timeout=0.5, **options)
+    requester.base_url = f"http://127.0.0.1:{_unused_port()}/api/v1/token/"
+    return requester
+
+
+class TestRetryPolicy:
+
+    def test_delays_back_off_exponentially(self):
+        policy = RetryPolicy(retries=5, backoff_factor=0.1, max_backoff=0.3, jitter=0)
+        assert [policy.delay(attempt) for attempt in range(4)] == [0.1, 0.2, 0.3, 0.3]
+
+    def test_jitter_shortens_delays(self):
+        policy = RetryPolicy(retries=1, backoff_factor=1, jitter=0.5)
+        assert all(0.5 <= policy.delay(0) <= 1 for _ in range(100))
+
+    def test_only_reads_and_unsent_requests_are_retried(self):
+        policy = RetryPolicy(retries=2)
+        assert policy.should_retry("GET", 0)
+        assert not policy.should_retry("GET", 2)
+        assert not policy.should_retry("PUT", 0)
+        assert policy.should_retry("PUT", 0, sent=False)
+
+
+class TestCircuitBreaker:
+
+    def test_opens_probes_and_closes(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+        assert breaker.retry_after > 0
+
+        time.sleep(0.06)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow()
+        # Only one probe at a time
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow()
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+
+class TestRequester:
+
+    def test_connection_failure_raises(self):
+        with _requester() as requester:
+            with pytest.raises(ConnectionFailedException) as info:
+                requester.request("GET", "state")
+        assert not info.value.sent
+        assert requester.circuit_breaker.failures == 1
+
+    def test_retries_reads_and_unsent_writes(self):
+        attempts = []
+        with _requester(retries=2, backoff_factor=0) as requester:
+            requester._admit = lambda: attempts.append(1)
+            with pytest.raises(ConnectionFailedException):
+                requester.request("GET", "state")
+            assert len(attempts) == 3
+            # The connection was refused, so the write never reached the device
+            with pytest.raises(ConnectionFailedException):
+                requester.request("PUT", "state", {"on": {"value": True}})
+            assert len(attempts) == 6
+
+    def test_open_circuit_fails_fast(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+        with _requester(circuit_breaker=breaker) as requester:
+            for _ in range(2):
+                with pytest.raises(ConnectionFailedException):
+                    requester.request("GET", "state")
+            with pytest.raises(CircuitOpenException) as info:
+                requester.request("GET", "state")
+        assert info.value.retry_after > 0
+
+    def test_error_status_closes_circuit(self, mock_aurora):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        with mock_aurora.aurora(circuit_breaker=breaker) as aurora:
+            aurora.state.brightness = 10
+        assert breaker.failures == 0
@@ -0,0 +1,32 @@
+import pytest
+
+from app.nanoleaf.geometry import LayoutGeometry
+from app.nanoleaf.sampler import CanvasSampler
+
+np = pytest.importorskip("numpy")
+
+STRIP = [{"panelId": 10 + i, "x": 75 * i, "y": 0 if i % 2 == 0 else 43, "o": 0 if i % 2 == 0 else 60}
+         for i in range(4)]
+
+
+class TestCanvasSampler:
+
+    def test_samples_panel_footprints(self):
+        sampler = CanvasSampler(LayoutGeometry(STRIP), 320, 120)
+        image = np.zeros((120, 320, 3), dtype=np.uint8)
+        image[:, :160] = (255, 0, 0)
+        image[:, 160:] = (0, 0, 255)
+        colors = sampler.sample(image)
+        assert colors.shape == (4, 3)
+        assert colors[0].tolist() == [255, 0, 0]
+        assert colors[3].tolist() == [0, 0, 255]
+
+    def test_uniform_image(self):
+        sampler = CanvasSampler(LayoutGeometry(STRIP), 64, 48, samples_per_panel=None, shape="disc")
+        image = np.full((48, 64, 4), 200, dtype=np.uint8)
+        assert sampler.sample(image).tolist() == [[200, 200, 200]] * 4
+
+    def test_rejects_wrong_size(self):
+        sampler = CanvasSampler(LayoutGeometry(STRIP), 64, 48)
+        with pytest.raises(ValueError):
+            sampler.sample(np.zeros((10, 10, 3), dtype=np.uint8))
@@ -0,0 +1,129 @@
+import time
+
+import pytest
+
+from app.nanoleaf.scenes import Scene, SceneScheduler
+from app.tests.mock_aurora import default_document
+
+
+def _puts(mock):
+    return [request for request in mock.requests if request[0] == "PUT"]
+
+
+@pytest.fixture
+def scheduler(mock_aurora):
+    scheduler = SceneScheduler({"living": mock_aurora.aurora()}, max_age=60)
+    yield scheduler
+    scheduler.close()
+
+
+class TestScene:
+
+    def test_diff_against_document(self):
+        document = default_document()
+        document["state"]["colorMode"] = "hs"
+        document["state"]["hue"]["value"] = 120
+        effect, data = Scene(on=True, brightness=100, hue=120, saturation=50).changes(document)
+        assert effect is None
+        assert data == {"sat": {"value": 50}}
+
+    def test_color_mode_change_is_sent(self):
+        document = default_document()
+        assert Scene(hue=0).changes(document) == (None, {"hue": {"value": 0}})
+        assert Scene(effect="Flames").changes(document) == (None, {})
+        assert Scene(effect="Forest").changes(document) == ("Forest", {})
+
+    def test_ramp(self):
+        effect, data = Scene(brightness=10, duration=30).changes(default_document())
+        assert data == {"brightness": {"value": 10, "duration": 30}}
+
+    def test_rgb(self):
+        assert Scene(rgb="FF0000") == Scene(hue=0, saturation=100, brightness=100)
+        with pytest.raises(ValueError):
+            Scene(rgb="nothex")
+
+    def test_later_color_replaces_effect(self):
+        merged = Scene(effect="Nemo", brightness=20).merge(Scene(color_temperature=2700))
+        assert merged == Scene(brightness=20, color_temperature=2700)
+        merged = merged.merge(Scene(effect="Forest", on=False))
+        assert merged == Scene(brightness=20, effect="Forest", on=False)
+
+
+class TestSceneScheduler:
+
+    def test_coincident_changes_are_batched(self, scheduler, mock_aurora):
+        at = time.time() - 1
+        scheduler.schedule(at, "living", Scene(brightness=40))
+        scheduler.schedule(at + 0.01, "living", Scene(on=True, color_temperature=3000))
+        scheduler.schedule(at + 0.02, "living", Scene(effect="Forest"))
+        assert scheduler.run_pending() == {"living": Scene(on=True, brightness=40, effect="Forest")}
+        assert _puts(mock_aurora) == [("PUT", "effects"), ("PUT", "state")]
+        assert mock_aurora.document["state"]["brightness"]["value"] == 40
+        assert mock_aurora.document["effects"]["select"] == "Forest"
+        assert len(scheduler) == 0
+
+    def test_unchanged_state_sends_nothing(self, scheduler, mock_aurora):
+        scheduler.schedule(time.time() - 1, "living", Scene(on=True, brightness=100, effect="Flames"))
+        scheduler.run_pending()
+        assert _puts(mock_aurora) == []
+        assert scheduler.stats.requests_skipped == 2
+
+    def test_cached_state_is_reused(self, scheduler, mock_aurora):
+        for level in (10, 20, 30):
+            scheduler.schedule(time.time() - 1, "living", Scene(brightness=level))
+            scheduler.run_pending()
+        assert [request for request in mock_aurora.requests if request[0] == "GET"] == [("GET", "")]
+        assert scheduler.stats.requests_sent == 3
+
+    def test_repeats_and_cancels(self, scheduler):
+        now = time.time()
+        entry = scheduler.every(10, "living", Scene(brightness=5), start=now - 25)
+        scheduler.run_pending(now)
+        assert entry.at == pytest.approx(now + 5)
+        assert scheduler.next_due() == entry.at
+        entry.cancel()
+        assert scheduler.next_due() is None
+        assert scheduler.run_pending(now + 10) == {}
+
+    def test_errors_are_kept_per_device(self, scheduler, mock_aurora):
+        scheduler.add_device("missing", mock_aurora.aurora())
+        scheduler.schedule(time.time() - 1, "missing", Scene(effect="No Such Effect"))
+        scheduler.schedule(time.time() - 1, "living", Scene(brightness=1))
+        scheduler.run_pending()
+        assert list(scheduler.errors) == ["missing"]
+        assert mock_aurora.document["state"]["brightness"]["value"] == 1
+
+    def test_unexpected_errors_keep_scheduler_running(self, scheduler, mock_aurora):
+        class _Broken:
+            def snapshot(self, max_age=None):
+                raise ValueError("unreadable response")
+
+            def invalidate(self):
+                pass
+
+            def close(self):
+                pass
+
+        scheduler.add_device("broken", _Broken())
+        with scheduler:
+            scheduler.schedule_in(0.05, "broken", Scene(on=True))
+            scheduler.schedule_in(0.05, "living", Scene(brightness=33))
+            deadline = time.time() + 2
+            while mock_aurora.document["state"]["brightness"]["value"] != 33 and time.time() < deadline:
+                time.sleep(0.01)
+            assert scheduler.running
+        assert mock_aurora.document["state"]["brightness"]["value"] == 33
+        assert isinstance(scheduler.errors["broken"], ValueError)
+
+    def test_unknown_device(self, scheduler):
+        with pytest.raises(KeyError):
+            scheduler.schedule_in(1, "attic", Scene(on=False))
+
+    def test_background_thread(self, scheduler, mock_aurora):
+        with scheduler:
+            scheduler.schedule_in(0.1, "living", Scene(brightness=70))
+            deadline = time.time() + 2
+            while mock_aurora.document["state"]["brightness"]["value"] != 70 and time.time() < deadline:
+                time.sleep(0.01)
+        assert mock_aurora.document["state"]["brightness"]["value"] == 70
+        assert scheduler.stats.rounds == 1
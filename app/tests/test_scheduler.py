@@ -0,0 +1,60 @@
+import threading
+import time
+
+import pytest
+
+from app.nanoleaf.scheduler import StreamScheduler
+
+
+class _Stream:
+
+    def __init__(self):
+        self.frames = []
+        self.sent = threading.Event()
+
+    def panels_set(self, panel_ids, colors, transition_times=None):
+        self.frames.append(colors)
+        self.sent.set()
+
+
+class TestStreamScheduler:
+
+    def test_sends_only_latest_frame(self):
+        stream = _Stream()
+        scheduler = StreamScheduler(stream, fps=20)
+        for i in range(5):
+            scheduler.submit([1], [[i, 0, 0]])
+        with scheduler:
+            assert stream.sent.wait(1)
+        assert stream.frames == [[[4, 0, 0]]]
+        assert scheduler.stats.frames_dropped == 4
+        assert scheduler.stats.frames_sent == 1
+
+    def test_paces_frames(self):
+        stream = _Stream()
+        scheduler = StreamScheduler(stream, fps=50)
+        with scheduler:
+            end = time.perf_counter() + 0.5
+            while time.perf_counter() < end:
+                scheduler.submit([1], [[0, 0, 0]])
+                time.sleep(0.001)
+        assert 15 <= scheduler.stats.frames_sent <= 30
+        assert 30 < scheduler.stats.fps < 70
+        assert scheduler.stats.frames_dropped > 0
+
+    def test_stops_on_stream_error(self):
+        class _Failing:
+            def panels_set(self, panel_ids, colors, transition_times=None):
+                raise ValueError("bad panel")
+
+        scheduler = StreamScheduler(_Failing(), fps=100)
+        scheduler.submit([1], [[0, 0, 0]])
+        scheduler.start()
+        for _ in range(100):
+            if not scheduler.running:
+                break
+            time.sleep(0.01)
+        assert not scheduler.running
+        assert isinstance(scheduler.error, ValueError)
+        with pytest.raises(ValueError):
+            scheduler.stop()
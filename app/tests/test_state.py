@@ -0,0 +1,73 @@
+import pytest
+
+from app.nanoleaf.state import StateBatch, hsv_data_from_rgb, rgb_from_hex
+
+
+class TestStateBatch:
+
+    def test_last_write_wins(self):
+        batch = StateBatch()
+        batch.add({"brightness": {"value": 10}})
+        batch.add({"brightness": {"value": 60}})
+        batch.add({"on": True})
+        assert batch.data == {"brightness": {"value": 60}, "on": True}
+
+    def test_increment_folds_into_value(self):
+        batch = StateBatch()
+        batch.add({"brightness": {"value": 90}})
+        batch.add({"brightness": {"increment": 20}})
+        batch.add({"hue": {"increment": 5}})
+        batch.add({"hue": {"increment": -15}})
+        assert batch.data == {"brightness": {"value": 100}, "hue": {"increment": -10}}
+
+    def test_value_replaces_increment(self):
+        batch = StateBatch()
+        batch.add({"sat": {"increment": 5}})
+        batch.add({"sat": {"value": 30}})
+        assert batch.data == {"sat": {"value": 30}}
+
+    def test_color_modes_are_exclusive(self):
+        batch = StateBatch()
+        batch.add({"hue": {"value": 10}, "sat": {"value": 20}})
+        batch.add({"ct": {"value": 3000}})
+        assert batch.data == {"ct": {"value": 3000}}
+
+
+class TestColorParsing:
+
+    def test_hex(self):
+        assert rgb_from_hex("FF8000") == (255, 128, 0)
+        assert rgb_from_hex("#00ff7f") == (0, 255, 127)
+        assert rgb_from_hex("FF800") is None
+        assert rgb_from_hex("GG8000") is None
+
+    def test_accepts_arrays(self):
+        np = pytest.importorskip("numpy")
+        assert hsv_data_from_rgb(np.array([255, 0, 0], dtype=np.uint8)) == hsv_data_from_rgb("FF0000")
+        assert hsv_data_from_rgb("nothex") is None
+        assert hsv_data_from_rgb([1, 2]) is None
+
+
+class TestStateBatching:
+
+    def test_single_put(self, fake_aurora):
+        aurora, calls = fake_aurora()
+        with aurora.state.batch():
+            aurora.state.on = True
+            aurora.state.brightness = 50
+            aurora.state.brightness_raise(10)
+            aurora.state.rgb = "FF0000"
+            assert calls == []
+        assert calls == [("PUT", "state")]
+        assert aurora._requester.session.bodies == [
+            {"on": True, "brightness": {"value": 100}, "hue": {"value": 0}, "sat": {"value": 100}}]
+
+    def test_discarded_on_error(self, fake_aurora):
+        aurora, calls = fake_aurora()
+        with pytest.raises(RuntimeError):
+            with aurora.state.batch():
+                aurora.state.brightness = 50
+                raise RuntimeError()
+        aurora.state.brightness = 20
+        assert calls == [("PUT", "state")]
+        assert aurora._requester.session.bodies == [{"brightness": {"value": 20}}]
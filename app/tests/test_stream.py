@@ -0,0 +1,150 @@
+import socket
+import tracemalloc
+
+import pytest
+
+from app.nanoleaf import stream as stream_module
+from app.nanoleaf.stream import AuroraStream, FrameBuffer
+
+
+@pytest.fixture
+def receiver():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(1)
+    yield sock
+    sock.close()
+
+
+def _stream(receiver, panel_ids=()):
+    return AuroraStream(*receiver.getsockname(), panel_ids=panel_ids)
+
+
+class TestFrameBuffer:
+
+    def test_slots_are_reused(self):
+        frame = FrameBuffer([5, 9])
+        frame.set(9, 1, 2, 3)
+        frame.set(9, 4, 5, 6, 7, 2)
+        assert len(frame) == 2
+        assert bytes(frame.pending()) == bytes([1, 9, 1, 4, 5, 6, 7, 2])
+
+    def test_dirty_tracking(self):
+        frame = FrameBuffer([1])
+        frame.set(1, 10, 20, 30)
+        assert frame.is_dirty(1)
+        frame.mark_sent()
+        frame.set(1, 10, 20, 30)
+        assert not frame.is_dirty(1)
+        frame.set(1, 10, 20, 31)
+        assert frame.is_dirty(1)
+
+    @pytest.mark.parametrize("vectorized", [True, False])
+    def test_set_many(self, monkeypatch, vectorized):
+        if vectorized:
+            np = pytest.importorskip("numpy")
+            colors = np.array([[1, 2, 3], [4, 5, 6]], dtype=np.uint8)
+        else:
+            monkeypatch.setattr(stream_module, "np", None)
+            colors = [[1, 2, 3], [4, 5, 6]]
+        frame = FrameBuffer([7])
+        frame.set_many([8, 7], colors, [3, 4])
+        assert bytes(frame.pending()) == bytes([2, 7, 1, 4, 5, 6, 0, 4, 8, 1, 1, 2, 3, 0, 3])
+        frame.mark_sent()
+        frame.set_many([7, 8], [[4, 5, 6, 0], [1, 2, 3, 9]], 4)
+        assert not frame.is_dirty(7)
+        assert frame.is_dirty(8)
+        assert frame.pending_count == 2
+
+
+class TestAuroraStream:
+
+    def test_strobe_sends_prepared_panels(self, receiver):
+        stream = _stream(receiver)
+        stream.panel_prepare(1, 255, 0, 0)
+        stream.panel_prepare(2, 0, 255, 0, transition_time=5)
+        stream.panel_strobe()
+        assert receiver.recv(64) == bytes([2, 1, 1, 255, 0, 0, 0, 1, 2, 1, 0, 255, 0, 0, 5])
+        stream.panel_prepare(2, 0, 0, 255)
+        stream.panel_strobe()
+        assert receiver.recv(64) == bytes([1, 2, 1, 0, 0, 255, 0, 1])
+
+    def test_panel_set(self, receiver):
+        stream = _stream(receiver)
+        stream.panel_set(3, 1, 2, 3, 4, 5)
+        assert receiver.recv(64) == bytes([1, 3, 1, 1, 2, 3, 4, 5])
+
+    def test_panels_set(self, receiver):
+        np = pytest.importorskip("numpy")
+        stream = _stream(receiver)
+        colors = np.arange(12, dtype=np.uint8).reshape(3, 4)
+        stream.panels_set(np.array([10, 11, 12]), colors, np.array([1, 2, 3]))
+        assert receiver.recv(64) == bytes([3, 10, 1, 0, 1, 2, 3, 1, 11, 1, 4, 5, 6, 7, 2, 12, 1, 8, 9, 10, 11, 3])
+
+    def test_single_color_and_correction(self, receiver):
+        np = pytest.importorskip("numpy")
+        from app.nanoleaf.color import Correction, kelvin_to_rgb
+        stream = _stream(receiver)
+        stream.panels_set([1, 2], kelvin_to_rgb(6600))
+        assert receiver.recv(64) == bytes([2, 1, 1, 255, 255, 255, 0, 1, 2, 1, 255, 255, 255, 0, 1])
+        stream.correction = Correction(white_balance=(255, 128, 0))
+        stream.panels_set(np.array([1]), np.array([[255, 255, 255]], dtype=np.uint8))
+        assert receiver.recv(64) == bytes([1, 1, 1, 255, 128, 0, 0, 1])
+        stream.panel_set(3, 255, 255, 255)
+        assert receiver.recv(64) == bytes([1, 3, 1, 255, 128, 0, 0, 1])
+
+    def test_correction_without_numpy(self, receiver, monkeypatch):
+        pytest.importorskip("numpy")
+        from app.nanoleaf.color import Correction
+        stream = _stream(receiver)
+        stream.correction = Correction(white_balance=(255, 128, 0))
+        monkeypatch.setattr(stream_module, "np", None)
+        stream.panels_set([1, 2], [[255, 255, 255], [255, 255, 255, 7]])
+        assert receiver.recv(64) == bytes([2, 1, 1, 255, 128, 0, 0, 1, 2, 1, 255, 128, 0, 7, 1])
+
+    def test_delta_frames(self, receiver):
+        stream = _stream(receiver, [1, 2, 3])
+        stream.delta = True
+        stream.keyframe_interval = 3
+        for panel_id in (1, 2, 3):
+            stream.panel_prepare(panel_id, 10, 10, 10)
+        stream.panel_strobe()
+        assert receiver.recv(64)[0] == 3
+        stream.panel_prepare(1, 10, 10, 10)
+        stream.panel_prepare(2, 20, 10, 10)
+        stream.panel_strobe()
+        assert receiver.recv(64) == bytes([1, 2, 1, 20, 10, 10, 0, 1])
+        stream.panel_prepare(3, 10, 10, 10)
+        stream.panel_strobe()
+        keyframe = receiver.recv(64)
+        assert keyframe[0] == 3
+        assert keyframe[8:11] == bytes([2, 1, 20])
+
+    def test_delta_skips_panels_never_set(self, receiver):
+        stream = _stream(receiver, [1, 2, 3])
+        stream.delta = True
+        stream.keyframe_interval = 2
+        stream.panel_prepare(1, 10, 20, 30, transition_time=0)
+        stream.panel_strobe()
+        assert receiver.recv(64) == bytes([1, 1, 1, 10, 20, 30, 0, 0])
+        stream.panel_prepare(2, 0, 0, 0)
+        stream.panel_strobe()
+        assert receiver.recv(64) == bytes([2, 1, 1, 10, 20, 30, 0, 0, 2, 1, 0, 0, 0, 0, 1])
+
+    def test_no_allocation_per_frame(self, receiver):
+        panel_ids = list(range(100))
+        stream = _stream(receiver, panel_ids)
+        receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+
+        def render(frame_number):
+            for panel_id in panel_ids:
+                stream.panel_prepare(panel_id, frame_number % 256, panel_id, 0)
+            stream.panel_strobe()
+
+        render(0)
+        tracemalloc.start()
+        for frame_number in range(1, 30):
+            render(frame_number)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert peak < 1024
@@ -0,0 +1,81 @@
+import pytest
+
+from app.nanoleaf.scheduler import StreamScheduler
+from app.nanoleaf.stream import AuroraStream
+from app.nanoleaf.transition import Transition, ease_in_out, linear
+
+np = pytest.importorskip("numpy")
+
+
+class _Stream:
+
+    def __init__(self):
+        self.frames = []
+
+    def panels_set(self, panel_ids, colors, transition_times=None):
+        self.frames.append(np.array(colors))
+
+
+class TestTransition:
+
+    def test_easings_span_zero_to_one(self):
+        assert ease_in_out(0) == 0
+        assert ease_in_out(0.5) == 0.5
+        assert ease_in_out(1) == 1
+        assert ease_in_out(0.25) < linear(0.25)
+
+    def test_starts_and_ends_on_colors(self):
+        start = np.random.default_rng(0).integers(0, 256, (50, 3))
+        end = np.random.default_rng(1).integers(0, 256, (50, 3))
+        for space in ("hsv", "rgb", "linear"):
+            transition = Transition(range(50), start, end, 1, space=space)
+            assert np.array_equal(transition.colors_at(0), start)
+            assert np.array_equal(transition.colors_at(1), end)
+
+    def test_rgb_midpoint(self):
+        transition = Transition([1, 2], [0, 0, 0], [[200, 100, 50], [0, 0, 255]], 1, easing="linear", space="rgb")
+        assert transition.colors_at(0.5).tolist() == [[100, 50, 25], [0, 0, 128]]
+
+    def test_hsv_takes_shorter_hue_path(self):
+        # Red (0) to magenta (300) passes through hue 330, not green
+        transition = Transition([1], [255, 0, 0], [255, 0, 255], 1, easing="linear")
+        red, green, blue = transition.colors_at(0.5)[0]
+        assert red == 255 and green == 0 and 0 < blue < 255
+
+    def test_hsv_fades_from_black_at_target_color(self):
+        transition = Transition([1], [0, 0, 0], [0, 0, 255], 1, easing="linear")
+        red, green, blue = transition.colors_at(0.5)[0]
+        assert red == green == 0 and blue > 0
+
+    def test_frames_follow_the_clock(self):
+        transition = Transition([1], [0, 0, 0], [255, 255, 255], 2, easing="linear", space="rgb")
+        assert transition.frame(10)[1].tolist() == [[0, 0, 0]]
+        assert transition.frame(11)[1].tolist() == [[128, 128, 128]]
+        assert transition.frame(12)[1].tolist() == [[255, 255, 255]]
+        assert transition.finished
+        assert transition.frame(13) is None
+
+    def test_streams_through_scheduler(self):
+        stream = _Stream()
+        transition = Transition(range(10), [0, 0, 0], [255, 0, 0], 0.2, easing="linear", space="rgb")
+        with StreamScheduler(stream, fps=100, source=transition) as scheduler:
+            assert transition.wait(2)
+        assert 10 <= len(stream.frames) <= 25
+        reds = [int(frame[0, 0]) for frame in stream.frames]
+        assert reds == sorted(reds)
+        assert reds[-1] == 255
+        assert scheduler.stats.frames_submitted == 0
+
+    def test_play_blocks_until_done(self):
+        stream = _Stream()
+        Transition([1, 2], [0, 0, 0], [0, 255, 0], 0.1).play(stream, fps=60)
+        assert stream.frames[-1].tolist() == [[0, 255, 0], [0, 255, 0]]
+
+    def test_play_raises_stream_errors(self):
+        stream = AuroraStream("127.0.0.1", 9)
+        # Panel IDs above 255 don't fit the packet
+        transition = Transition([300], [0, 0, 0], [255, 0, 0], 5)
+        with pytest.raises(ValueError):
+            transition.play(stream, fps=60)
+        assert transition.finished
+        stream.sock.close()
@@ -19,5 +19,10 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Programming Language :: Python :: 3'
     ],
-    install_requires=['requests']
+    install_requires=['requests'],
+    extras_require={
+        'async': ['aiohttp'],
+        'numpy': ['numpy'],
+        'dotenv': ['python-dotenv']
+    }
 )